@@ -1,75 +1,11 @@
 import json
 import os
 from dotenv import load_dotenv
-import requests
-import base64
 import yaml
 from autogen import AssistantAgent, GroupChat, UserProxyAgent
 
-
-def convert_web_url_to_api(url: str) -> str:
-    """Convert GitHub web URL to GitHub API URL"""
-    try:
-        if "github.com" in url and "/issues/" in url:
-            parts = url.split("github.com/")[1].split("/issues/")
-            repo_path = parts[0]
-            issue_number = parts[1]
-            return f"https://api.github.com/repos/{repo_path}/issues/{issue_number}"
-        else:
-            raise ValueError("URL format not recognized")
-    except Exception as e:
-        return f"Error converting URL: {str(e)}"
-
-def get_github_issue(issue_url: str) -> str:
-    """Fetch GitHub issue details from API"""
-    try:
-        response = requests.get(issue_url)
-        response.raise_for_status()
-        issue_data = response.json()
-
-        return f"""
-        Title: {issue_data['title']}
-        State: {issue_data['state']}
-        URL: {issue_data['html_url']}
-        Body: {issue_data['body']}
-        """
-    except Exception as e:
-        return f"Error fetching issue: {str(e)}"
-
-def get_repository_structure(repo_owner: str, repo_name: str, path: str = "") -> str:
-    """Get repository file and folder structure"""
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{path}"
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        contents = response.json()
-
-        structure = []
-        for item in contents:
-            if item['type'] == 'file':
-                structure.append(f"FILE: {item['path']}")
-            elif item['type'] == 'dir':
-                structure.append(f"DIR: {item['path']}/")
-        return "\n".join(structure)
-    except Exception as e:
-        return f"Error fetching repository structure: {str(e)}"
-
-def get_file_content(repo_owner: str, repo_name: str, file_path: str) -> str:
-    """Get content of a specific file from repository"""
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{file_path}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        file_data = response.json()
-
-        if file_data.get('encoding') == 'base64':
-            content = base64.b64decode(file_data['content']).decode('utf-8')
-            return f"Content of {file_path}:\n{content}"
-        else:
-            return f"Could not decode file content for {file_path}"
-    except Exception as e:
-        return f"Error fetching file {file_path}: {str(e)}"
+from github_tools import TOOL_STATS, convert_web_url_to_api, get_github_issue, register_tools, repo_commit_for
+from tool_cache import ToolSession
 
 
 class AnalyzerAgent:
@@ -77,6 +13,8 @@ class AnalyzerAgent:
     def __init__(self, config):
         self.config = config
         self.agent = None
+        # Tool results are memoised per conversation and across analyzer instances on the same commit
+        self.tool_session = ToolSession(commit_for=repo_commit_for)
         self._load_agent()
         self._register_functions()
         self.user_proxy = None
@@ -113,41 +51,9 @@ class AnalyzerAgent:
     
     def _register_functions(self):
         print("🔧 Registering functions for the analyzer...")
-        self.agent.register_for_execution(name="get_github_issue")(get_github_issue)
-        self.agent.register_for_llm(
-            description="Fetch GitHub issue details using the full issue API URL"
-        )(get_github_issue)
-
-        self.agent.register_for_execution(name="get_repository_structure")(get_repository_structure)
-        self.agent.register_for_llm(
-            description="Get repository file and folder structure"
-        )(get_repository_structure)
-
-        self.agent.register_for_execution(name="get_file_content")(get_file_content)
-        self.agent.register_for_llm(
-            description="Get content of a specific file from repository"
-        )(get_file_content)
-
+        register_tools(self.agent, session=self.tool_session)
         print("✅ Functions registered successfully")
 
-    def _register_functions_user_proxy(self):
-        self.user_proxy.register_for_execution(name="get_github_issue")(get_github_issue)
-        self.user_proxy.register_for_llm(
-            description="Fetch GitHub issue details using the full issue API URL"
-        )(get_github_issue)
-
-        self.user_proxy.register_for_execution(name="get_repository_structure")(get_repository_structure)
-        self.user_proxy.register_for_llm(
-            description="Get repository file and folder structure"
-        )(get_repository_structure)
-
-        self.user_proxy.register_for_execution(name="get_file_content")(get_file_content)
-        self.user_proxy.register_for_llm(
-            description="Get content of a specific file from repository"
-        )(get_file_content)
-
-        print("✅ Functions registered successfully")
-    
     def get_agent(self):
         """Return the configured analyzer agent"""
         return self.agent
@@ -166,6 +72,7 @@ class AnalyzerAgent:
         Basically it runs and iterates through GitHub calls until the agent is able to return a valid dictionary.
         """
         print(f"🔍 Analyzing issue: {github_issue_url}")
+        self.tool_session.reset()
 
         result = {}
         valid_paradigms = set([
@@ -249,6 +156,8 @@ def create_analyzer_agent(issue_link: str):
     )
     final_dict = analyzer.get_final_dict(issue_link)
     print("🔍 Final analysis result:", final_dict)
+    print(TOOL_STATS.report())
+    print(analyzer.tool_session.report())
     
 
     return final_dict
@@ -0,0 +1,102 @@
+"""
+Shared artifact store for distributed runs.
+Workers write SWE-agent output (patch, trajectory, logs) and job results here
+instead of leaving them in a local trajectories/ directory, so any node can
+read what another produced. Layout under the store root:
+  <instance_id>/<run_id>/<name>/...   e.g. octo__repo-i12/3f2a...-a1/swe_agent/<SWE-agent output tree>
+  <instance_id>/<run_id>/result.json
+The run id is the job id and attempt, so jobs and retries for the same issue
+never share a directory. Writes are idempotent: a tree is staged next to its
+destination and renamed into place, and within one run the first complete
+copy wins, so no artifact is ever left half-written or mixed.
+
+Other backends plug in through STORES and open_store("<scheme>://...").
+"""
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Optional
+
+ARTIFACT_STORE = os.getenv("SWE_ARTIFACT_STORE", "")
+STAGING_DIR = ".staging"
+
+
+def instance_id(issue_url: str) -> str:
+    """owner__repo-iN, the id SWE-agent names its output after"""
+    parts = issue_url.rstrip("/").split("/")
+    return f"{parts[-4]}__{parts[-3]}-i{parts[-1]}"
+
+
+def run_key(issue_url: str, run_id: Optional[str] = None) -> str:
+    """Store key of one run of an issue; runs without an id get a fresh one so they never collide"""
+    return f"{instance_id(issue_url)}/{run_id or uuid.uuid4().hex}"
+
+
+class ArtifactStore:
+    """Directory tree on storage every node mounts (NFS, EFS, a shared volume, ...)"""
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(os.path.join(self.root, STAGING_DIR), exist_ok=True)
+
+    def path(self, key: str, name: str) -> str:
+        return os.path.join(self.root, key, name)
+
+    def get(self, key: str, name: str) -> Optional[str]:
+        """Local path of a stored artifact, or None"""
+        path = self.path(key, name)
+        return path if os.path.exists(path) else None
+
+    def staging(self) -> str:
+        """Fresh directory on the store's filesystem to build an artifact in before put_tree"""
+        path = os.path.join(self.root, STAGING_DIR, uuid.uuid4().hex)
+        os.makedirs(path)
+        return path
+
+    def put_tree(self, key: str, name: str, staged_dir: str) -> str:
+        """Move a staged directory into place; if the artifact already exists the staged copy is dropped"""
+        destination = self.path(key, name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            os.rename(staged_dir, destination)
+        except OSError:
+            if not os.path.isdir(destination):
+                raise
+            print(f"♻️  {key}/{name} already stored, keeping the first copy")
+            shutil.rmtree(staged_dir, ignore_errors=True)
+        return destination
+
+    def put_json(self, key: str, name: str, value: Any) -> str:
+        """Write a JSON document atomically (temp file + rename), replacing any earlier version"""
+        destination = self.path(key, name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp = os.path.join(self.root, STAGING_DIR, f"{uuid.uuid4().hex}.json")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, indent=2, default=str)
+        os.replace(tmp, destination)
+        return destination
+
+    def get_json(self, key: str, name: str) -> Optional[Dict]:
+        path = self.get(key, name)
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+STORES = {"file": ArtifactStore}
+
+
+def open_store(url: Optional[str] = None) -> Optional[ArtifactStore]:
+    """file:///shared/artifacts (or a bare path); None when no store is configured"""
+    if url is None:
+        # Read at call time: distributed.work sets SWE_ARTIFACT_STORE after this module is imported
+        url = os.getenv("SWE_ARTIFACT_STORE", "")
+    if not url:
+        return None
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return ArtifactStore(url)
+    if scheme not in STORES:
+        raise ValueError(f"Unsupported artifact store {scheme!r}, expected one of {sorted(STORES)}")
+    return STORES[scheme](rest[1:] if rest.startswith("//") else rest)
@@ -0,0 +1,75 @@
+"""
+Benchmark for the process-pool execution mode.
+Builds a repo index, then AST-outlines every Python file with 1..N worker
+processes. Workers only receive (index_path, list of paths) and read the
+sources from the mmap'ed blob, which the payload column makes visible.
+
+Usage: python bench_process_pool.py <repo_dir> [--workers 1 2 4 8] [--output bench_output.txt]
+"""
+import argparse
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import repo_index
+
+
+def _chunks(items, n):
+    size = max(1, len(items) // n)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_once(index_path, paths, workers, repeat):
+    batches = _chunks(paths, workers * 4)
+    payload = sum(len(pickle.dumps((index_path, batch))) for batch in batches)
+    with ProcessPoolExecutor(max_workers=workers, initializer=repo_index.preload_indexes,
+                             initargs=([index_path],)) as pool:
+        # Warm-up so pool start-up is not part of the measurement
+        list(pool.map(repo_index.outline_paths, [index_path] * workers, [[]] * workers))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(pool.map(repo_index.outline_paths, [index_path] * len(batches), batches))
+        elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process-pool scaling benchmark")
+    parser.add_argument("repo_dir", help="Local checkout of a (preferably large) repository")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Also write the table to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index_path = repo_index.build_index(args.repo_dir)
+    build_time = time.perf_counter() - start
+    index = repo_index.open_index(index_path)
+    paths = index.paths(".py")
+    total_bytes = sum(index.files[path][1] for path in paths)
+    pickled_dict = len(pickle.dumps({path: index.text(path) for path in paths}))
+
+    lines = [
+        f"Repository: {os.path.abspath(args.repo_dir)}",
+        f"Index built in {build_time:.2f}s, {len(paths)} Python files, {total_bytes / 1e6:.1f} MB",
+        f"Pickled contents dict would be {pickled_dict / 1e6:.1f} MB per dispatch",
+        "",
+        f"{'workers':>8} {'seconds':>10} {'speedup':>8} {'payload KB':>11}",
+    ]
+    baseline = None
+    for workers in args.workers:
+        elapsed, payload = run_once(index_path, paths, workers, args.repeat)
+        baseline = baseline or elapsed
+        lines.append(f"{workers:>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f} {payload / 1e3:>11.1f}")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
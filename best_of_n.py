@@ -0,0 +1,283 @@
+"""
+Best-of-N SWE-agent attempts.
+Attempts with different models and temperatures run concurrently, each in its
+own SWE-agent run (own container, output directory and a local workspace from
+workspaces.py). Every patch is sent to the revisor as soon as it lands, and the
+first approved patch cancels the attempts still running. MAX_PARALLEL caps the attempts in flight for one issue
+and COST_CAP the SWE-agent spend across all of them: each attempt reserves its
+per-instance cost limit before it starts, so the cap holds even for attempts
+that are killed before they report their cost.
+
+Usage: python best_of_n.py <GitHub Issue URL> [attempts]
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from artifact_store import instance_id
+from fix_memory import FixMemory
+from issue_dedup import IssueIndex
+from llm_usage import LEDGER
+from orchestrator import collect_swe_agent_patch, run_analyzer, run_revisor, swe_agent_command, truncate_github_url
+from router import ModelRouter
+from workspaces import WORKSPACES
+
+ATTEMPTS = int(os.getenv("SWE_AGENT_ATTEMPTS", "3"))
+MAX_PARALLEL = int(os.getenv("SWE_AGENT_MAX_PARALLEL", "2"))
+COST_CAP = float(os.getenv("SWE_AGENT_COST_CAP", "6.0"))
+ATTEMPT_COST_LIMIT = float(os.getenv("SWE_AGENT_ATTEMPT_COST_LIMIT", "3.0"))
+MIN_ATTEMPT_BUDGET = 0.5
+TEMPERATURES = [0.0, 0.5, 0.8]
+RUNS_DIR = os.getenv("SWE_AGENT_ATTEMPTS_DIR", os.path.join("trajectories", "best_of_n"))
+
+
+def attempt_variants(models: List[str], attempts: int) -> List[Dict]:
+    """Spread attempts over models first, then temperatures: [m0 t0, m1 t0, m0 t0.5, ...]"""
+    variants = []
+    for i in range(attempts):
+        variants.append({
+            "attempt": i + 1,
+            "model": models[i % len(models)],
+            "temperature": TEMPERATURES[(i // len(models)) % len(TEMPERATURES)],
+        })
+    return variants
+
+
+class AttemptBudget:
+    """Cost reservations against COST_CAP; an attempt only starts if its limit fits"""
+    def __init__(self, cap: float):
+        self.cap = cap
+        self.spent = 0.0
+        self.reserved = 0.0
+
+    def reserve(self, limit: float) -> float:
+        available = self.cap - self.spent - self.reserved
+        amount = min(limit, available)
+        if amount < MIN_ATTEMPT_BUDGET:
+            return 0.0
+        self.reserved += amount
+        return amount
+
+    def settle(self, reserved: float, cost: float):
+        self.reserved -= reserved
+        self.spent += cost
+
+
+async def release_attempt(attempt: Dict):
+    """Unmap an attempt's patch and hand its checkout back to the pool, even when the caller is being cancelled"""
+    patch_model = attempt.pop("patch_model", None)
+    if patch_model:
+        patch_model.close()
+    workspace = attempt.pop("workspace", None)
+    if workspace:
+        await asyncio.shield(asyncio.to_thread(WORKSPACES.release, workspace))
+
+
+async def run_attempt(data: Dict, variant: Dict, cost_limit: float, output_dir: str) -> Dict:
+    """
+    One SWE-agent run as a subprocess; cancelling the task kills the run and its children.
+    An attempt with a patch keeps its workspace and mapped patch for review_attempt, which releases them.
+    """
+    attempt = dict(data, model=variant["model"])
+    if data.get("base_commit"):
+        # Each attempt starts from its own recycled checkout of the analyzed commit
+        owner, repo = truncate_github_url(data["github_url"]).rstrip("/").split("/")[-2:]
+        attempt["workspace"] = await asyncio.to_thread(WORKSPACES.acquire, owner, repo, data["base_commit"], True)
+        attempt["repo_path"] = attempt["workspace"]
+    try:
+        cmd = swe_agent_command(attempt, extra_args=[
+            f"--agent.model.temperature={variant['temperature']}",
+            f"--agent.model.per_instance_cost_limit={cost_limit:.2f}",
+            f"--output_dir={output_dir}",
+        ])
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            start_new_session=(os.name == "posix"))
+        try:
+            stdout, _ = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                if os.name == "posix":
+                    os.killpg(process.pid, signal.SIGTERM)
+                else:
+                    process.kill()
+                await process.wait()
+            raise
+        output = stdout.decode("utf-8", errors="replace")
+        with open(os.path.join(output_dir, "run.log"), "w", encoding="utf-8") as f:
+            f.write(output)
+        await asyncio.to_thread(collect_swe_agent_patch, output, attempt)
+    except BaseException:
+        await release_attempt(attempt)
+        raise
+    if not attempt.get("patch_model"):
+        await release_attempt(attempt)
+    return attempt
+
+
+async def review_attempt(attempt: Dict, revisor_model: str) -> Dict:
+    """Revisor verdict on an attempt's patch, read against the attempt's still-held checkout"""
+    try:
+        review = await asyncio.to_thread(run_revisor, {
+            "problem_statement": attempt["problem_statement"],
+            "patch_model": attempt["patch_model"],
+            "repo_dir": attempt.get("repo_path"),
+        }, revisor_model)
+        # Text of the diff outlives the mapping only for the patch that can win
+        if review.get("status") == "APPROVED":
+            attempt["patch"] = attempt["patch_model"].text()
+    finally:
+        await release_attempt(attempt)
+    attempt["review"] = review
+    return attempt
+
+
+async def best_of_n(data: Dict, models: List[str], attempts: int = ATTEMPTS, max_parallel: int = MAX_PARALLEL,
+                    cost_cap: float = COST_CAP, revisor_model: str = "gpt-4o",
+                    router: Optional[ModelRouter] = None, tiers: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Run up to `attempts` SWE-agent attempts, at most max_parallel at a time, and
+    return {approved, patch, winner, attempts, cost, elapsed}. The first patch
+    the revisor approves wins and the remaining attempts are cancelled.
+    """
+    start = time.monotonic()
+    budget = AttemptBudget(cost_cap)
+    queue = attempt_variants(models, attempts)
+    run_dir = os.path.join(RUNS_DIR, f"{int(time.time())}")
+    running: Dict[asyncio.Task, Dict] = {}
+    reviewing: Dict[asyncio.Task, Dict] = {}
+    outcomes: List[Dict] = []
+    winner = None
+
+    def launch():
+        while queue and len(running) < max_parallel:
+            reserved = budget.reserve(ATTEMPT_COST_LIMIT)
+            if not reserved:
+                if running:
+                    # Budget is held by attempts in flight; retry when one of them settles
+                    return
+                print(f"💸 Cost cap ${cost_cap:.2f} reached, {len(queue)} attempt(s) not started")
+                queue.clear()
+                return
+            variant = dict(queue.pop(0), reserved=reserved, started=time.monotonic() - start)
+            output_dir = os.path.join(run_dir, f"attempt-{variant['attempt']}")
+            os.makedirs(output_dir, exist_ok=True)
+            print(f"🚀 Attempt {variant['attempt']}: {variant['model']} at temperature {variant['temperature']} "
+                  f"(limit ${reserved:.2f})")
+            running[asyncio.create_task(run_attempt(data, variant, reserved, output_dir))] = variant
+
+    def record(variant, status, cost):
+        if not variant.get("settled"):
+            budget.settle(variant["reserved"], cost)
+        outcomes.append({
+            "attempt": variant["attempt"], "model": variant["model"], "temperature": variant["temperature"],
+            "status": status, "cost": round(cost, 4), "started": round(variant["started"], 1),
+            "finished": round(time.monotonic() - start, 1),
+        })
+        if router and tiers and status != "cancelled":
+            router.record_outcome("swe_agent", tiers.get(variant["model"], variant["model"]), cost,
+                                  approved=status == "approved")
+
+    launch()
+    while (running or reviewing) and winner is None:
+        done, _ = await asyncio.wait(list(running) + list(reviewing), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task in running:
+                variant = running.pop(task)
+                try:
+                    attempt = task.result()
+                except Exception as e:
+                    print(f"❌ Attempt {variant['attempt']} failed: {e}")
+                    record(variant, "failed", 0.0)
+                    continue
+                if not attempt.get("patch_model"):
+                    print(f"❌ Attempt {variant['attempt']} produced no patch")
+                    record(variant, "no_patch", attempt.get("swe_cost", 0.0))
+                    continue
+                # Stream the patch to the revisor while the other attempts keep going
+                print(f"🔎 Attempt {variant['attempt']} produced a patch, reviewing")
+                variant["cost"] = attempt.get("swe_cost", 0.0)
+                # The run is over, so its real cost replaces the reservation for the next launch
+                budget.settle(variant["reserved"], variant["cost"])
+                variant["settled"] = True
+                variant["run"] = attempt
+                reviewing[asyncio.create_task(review_attempt(attempt, revisor_model))] = variant
+            else:
+                variant = reviewing.pop(task)
+                attempt = task.result()
+                approved = attempt["review"].get("status") == "APPROVED"
+                record(variant, "approved" if approved else "rejected", variant["cost"])
+                print(f"{'✅' if approved else '🔁'} Attempt {variant['attempt']}: {attempt['review'].get('status')}")
+                if approved and winner is None:
+                    winner = dict(attempt, attempt=variant["attempt"])
+        if winner is None:
+            launch()
+
+    # First approved patch wins; stop everything still in flight
+    for task in list(running) + list(reviewing):
+        task.cancel()
+    await asyncio.gather(*running, *reviewing, return_exceptions=True)
+    for variant in running.values():
+        # A killed run never writes its .traj; count the whole reservation
+        record(variant, "cancelled", variant["reserved"])
+    for variant in reviewing.values():
+        # A review cancelled before it started never reached its release
+        await release_attempt(variant["run"])
+        record(variant, "cancelled", variant["cost"])
+    if running or reviewing:
+        print(f"🛑 Cancelled {len(running) + len(reviewing)} attempt(s) after approval")
+
+    return {
+        "approved": winner is not None,
+        "patch": (winner or {}).get("patch"),
+        "review": (winner or {}).get("review"),
+        "winner": (winner or {}).get("attempt"),
+        "attempts": sorted(outcomes, key=lambda o: o["attempt"]),
+        "cost": round(budget.spent, 4),
+        "elapsed": round(time.monotonic() - start, 1),
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python best_of_n.py <GitHub Issue URL> [attempts]")
+        sys.exit(1)
+    issue_url = sys.argv[1]
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else ATTEMPTS
+
+    router = ModelRouter.from_trajectories()
+    dedup = IssueIndex()
+    memory = FixMemory()
+    memory.ingest_trajectories()
+    analyzer_result = run_analyzer(issue_url, router=router, dedup=dedup, memory=memory)
+    route = analyzer_result.pop("route")
+    tiers = {router.model(tier): tier for tier in router.escalation(route["tiers"]["swe_agent"])}
+    result = asyncio.run(best_of_n(
+        analyzer_result, models=list(tiers), attempts=attempts,
+        revisor_model=router.model(route["tiers"]["revisor"]), router=router, tiers=tiers))
+
+    print("\n------------------------------------------------------\nBest-of-N outcome:")
+    print(json.dumps({k: v for k, v in result.items() if k != "patch"}, indent=2))
+    if result["approved"]:
+        print(f"\n✅ Attempt {result['winner']} approved after {result['elapsed']}s, SWE-agent cost ${result['cost']:.2f}")
+        print(result["patch"])
+        dedup.update(issue_url, status="approved", patch=result["patch"])
+        memory.add(issue_url, analyzer_result["problem_statement"], result["patch"], "approved",
+                   instance_id=instance_id(issue_url))
+    else:
+        print(f"\n❌ No approved patch after {result['elapsed']}s, SWE-agent cost ${result['cost']:.2f}")
+    print(WORKSPACES.report())
+    print("\nCost by stage:")
+    for stage, totals in LEDGER.by("stage").items():
+        print(f"  {stage}: {totals['calls']} call(s), ${totals['cost']:.4f}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main()
@@ -0,0 +1,270 @@
+"""
+Distributed batch execution over a shared job queue.
+The coordinator submits issues and follows the queue; workers are stateless
+processes, on any number of machines, that claim jobs from the same queue
+(job_queue.py, SQLite on shared storage by default), run the pipeline and
+write results back. A worker renews its job's lease with a heartbeat while the
+pipeline runs; if the worker dies the lease expires and another worker picks
+the job up again, up to the job's max_attempts. Results are written only by
+the worker still holding the lease, and SWE-agent output goes to the shared
+artifact store (artifact_store.py), so every node sees every patch and
+trajectory. Claims are made per node (worker process), which keeps each
+repository's issues on the node that already holds its clone, index and
+SWE-agent environment (see JobQueue.claim); idle nodes steal from other groups.
+The first job a worker claims from a group prefetches the GitHub context of the
+group's next queued issues in one GraphQL query, so their fetch_issue stages
+read it instead of querying one by one.
+
+Usage:
+  python distributed.py submit <issue_url | file with "<issue_url> [base_commit]" lines> ... [--priority 0] [--wait]
+  python distributed.py status
+  python distributed.py work [--threads 2] [--exit-when-idle]
+  python distributed.py local <N> [--threads 1] [--exit-when-idle]   # N worker processes on this machine
+Common options: --queue sqlite:////shared/swe_jobs.db --artifacts /shared/artifacts --config pipeline.yaml
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+import requests
+
+from artifact_store import ARTIFACT_STORE, ArtifactStore, open_store, run_key
+from github_scheduler import set_default_priority
+from issue_context import ISSUES_PER_QUERY, prefetch_issue_contexts, prefetched
+from job_queue import LEASE_SECONDS, QUEUE_DB, TERMINAL_STATES, JobQueue, open_queue, repo_key
+from pipeline import Pipeline, load_pipeline
+
+POLL_INTERVAL = 1.0
+STATUS_INTERVAL = 10.0
+# Network, GitHub and git/docker subprocess failures that another attempt may not hit
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout,
+                    subprocess.SubprocessError)
+# GitHub answers rate limits with 403/429 and outages with 5xx
+TRANSIENT_STATUS = (403, 429, 500, 502, 503, 504)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a job failure (or an error it was raised from) is worth another attempt"""
+    while error is not None:
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        response = getattr(error, "response", None)
+        if isinstance(error, requests.HTTPError) and response is not None and \
+                response.status_code in TRANSIENT_STATUS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class Worker:
+    """Claims jobs, keeps their lease alive while the pipeline runs and writes the result once"""
+    def __init__(self, queue: JobQueue, pipeline: Pipeline, name: str,
+                 lease_seconds: float = LEASE_SECONDS, store: Optional[ArtifactStore] = None,
+                 node: Optional[str] = None):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.name = name
+        # Workers sharing a process share its warm caches, so repository affinity is tracked per node
+        self.node = node or name
+        self.lease_seconds = lease_seconds
+        self.store = store
+        self.current: Optional[str] = None
+
+    def _heartbeat(self, job_id: str, done: threading.Event, lost: threading.Event):
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(job_id, self.name, self.lease_seconds):
+                lost.set()
+                return
+
+    def _prefetch(self, job: Dict[str, Any]):
+        """Contexts of this job and the next queued issues of its repository, this node's likely next claims"""
+        if prefetched(job["issue_url"]):
+            return
+        repo = job.get("repo") or repo_key(job["issue_url"])
+        urls = [job["issue_url"]] + self.queue.upcoming(repo, ISSUES_PER_QUERY - 1)
+        try:
+            prefetch_issue_contexts(urls)
+        except Exception as e:
+            # Each job's fetch_issue stage still queries its own issue
+            print(f"⚠️  [{self.name}] Prefetching {len(urls)} issue context(s) failed: {e}")
+
+    def run_job(self, job: Dict[str, Any]) -> bool:
+        """Run one claimed job; False when the lease was lost and the result was dropped"""
+        print(f"▶️  [{self.name}] Job {job['id']} (attempt {job['attempts']}, {job['locality']}): {job['issue_url']}")
+        self._prefetch(job)
+        done, lost = threading.Event(), threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job["id"], done, lost), daemon=True)
+        beat.start()
+        run_id = f"{job['id']}-a{job['attempts']}"
+        # The commit a batch line named is the one SWE-agent's checkout is provisioned at
+        base_commit = (job.get("payload") or {}).get("base_commit", "")
+        try:
+            values = self.pipeline.run({"issue_url": job["issue_url"], "run_id": run_id, "base_commit": base_commit},
+                                       on_event=lambda event: self.queue.add_event(job["id"], event))
+            result = json.loads(json.dumps(values, default=str))
+        except Exception as e:
+            traceback.print_exc()
+            # Transient failures go back to the queue while the job has attempts left
+            retry = is_transient(e)
+            if self.queue.fail(job["id"], str(e), worker=self.name, retry=retry):
+                print(f"{'🔁' if retry else '❌'} [{self.name}] Job {job['id']} failed: {e}")
+            return not lost.is_set()
+        finally:
+            done.set()
+            beat.join()
+        if not self.queue.complete(job["id"], result, worker=self.name):
+            print(f"⚠️  [{self.name}] Lost the lease on job {job['id']}, dropping its result")
+            return False
+        if self.store is not None:
+            self.store.put_json(run_key(job["issue_url"], run_id), "result.json", dict(result, job_id=job["id"]))
+        print(f"✅ [{self.name}] Job {job['id']} done")
+        return True
+
+    def run_forever(self, stop: threading.Event, wake: Optional[threading.Condition] = None,
+                    exit_when_idle: bool = False):
+        while not stop.is_set():
+            job = self.queue.claim(self.name, self.lease_seconds, node=self.node)
+            if job is None:
+                if exit_when_idle and not self.queue.counts().get("running"):
+                    return
+                if wake is not None:
+                    with wake:
+                        wake.wait(POLL_INTERVAL)
+                else:
+                    stop.wait(POLL_INTERVAL)
+                continue
+            self.current = job["id"]
+            try:
+                self.run_job(job)
+            finally:
+                self.current = None
+
+
+def work(queue_url: str, config: str, threads: int = 1, lease_seconds: float = LEASE_SECONDS,
+         artifacts: str = ARTIFACT_STORE, exit_when_idle: bool = False):
+    """Worker process: `threads` workers sharing one warm pipeline"""
+    # Batch traffic; interactive CLI runs sharing the GitHub tokens go first
+    set_default_priority("batch")
+    if artifacts:
+        # Stage adapters open the store from the environment
+        os.environ["SWE_ARTIFACT_STORE"] = artifacts
+    queue = open_queue(queue_url)
+    pipeline = load_pipeline(config)
+    store = open_store(artifacts)
+    stop = threading.Event()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    workers = [Worker(queue, pipeline, f"{prefix}-{i + 1}", lease_seconds, store, node=prefix)
+               for i in range(threads)]
+    pool = [threading.Thread(target=w.run_forever, args=(stop, None, exit_when_idle), daemon=True)
+            for w in workers]
+    print(f"🛠️  {prefix}: {threads} worker thread(s) on {queue_url}")
+    for thread in pool:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        # Jobs still running are not failed here; their leases expire and another worker retries them
+        stop.set()
+    finally:
+        pipeline.shutdown()
+
+
+def local(count: int, argv: list) -> int:
+    """Start `count` worker processes on this machine (local batches and multi-worker tests)"""
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "work", *argv]) for _ in range(count)]
+    print(f"🚀 Started {count} local worker process(es): {[p.pid for p in procs]}")
+    try:
+        return max(p.wait() for p in procs)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        return 130
+
+
+def print_status(queue: JobQueue):
+    counts = queue.counts()
+    print("📊 " + (", ".join(f"{status}: {n}" for status, n in sorted(counts.items())) or "queue is empty"))
+    for job in queue.list("running"):
+        print(f"   ⏳ {job['id']} {job['issue_url']} on {job['worker']} (attempt {job['attempts']})")
+    locality = queue.locality()
+    if locality["jobs"]:
+        print(f"📍 Repo cache hits: {locality['hit_rate']:.0%} of {locality['jobs']} job(s) over "
+              f"{locality['repos']} repo(s) and {locality['nodes']} node(s); FIFO order would give "
+              f"{locality['fifo_hit_rate']:.0%}  {locality['by_tier']}")
+
+
+def wait_for(queue: JobQueue, job_ids: list):
+    """Block until every job is done, failed or cancelled, printing progress"""
+    pending = set(job_ids)
+    while pending:
+        time.sleep(STATUS_INTERVAL)
+        pending = {job_id for job_id in pending if queue.get(job_id)["status"] not in TERMINAL_STATES}
+        print(f"⏳ {len(job_ids) - len(pending)}/{len(job_ids)} job(s) finished")
+    for job_id in job_ids:
+        job = queue.get(job_id)
+        print(f"   {job['status']:>9}  {job['issue_url']}" + (f"  ({job['error']})" if job.get("error") else ""))
+    print_status(queue)
+
+
+def read_issues(values: list) -> list:
+    """[(issue_url, payload)]; lines in a file may name the commit to run SWE-agent on after the URL"""
+    issues = []
+    for value in values:
+        if not os.path.isfile(value):
+            issues.append((value, {}))
+            continue
+        with open(value, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if fields and not fields[0].startswith("#"):
+                    issues.append((fields[0], {"base_commit": fields[1]} if len(fields) > 1 else {}))
+    # Submitted grouped by (owner, repo, commit) so a node works through a group back to back
+    return sorted(issues, key=lambda issue: (repo_key(issue[0]), issue[1].get("base_commit", "")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinator and workers for distributed SWE-lutions batches")
+    parser.add_argument("command", choices=["submit", "status", "work", "local"])
+    parser.add_argument("args", nargs="*", help="issue URLs or files for submit, the process count for local")
+    parser.add_argument("--queue", default=QUEUE_DB, help="job queue, e.g. sqlite:////shared/swe_jobs.db")
+    parser.add_argument("--artifacts", default=ARTIFACT_STORE, help="shared artifact store directory")
+    parser.add_argument("--config", default="pipeline.yaml", help="Pipeline definition")
+    parser.add_argument("--threads", type=int, default=1, help="jobs run at the same time per worker process")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="seconds before a silent worker's job is retried")
+    parser.add_argument("--priority", type=int, default=0)
+    parser.add_argument("--wait", action="store_true", help="submit: wait until the jobs finish")
+    parser.add_argument("--exit-when-idle", action="store_true", help="work/local: stop once the queue is drained")
+    args = parser.parse_args()
+
+    if args.command == "work":
+        work(args.queue, args.config, args.threads, args.lease, args.artifacts, args.exit_when_idle)
+    elif args.command == "local":
+        if len(args.args) != 1 or not args.args[0].isdigit():
+            parser.error("local takes the number of worker processes")
+        forwarded = ["--queue", args.queue, "--config", args.config, "--threads", str(args.threads),
+                     "--lease", str(args.lease)] + (["--artifacts", args.artifacts] if args.artifacts else []) \
+            + (["--exit-when-idle"] if args.exit_when_idle else [])
+        sys.exit(local(int(args.args[0]), forwarded))
+    else:
+        queue = open_queue(args.queue)
+        if args.command == "status":
+            print_status(queue)
+            return
+        jobs = [queue.submit(url, args.priority, payload) for url, payload in read_issues(args.args)]
+        print(f"📥 {len(jobs)} job(s) queued on {args.queue}")
+        if args.wait:
+            wait_for(queue, [job["id"] for job in jobs])
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    main()
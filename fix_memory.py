@@ -0,0 +1,250 @@
+"""
+Fix memory: past (issue, patch, verdict) records as retrieval context.
+Issue texts are turned into signed hashed word 1-2 gram vectors (DIM features,
+sublinear tf, L2-normalised) and appended to a float32 matrix that is
+memory-mapped for search, so the BLAS product runs on the mapped pages directly.
+Every row's verdict is kept in memory, and a lookup scores only the rows with a
+wanted verdict: a chunked matrix-vector product over them with argpartition
+top-k, one vectorised pass however large the store grows. Records come from
+SWE-agent runs under trajectories/ (problem statement, .patch, exit_status,
+edited files) and from patches the revisor approved. Prompt examples
+(EXAMPLE_VERDICTS) include submitted SWE-agent runs, labelled as unreviewed,
+since nobody checked that those patches are right.
+  vectors.f32    DIM float32 values per row
+  records.jsonl  "row<TAB>key<TAB>json" lines, one per row
+Appends take a lock on records.jsonl and every process picks up the others'
+rows before it searches, so pipeline workers can share one store.
+
+Usage:
+  python fix_memory.py ingest [trajectories_dir]
+  python fix_memory.py search <text_file> [k]
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from llm_usage import truncate_to_tokens
+
+MEMORY_DIR = os.getenv("SWE_FIX_MEMORY_DIR", ".fix_memory")
+DIM = 512
+SEARCH_CHUNK = 65536
+MIN_SCORE = float(os.getenv("FIX_MEMORY_MIN_SCORE", "0.25"))
+USEFUL_VERDICTS = ("approved",)
+# Verdicts offered as prompt examples, each with the label the prompt shows for it
+EXAMPLE_VERDICTS = ("approved", "submitted")
+VERDICT_LABELS = {"approved": "patch approved by the reviewer",
+                  "submitted": "unreviewed SWE-agent patch, may be wrong"}
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]+|\d+")
+# Where the issue ends in a SWE-agent prompt; retrieved examples appended to it are not part of the issue
+ISSUE_END = ("\n\nINSTRUCTIONS:", "\n\n(Open file:", "\n\nPreviously solved issues that look similar:")
+
+
+def features(text: str) -> np.ndarray:
+    """Signed feature hashing of word unigrams and bigrams, unit length"""
+    words = [w.lower() for w in WORD.findall(text)]
+    counts: Dict[int, float] = {}
+    for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        digest = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+        slot = digest % DIM
+        counts[slot] = counts.get(slot, 0.0) + (1.0 if digest >> 63 else -1.0)
+    vector = np.zeros(DIM, dtype=np.float32)
+    if counts:
+        slots = np.fromiter(counts.keys(), dtype=np.int64)
+        values = np.fromiter(counts.values(), dtype=np.float32)
+        vector[slots] = np.sign(values) * np.log1p(np.abs(values))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def trajectory_record(traj_path: str) -> Optional[Dict]:
+    """(issue, patch, verdict) from one SWE-agent .traj and the .patch next to it"""
+    try:
+        with open(traj_path, "r", encoding="utf-8") as f:
+            traj = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    issue = ""
+    for message in traj.get("history", []):
+        content = message.get("content")
+        content = content if isinstance(content, str) else " ".join(
+            part.get("text", "") for part in content or [] if isinstance(part, dict))
+        # The last instance message holds the real issue; earlier ones can be demonstrations
+        if message.get("role") == "user" and "ISSUE:\n" in content:
+            issue = content.split("ISSUE:\n", 1)[1]
+    for marker in ISSUE_END:
+        issue = issue.split(marker, 1)[0]
+    if not issue.strip():
+        return None
+    info = traj.get("info", {})
+    patch_path = os.path.splitext(traj_path)[0] + ".patch"
+    patch = info.get("submission") or ""
+    if not patch and os.path.exists(patch_path):
+        with open(patch_path, "r", encoding="utf-8", errors="replace") as f:
+            patch = f.read()
+    return {
+        "key": os.path.relpath(traj_path),
+        "instance_id": os.path.basename(traj_path)[:-len(".traj")],
+        "problem_statement": issue.strip(),
+        "patch": patch,
+        "verdict": "submitted" if info.get("exit_status") == "submitted" and patch else
+                   (info.get("exit_status") or "unknown"),
+        "edited_files": re.findall(r"\[File: ([^\]]+)\]", info.get("edited_files30") or ""),
+    }
+
+
+class FixMemory:
+    """Append-only vector store of past resolutions with cosine top-k search"""
+    def __init__(self, path: str = MEMORY_DIR):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.records_path = os.path.join(path, "records.jsonl")
+        self.offsets: List[int] = []
+        self.rows_by_key: Dict[str, int] = {}
+        # Per row, for masking rows out of a search without reading their records
+        self.verdicts: List[str] = []
+        self.instances: List[str] = []
+        self._verdict_array = np.zeros(0, dtype=str)
+        self._instance_array = np.zeros(0, dtype=str)
+        self._end = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._refresh()
+
+    def _refresh(self):
+        """Read the records appended since the last call, by this process or another one"""
+        if not os.path.exists(self.records_path) or os.path.getsize(self.records_path) == self._end:
+            return
+        with open(self.records_path, "rb") as f:
+            f.seek(self._end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                row, key, data = line.split(b"\t", 2)
+                record = json.loads(data)
+                self.offsets.append(self._end)
+                self.rows_by_key[key.decode("utf-8")] = int(row)
+                self.verdicts.append(record.get("verdict") or "")
+                self.instances.append(record.get("instance_id") or "")
+                self._end += len(line)
+        self._verdict_array = np.array(self.verdicts, dtype=str)
+        self._instance_array = np.array(self.instances, dtype=str)
+        self._map()
+
+    def _map(self):
+        rows = os.path.getsize(self.vectors_path) // (DIM * 4) if os.path.exists(self.vectors_path) else 0
+        # A crash between the two appends leaves a vector without a record; ignore it
+        rows = min(rows, len(self.offsets))
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, DIM)) \
+            if rows else np.zeros((0, DIM), dtype=np.float32)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def record(self, row: int) -> Dict:
+        with open(self.records_path, "rb") as f:
+            f.seek(self.offsets[row])
+            return json.loads(f.readline().split(b"\t", 2)[2])
+
+    def add(self, key: str, problem_statement: str, patch: str, verdict: str, **fields) -> Optional[int]:
+        """Store one resolution; a key that is already stored is skipped"""
+        with self._lock, open(self.records_path, "ab") as records:
+            # Other processes append to the same files; rows are numbered under the lock
+            fcntl.flock(records, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if key in self.rows_by_key:
+                    return None
+                row = len(self.offsets)
+                with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                    f.seek(row * DIM * 4)
+                    f.write(features(problem_statement).astype(np.float32).tobytes())
+                record = dict(fields, key=key, problem_statement=problem_statement[:4000], patch=patch[:20000],
+                              verdict=verdict)
+                records.write(f"{row}\t{key}\t{json.dumps(record, default=str)}\n".encode("utf-8"))
+                records.flush()
+                self._refresh()
+            finally:
+                fcntl.flock(records, fcntl.LOCK_UN)
+        return row
+
+    def ingest_trajectories(self, trajectories_dir: str = "trajectories") -> int:
+        added = 0
+        for traj_path in sorted(glob.glob(os.path.join(trajectories_dir, "**", "*.traj"), recursive=True)):
+            if os.path.relpath(traj_path) in self.rows_by_key:
+                continue
+            record = trajectory_record(traj_path)
+            if record and self.add(**record) is not None:
+                added += 1
+        return added
+
+    def search(self, text: str, k: int = 3, min_score: float = MIN_SCORE,
+               verdicts=USEFUL_VERDICTS, exclude=()) -> List[tuple]:
+        """
+        [(cosine, record)] of the k most similar stored issues with one of the given verdicts.
+        Records whose key or instance_id is in exclude (the issue being solved) are skipped.
+        """
+        query = features(text)
+        with self._lock:
+            self._refresh()
+            vectors = self.vectors
+            count = len(vectors)
+            wanted = np.isin(self._verdict_array[:count], list(verdicts)) & \
+                ~np.isin(self._instance_array[:count], list(exclude))
+            for key in exclude:
+                if self.rows_by_key.get(key, count) < count:
+                    wanted[self.rows_by_key[key]] = False
+        rows = np.flatnonzero(wanted)
+        if not rows.size or not query.any():
+            return []
+        # Only rows with a wanted verdict are scored, so every top-k candidate is usable
+        best_rows, best_scores = [], []
+        for start in range(0, rows.size, SEARCH_CHUNK):
+            chunk = rows[start:start + SEARCH_CHUNK]
+            scores = vectors[chunk] @ query
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_rows.append(chunk[top])
+            best_scores.append(scores[top])
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        matches = []
+        for i in np.argsort(-scores)[:k]:
+            if scores[i] < min_score:
+                break
+            matches.append((round(float(scores[i]), 3), self.record(int(rows[i]))))
+        return matches
+
+
+def format_examples(matches: List[tuple], max_tokens: int = 1500) -> str:
+    """Prompt block with the retrieved issues and their patches, within max_tokens"""
+    if not matches:
+        return ""
+    per_example = max(max_tokens // len(matches), 100)
+    blocks = []
+    for score, record in matches:
+        label = VERDICT_LABELS.get(record.get("verdict"), record.get("verdict"))
+        block = (f"Similar past issue ({label}, similarity {score}):\n"
+                 f"{record['problem_statement']}\n\nPatch that resolved it:\n{record.get('patch', '')}")
+        blocks.append(truncate_to_tokens(block, per_example))
+    return "Previously solved issues that look similar:\n\n" + "\n\n---\n\n".join(blocks)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("ingest", "search"):
+        print("Usage: python fix_memory.py ingest [trajectories_dir] | search <text_file> [k]")
+        sys.exit(1)
+    memory = FixMemory()
+    if sys.argv[1] == "ingest":
+        added = memory.ingest_trajectories(sys.argv[2] if len(sys.argv) > 2 else "trajectories")
+        print(f"🧠 {added} new resolution(s), {len(memory)} in the fix memory")
+    else:
+        with open(sys.argv[2], "r", encoding="utf-8") as f:
+            query_text = f.read()
+        for score, rec in memory.search(query_text, k=int(sys.argv[3]) if len(sys.argv) > 3 else 3):
+            print(f"{score:.3f}  {rec['key']}  [{rec['verdict']}]  {rec['problem_statement'][:80]!r}")
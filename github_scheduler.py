@@ -0,0 +1,333 @@
+"""
+Central scheduler for GitHub HTTP requests.
+Requests are sent through a pool of tokens (GITHUB_TOKENS, comma-separated,
+plus GITHUB_TOKEN). The X-RateLimit-* headers of every response update the
+remaining quota of the token that was used. When every token is close to
+exhausted, requests wait for the earliest reset instead of failing. Waiting
+requests are served interactive first, then batch, and batch requests leave
+a BATCH_RESERVE fraction of each token's hourly limit untouched for
+interactive runs (50 of 5000 for a token, 1 of 60 anonymously).
+
+Usage: python github_scheduler.py --demo
+runs a local stub server that imitates GitHub's rate-limit headers and shows
+how the scheduler spreads and orders requests over a small token pool.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GITHUB_API = "https://api.github.com"
+API_URL = os.getenv("GITHUB_API_URL", GITHUB_API).rstrip("/")
+HTTP_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "16"))
+HTTP_TIMEOUT = float(os.getenv("GITHUB_API_TIMEOUT", "30"))
+MIN_REMAINING = int(os.getenv("GITHUB_MIN_REMAINING", "2"))
+BATCH_RESERVE = float(os.getenv("GITHUB_BATCH_RESERVE", "0.01"))
+MAX_RETRIES = 3
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class TokenState:
+    """Quota of one token as last reported by GitHub"""
+    def __init__(self, token: Optional[str]):
+        self.token = token
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.in_flight = 0
+        self.requests = 0
+
+    @property
+    def label(self) -> str:
+        return f"…{self.token[-4:]}" if self.token else "anonymous"
+
+    def available(self, now: float) -> Optional[int]:
+        """Calls that can still be started; None when GitHub has not told us yet"""
+        if self.remaining is None:
+            return None
+        if now >= self.reset_at and self.reset_at:
+            # Window rolled over; the next response will report the new quota
+            self.remaining = None
+            return None
+        return self.remaining - self.in_flight
+
+    def reserve(self, fraction: float) -> int:
+        """Calls kept back out of this token's limit, at least one while any fraction is asked for"""
+        return math.ceil((self.limit or 0) * fraction)
+
+    def update(self, headers):
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        self.remaining = int(headers["X-RateLimit-Remaining"])
+        self.limit = int(headers.get("X-RateLimit-Limit", self.limit or 0))
+        self.reset_at = float(headers.get("X-RateLimit-Reset", self.reset_at))
+
+
+def configured_tokens() -> List[Optional[str]]:
+    tokens = [t.strip() for t in os.getenv("GITHUB_TOKENS", "").split(",") if t.strip()]
+    if os.getenv("GITHUB_TOKEN") and os.getenv("GITHUB_TOKEN") not in tokens:
+        tokens.append(os.getenv("GITHUB_TOKEN"))
+    # No token at all: anonymous requests, 60 per hour
+    return tokens or [None]
+
+
+class GitHubScheduler:
+    """Thread-safe token pool with priority ordering and rate-limit aware waiting"""
+    def __init__(self, tokens: Optional[List[Optional[str]]] = None, api_url: str = API_URL,
+                 min_remaining: int = MIN_REMAINING, batch_reserve: float = BATCH_RESERVE,
+                 default_priority: str = "interactive"):
+        self.tokens = [TokenState(t) for t in (tokens if tokens is not None else configured_tokens())]
+        self.api_url = api_url.rstrip("/")
+        parsed = urlparse(self.api_url)
+        self._api_origin = (parsed.scheme, parsed.netloc.lower())
+        self.min_remaining = min_remaining
+        self.batch_reserve = batch_reserve
+        self.default_priority = default_priority
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        self.waited = 0.0
+        self._waiting: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._quiet_until = 0.0
+
+    # ---- token selection -------------------------------------------------
+
+    def _pick(self, priority: str, now: float) -> Optional[TokenState]:
+        best, best_left = None, -1
+        for state in self.tokens:
+            left = state.available(now)
+            if left is None:
+                # Unknown quota: try it, but only one request at a time until headers arrive
+                if state.in_flight == 0:
+                    return state
+                continue
+            # Tokens differ in limit (60 anonymous, 5000 with a token), so the reserve is per token
+            floor = self.min_remaining + (state.reserve(self.batch_reserve) if priority == "batch" else 0)
+            if left > floor and left > best_left:
+                best, best_left = state, left
+        return best
+
+    def _next_reset(self, now: float) -> float:
+        resets = [s.reset_at for s in self.tokens if s.reset_at > now]
+        return min(resets) - now if resets else 1.0
+
+    def _acquire(self, priority: str) -> TokenState:
+        with self._cond:
+            ticket = (PRIORITIES.get(priority, 1), next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            started = time.time()
+            while True:
+                now = time.time()
+                if self._waiting[0] == ticket:
+                    state = self._pick(priority, now)
+                    if state is not None:
+                        heapq.heappop(self._waiting)
+                        state.in_flight += 1
+                        state.requests += 1
+                        self.waited += now - started
+                        self._cond.notify_all()
+                        return state
+                    if any(t.remaining is None for t in self.tokens):
+                        # A token's quota is unknown until its first response; wait for that release
+                        self._cond.wait(1.0)
+                        continue
+                    timeout = max(min(self._next_reset(now), 60.0), 0.05)
+                    if now >= self._quiet_until:
+                        print(f"⏳ GitHub quota low on every token; {priority} requests wait {timeout:.1f}s for the reset")
+                        self._quiet_until = now + timeout
+                else:
+                    timeout = 1.0
+                self._cond.wait(timeout)
+
+    def _release(self, state: TokenState, headers=None):
+        with self._cond:
+            state.in_flight -= 1
+            if headers is not None:
+                state.update(headers)
+            self._cond.notify_all()
+
+    # ---- requests --------------------------------------------------------
+
+    def _resolve(self, url: str) -> str:
+        if (url == GITHUB_API or url.startswith(GITHUB_API + "/")) and self.api_url != GITHUB_API:
+            return self.api_url + url[len(GITHUB_API):]
+        return url
+
+    def _trusted(self, url: str) -> bool:
+        """Tokens only go to GitHub's API host (or the configured one); tools can pass model-supplied URLs"""
+        parsed = urlparse(url)
+        origin = (parsed.scheme, parsed.netloc.lower())
+        return origin in {("https", "api.github.com"), self._api_origin}
+
+    def request(self, method: str, url: str, priority: Optional[str] = None, **kwargs) -> requests.Response:
+        """Send a request with the best available token; rate-limited responses are retried after the reset"""
+        priority = priority or self.default_priority
+        url = self._resolve(url)
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        extra_headers = kwargs.pop("headers", None) or {}
+        if not self._trusted(url):
+            # Not GitHub: no token and no share of the pool's quota
+            return self.session.request(method, url, headers=extra_headers, **kwargs)
+        for attempt in range(MAX_RETRIES + 1):
+            state = self._acquire(priority)
+            headers = dict(extra_headers)
+            if state.token:
+                headers["Authorization"] = f"Bearer {state.token}"
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except Exception:
+                self._release(state)
+                raise
+            self._release(state, response.headers)
+            rate_limited = response.status_code in (403, 429) and (
+                response.headers.get("X-RateLimit-Remaining") == "0" or "Retry-After" in response.headers)
+            if not rate_limited or attempt == MAX_RETRIES:
+                return response
+            if "Retry-After" in response.headers:
+                time.sleep(min(float(response.headers["Retry-After"]), 60.0))
+            print(f"⚠️  Rate limited on token {state.label}; retrying ({attempt + 1}/{MAX_RETRIES})")
+        return response
+
+    def get(self, url: str, priority: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, priority=priority, **kwargs)
+
+    def post(self, url: str, priority: Optional[str] = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, priority=priority, **kwargs)
+
+    def report(self) -> str:
+        lines = [f"{'token':<12} {'requests':>8} {'remaining':>9} {'limit':>6} {'resets in':>9}"]
+        now = time.time()
+        for s in self.tokens:
+            resets = f"{max(s.reset_at - now, 0):.0f}s" if s.reset_at else "-"
+            lines.append(f"{s.label:<12} {s.requests:>8} {str(s.remaining if s.remaining is not None else '?'):>9} "
+                         f"{str(s.limit or '?'):>6} {resets:>9}")
+        lines.append(f"total wait for quota: {self.waited:.1f}s")
+        return "\n".join(lines)
+
+
+SCHEDULER = GitHubScheduler()
+
+
+def github_get(url: str, priority: Optional[str] = None, **kwargs) -> requests.Response:
+    return SCHEDULER.get(url, priority=priority, **kwargs)
+
+
+def github_post(url: str, priority: Optional[str] = None, **kwargs) -> requests.Response:
+    return SCHEDULER.post(url, priority=priority, **kwargs)
+
+
+def set_default_priority(priority: str):
+    """Batch entry points call set_default_priority("batch") so interactive runs go first"""
+    SCHEDULER.default_priority = priority
+
+
+# ---- local stub server ---------------------------------------------------
+
+class RateLimitStubServer:
+    """
+    Tiny HTTP server imitating GitHub's rate-limit headers: every token gets
+    `limit` calls per `window` seconds and a 403 with X-RateLimit-Remaining: 0
+    once it is used up. Every path answers {"path": ..., "token": ...}.
+    """
+    def __init__(self, limit: int = 10, window: float = 5.0, port: int = 0):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.limit = limit
+        self.window = window
+        self.used: Dict[str, int] = {}
+        self.window_start = time.time()
+        self.log: List[str] = []
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                token = self.headers.get("Authorization", "anonymous").split()[-1]
+                with lock:
+                    now = time.time()
+                    if now - stub.window_start >= stub.window:
+                        stub.used.clear()
+                        stub.window_start = now
+                    used = stub.used.get(token, 0)
+                    allowed = used < stub.limit
+                    if allowed:
+                        stub.used[token] = used + 1
+                        stub.log.append(self.path)
+                    remaining = stub.limit - stub.used.get(token, 0)
+                    reset = stub.window_start + stub.window
+                body = json.dumps({"path": self.path, "token": token} if allowed
+                                  else {"message": "API rate limit exceeded"}).encode("utf-8")
+                self.send_response(200 if allowed else 403)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-RateLimit-Limit", str(stub.limit))
+                self.send_header("X-RateLimit-Remaining", str(remaining))
+                self.send_header("X-RateLimit-Reset", f"{reset:.3f}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_demo():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with RateLimitStubServer(limit=10, window=3.0) as stub:
+        scheduler = GitHubScheduler(tokens=["token-aaaa", "token-bbbb"], api_url=stub.url,
+                                    min_remaining=1, batch_reserve=0.3)
+        print(f"Stub at {stub.url}: 2 tokens x {stub.limit} calls per {stub.window:.0f}s window")
+
+        def fetch(job):
+            priority, n = job
+            response = scheduler.get(f"{GITHUB_API}/{priority}/{n}", priority=priority)
+            return response.status_code
+
+        # 30 batch requests queued first, then 6 interactive ones that should jump the queue
+        jobs = [("batch", i) for i in range(30)] + [("interactive", i) for i in range(6)]
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = [pool.submit(fetch, job) for job in jobs[:30]]
+            time.sleep(0.5)
+            futures += [pool.submit(fetch, job) for job in jobs[30:]]
+            statuses = [f.result() for f in futures]
+        elapsed = time.time() - start
+
+        print(f"{len(jobs)} requests in {elapsed:.1f}s, status codes: "
+              + ", ".join(f"{code} x{statuses.count(code)}" for code in sorted(set(statuses))))
+        last_interactive = max(i for i, path in enumerate(stub.log) if path.startswith("/interactive"))
+        print(f"Last interactive request served as #{last_interactive + 1} of {len(stub.log)}")
+        print(scheduler.report())
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--demo" in sys.argv:
+        run_demo()
+    else:
+        print(__doc__)
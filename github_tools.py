@@ -0,0 +1,520 @@
+"""
+Shared GitHub tools for the autogen agents.
+Tools are registered once in TOOLS and attached to agents with register_tools,
+which also times and counts every invocation. They are backed by a RepoService
+per repository: API calls go through the github_scheduler token pool and are
+cached, and a local shallow clone with a repo_index index lets
+search_python_files grep locally instead of the LLM fetching files one by one.
+"""
+import asyncio
+import ast
+import base64
+import fnmatch
+import functools
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import repo_index
+from github_scheduler import github_get
+from llm_usage import estimate_tokens, truncate_to_tokens
+from tool_cache import ToolSession
+
+REPO_CACHE_DIR = os.getenv("SWE_REPO_CACHE_DIR", ".repo_cache")
+API_CACHE_TTL = float(os.getenv("GITHUB_CACHE_TTL", "300"))
+API_CACHE_SIZE = int(os.getenv("GITHUB_CACHE_SIZE", "1024"))
+MAX_LINE_CHARS = 200
+DEFAULT_VIEW_LINES = 80
+MAX_VIEW_LINES = 200
+MAX_SEARCH_HITS = 5
+TREE_TOKEN_BUDGET = 1500
+COLLAPSE_THRESHOLD = 300
+# Vendored or generated trees that are listed as one summary line
+COLLAPSE_DIRS = {"node_modules", "vendor", "third_party", "site-packages", "dist", "build", ".git", "__pycache__"}
+SYMBOL_PATTERN = r"^\s*(?:async\s+)?(?:def|class|function|func|fn)\s+{name}\b"
+
+
+def convert_web_url_to_api(url: str) -> str:
+    """Convert GitHub web URL to GitHub API URL"""
+    try:
+        if "github.com" in url and "/issues/" in url:
+            parts = url.split("github.com/")[1].split("/issues/")
+            repo_path = parts[0]
+            issue_number = parts[1]
+            return f"https://api.github.com/repos/{repo_path}/issues/{issue_number}"
+        else:
+            raise ValueError("URL format not recognized")
+    except Exception as e:
+        return f"Error converting URL: {str(e)}"
+
+
+# LRU of (fetched at, data) by URL, at most API_CACHE_SIZE entries
+_api_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_api_lock = threading.Lock()
+
+
+def api_get(url: str):
+    """GET a GitHub API URL through the request scheduler, cached for API_CACHE_TTL seconds"""
+    now = time.time()
+    with _api_lock:
+        cached = _api_cache.get(url)
+        if cached and now - cached[0] < API_CACHE_TTL:
+            _api_cache.move_to_end(url)
+            return cached[1]
+    response = github_get(url)
+    response.raise_for_status()
+    data = response.json()
+    with _api_lock:
+        _api_cache[url] = (now, data)
+        _api_cache.move_to_end(url)
+        while len(_api_cache) > API_CACHE_SIZE:
+            _api_cache.popitem(last=False)
+    return data
+
+
+def clone_repo(owner: str, repo: str) -> str:
+    """Shallow clone of the default branch, reused across runs"""
+    repo_dir = os.path.abspath(os.path.join(REPO_CACHE_DIR, f"{owner}__{repo}"))
+    if not os.path.isdir(os.path.join(repo_dir, ".git")):
+        os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+        subprocess.run(
+            ["git", "clone", "--depth", "1", f"https://github.com/{owner}/{repo}", repo_dir],
+            capture_output=True, text=True, check=True
+        )
+    return repo_dir
+
+
+class RepoService:
+    """API access and a local indexed checkout for one repository"""
+    def __init__(self, owner: str, repo: str):
+        self.owner = owner
+        self.repo = repo
+        self.api_root = f"https://api.github.com/repos/{owner}/{repo}"
+        self._index: Optional[repo_index.RepoIndex] = None
+        # Head the checkout and index were last synced to; a new commit() triggers another sync
+        self._index_commit: Optional[str] = None
+        self._symbols: Dict[str, Dict[str, tuple]] = {}
+        self._lock = threading.Lock()
+
+    def contents(self, path: str = ""):
+        return api_get(f"{self.api_root}/contents/{path}")
+
+    def file_paths(self) -> List[str]:
+        """Every file path at commit(), from one git trees call; a local index when the tree is truncated"""
+        clone_dir = os.path.join(REPO_CACHE_DIR, f"{self.owner}__{self.repo}", ".git")
+        if self.has_index() or os.path.isdir(clone_dir):
+            return sorted(self.index().files)
+        tree = api_get(f"{self.api_root}/git/trees/{self.commit()}?recursive=1")
+        if tree.get("truncated"):
+            return sorted(self.index().files)
+        return [item["path"] for item in tree.get("tree", []) if item["type"] == "blob"]
+
+    def commit(self) -> str:
+        """SHA of the default branch head (cached like any other API call)"""
+        return api_get(f"{self.api_root}/commits/HEAD")["sha"]
+
+    def _sync_checkout(self, repo_dir: str, index_path: str, remote_head: str) -> bool:
+        """Move a cached clone to remote_head and reindex it; False when the checkout could not be moved"""
+        head = subprocess.run(["git", "-C", repo_dir, "rev-parse", "HEAD"],
+                              capture_output=True, text=True).stdout.strip()
+        if head == remote_head:
+            return True
+        print(f"🔄 Updating cached checkout of {self.owner}/{self.repo} to {remote_head[:8]}")
+        for args in (["fetch", "--depth", "1", "origin", remote_head], ["reset", "--hard", "FETCH_HEAD"]):
+            result = subprocess.run(["git", "-C", repo_dir, *args], capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"⚠️  git {args[0]} of {self.owner}/{self.repo} at {remote_head[:8]} failed, "
+                      f"keeping the cached checkout: {result.stderr.strip()}")
+                return False
+        # Replaced in place rather than deleted, so other processes always find an index
+        repo_index.build_index(repo_dir, index_path)
+        return True
+
+    def checkout(self) -> str:
+        """Local clone at commit(), re-synced (with its index) whenever the head moves"""
+        return self.index().root
+
+    def index(self) -> repo_index.RepoIndex:
+        """Clone and index the repo on first use and again after commit() moves; otherwise reuse the mmap'ed index"""
+        try:
+            head = self.commit()
+        except Exception:
+            # Offline: keep reading whatever is checked out
+            head = None
+        with self._lock:
+            if self._index is None or (head and head != self._index_commit):
+                repo_dir = clone_repo(self.owner, self.repo)
+                index_path = repo_index.index_path_for(repo_dir)
+                synced = bool(head) and self._sync_checkout(repo_dir, index_path, head)
+                if not os.path.exists(index_path + ".json"):
+                    repo_index.build_index(repo_dir, index_path)
+                if synced or self._index is None:
+                    self._index = repo_index.open_index(index_path)
+                    self._symbols.clear()
+                # Only a completed sync counts; after a failure the next call tries again
+                if synced:
+                    self._index_commit = head
+            return self._index
+
+    def has_index(self) -> bool:
+        return self._index is not None
+
+    def file_text(self, path: str) -> str:
+        path = path.strip().lstrip("/")
+        # A clone from an earlier search or run is reused instead of another API call
+        if self.has_index() or os.path.isdir(os.path.join(REPO_CACHE_DIR, f"{self.owner}__{self.repo}", ".git")):
+            index = self.index()
+            if path in index.files:
+                return index.text(path)
+        file_data = self.contents(path)
+        if file_data.get("encoding") != "base64":
+            raise ValueError(f"Could not decode file content for {path}")
+        return base64.b64decode(file_data["content"]).decode("utf-8")
+
+    def symbol_range(self, path: str, symbol: str) -> Optional[tuple]:
+        """(first, last) line of a def/class; "Class.method" picks a method of a class"""
+        index = self.index()
+        with self._lock:
+            symbols = self._symbols.get(path)
+        if symbols is None:
+            symbols = {}
+            if path.endswith(".py"):
+                try:
+                    tree = ast.parse(index.text(path))
+                except (SyntaxError, ValueError):
+                    tree = None
+                stack = [(tree, "")] if tree else []
+                while stack:
+                    node, prefix = stack.pop()
+                    for child in ast.iter_child_nodes(node):
+                        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                            name = f"{prefix}{child.name}"
+                            symbols.setdefault(name, (child.lineno, child.end_lineno or child.lineno))
+                            symbols.setdefault(child.name, symbols[name])
+                            stack.append((child, f"{name}."))
+            with self._lock:
+                self._symbols[path] = symbols
+        if symbol in symbols:
+            return symbols[symbol]
+        # Other languages: first line that looks like a definition, shown with a fixed window
+        pattern = re.compile(SYMBOL_PATTERN.format(name=re.escape(symbol.split(".")[-1])).encode("utf-8"),
+                             re.MULTILINE)
+        for _, line_no, _ in index.grep(pattern, max_results=1, paths=[path]):
+            return line_no, line_no + DEFAULT_VIEW_LINES - 1
+        return None
+
+    @staticmethod
+    def compile_query(query: str) -> "re.Pattern":
+        """Regex when the query is one, plain text otherwise; case-insensitive"""
+        try:
+            return re.compile(query.encode("utf-8"), re.IGNORECASE)
+        except re.error:
+            return re.compile(re.escape(query.encode("utf-8")), re.IGNORECASE)
+
+    def search(self, query: str, suffix: str = ".py", max_results: int = 50) -> List[tuple]:
+        return self.index().grep(self.compile_query(query), suffix=suffix, max_results=max_results)
+
+
+_services: Dict[str, RepoService] = {}
+_services_lock = threading.Lock()
+
+
+def get_repo_service(owner: str, repo: str) -> RepoService:
+    key = f"{owner}/{repo}".lower()
+    with _services_lock:
+        if key not in _services:
+            _services[key] = RepoService(owner, repo)
+        return _services[key]
+
+
+def repo_commit_for(arguments: Dict) -> Optional[str]:
+    """Commit a tool call depends on, for tools that take repo_owner/repo_name"""
+    if "repo_owner" not in arguments or "repo_name" not in arguments:
+        return None
+    return get_repo_service(arguments["repo_owner"], arguments["repo_name"]).commit()
+
+
+# ---- tool registry -------------------------------------------------------
+
+TOOLS: Dict[str, Dict] = {}
+
+
+class ToolStats:
+    """Thread-safe call counts and timings per tool"""
+    def __init__(self):
+        self.calls: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, failed: bool):
+        with self._lock:
+            stats = self.calls.setdefault(name, {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += 1 if failed else 0
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def report(self) -> str:
+        lines = [f"{'tool':<26} {'calls':>5} {'errors':>6} {'total s':>8} {'mean s':>7} {'max s':>7}"]
+        with self._lock:
+            for name, s in sorted(self.calls.items()):
+                lines.append(f"{name:<26} {s['calls']:>5} {s['errors']:>6} {s['total']:>8.2f} "
+                             f"{s['total'] / s['calls']:>7.3f} {s['max']:>7.3f}")
+        return "\n".join(lines)
+
+
+TOOL_STATS = ToolStats()
+
+
+def tool(description: str):
+    """Add a function to TOOLS under its own name; every call, direct or from an agent, is timed"""
+    def decorator(func: Callable) -> Callable:
+        name = func.__name__
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                failed = not isinstance(result, str) or result.startswith("Error")
+                TOOL_STATS.record(name, time.perf_counter() - start, failed)
+
+        TOOLS[name] = {"function": timed, "description": description}
+        return timed
+    return decorator
+
+
+def _async_tool(func: Callable) -> Callable:
+    """Same tool as a coroutine that runs in a worker thread, for agents driven by an event loop"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+def register_tools(caller, executor=None, names: Optional[List[str]] = None, asynchronous: bool = False,
+                   session: Optional[ToolSession] = None):
+    """
+    Expose tools to caller's LLM and execute them on executor (defaults to caller itself).
+    With a ToolSession, results are memoised and paged, and read_tool_result is registered too.
+    """
+    executor = executor or caller
+    entries = {name: TOOLS[name] for name in names or list(TOOLS)}
+    if session is not None:
+        entries = {name: dict(entry, function=session.wrap(name, entry["function"]))
+                   for name, entry in entries.items()}
+        entries["read_tool_result"] = {
+            "function": session.read_tool_result,
+            "description": "Read another page of an earlier, truncated tool result by its handle",
+        }
+    for name, entry in entries.items():
+        function = _async_tool(entry["function"]) if asynchronous else entry["function"]
+        executor.register_for_execution(name=name)(function)
+        caller.register_for_llm(name=name, description=entry["description"])(function)
+    print(f"🔧 Registered {len(entries)} tool(s) for {caller.name}")
+
+
+# ---- tools ---------------------------------------------------------------
+
+@tool("Fetch GitHub issue details using the full issue API URL")
+def get_github_issue(issue_url: str) -> str:
+    """Fetch GitHub issue details from API"""
+    try:
+        issue_data = api_get(issue_url)
+
+        return f"""
+Title: {issue_data['title']}
+State: {issue_data['state']}
+URL: {issue_data['html_url']}
+Body: {issue_data['body']}
+"""
+    except Exception as e:
+        return f"Error fetching issue: {str(e)}"
+
+
+def _tree(paths: List[str]) -> Dict:
+    """Nested dict of directories; files are collected under the "" key"""
+    root: Dict = {"": []}
+    for path in paths:
+        node = root
+        *dirs, name = path.split("/")
+        for d in dirs:
+            node = node.setdefault(d, {"": []})
+        node[""].append(name)
+    return root
+
+
+def _count_files(node: Dict) -> int:
+    return len(node[""]) + sum(_count_files(child) for name, child in node.items() if name)
+
+
+def _extensions(node: Dict, counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    counts = {} if counts is None else counts
+    for name in node[""]:
+        ext = os.path.splitext(name)[1] or name
+        counts[ext] = counts.get(ext, 0) + 1
+    for name, child in node.items():
+        if name:
+            _extensions(child, counts)
+    return counts
+
+
+def _summary(name: str, node: Dict) -> str:
+    top = sorted(_extensions(node).items(), key=lambda item: -item[1])[:3]
+    return f"{name}/ ({_count_files(node)} files: " + ", ".join(f"{ext} {n}" for ext, n in top) + ")"
+
+
+def _render(node: Dict, depth: int, indent: str = "") -> List[str]:
+    """Directories first; below `depth` levels, or for vendored/huge trees, one summary line"""
+    lines = []
+    for name in sorted(k for k in node if k):
+        child = node[name]
+        if depth <= 1 or name in COLLAPSE_DIRS or _count_files(child) > COLLAPSE_THRESHOLD:
+            lines.append(f"{indent}{_summary(name, child)}")
+        else:
+            lines.append(f"{indent}{name}/")
+            lines.extend(_render(child, depth - 1, indent + "  "))
+    lines.extend(f"{indent}{name}" for name in sorted(node[""]))
+    return lines
+
+
+def _tree_depth(node: Dict) -> int:
+    return 1 + max((_tree_depth(child) for name, child in node.items() if name), default=0)
+
+
+@tool("List the repository tree recursively in one call. Filter with a glob pattern "
+      "(e.g. '*.py' or 'tests/*,*.cfg'), limit max_depth, and the listing is shortened to fit max_tokens")
+def get_repository_structure(repo_owner: str, repo_name: str, path: str = "", pattern: str = "",
+                             max_depth: int = 0, max_tokens: int = TREE_TOKEN_BUDGET) -> str:
+    """Repository tree from a single git trees request (or the local clone), rendered compactly"""
+    try:
+        service = get_repo_service(repo_owner, repo_name)
+        prefix = path.strip().strip("/")
+        paths = [p for p in service.file_paths() if not prefix or p.startswith(prefix + "/")]
+        if prefix:
+            paths = [p[len(prefix) + 1:] for p in paths]
+        globs = [g.strip() for g in pattern.split(",") if g.strip()]
+        if globs:
+            paths = [p for p in paths
+                     if any(fnmatch.fnmatch(p, g) or fnmatch.fnmatch(os.path.basename(p), g) for g in globs)]
+        if not paths:
+            return f"No files under '{prefix or '/'}'" + (f" matching {pattern!r}" if pattern else "")
+
+        tree = _tree(paths)
+        deepest = _tree_depth(tree)
+        limit = min(max_depth, deepest) if max_depth > 0 else deepest
+        # Deepest listing that fits the budget; deeper levels show up as per-directory summaries
+        lines = _render(tree, 1)
+        for depth in range(2, limit + 1):
+            candidate = _render(tree, depth)
+            if estimate_tokens("\n".join(candidate)) > max_tokens:
+                break
+            lines = candidate
+        shown = "\n".join(lines)
+        if estimate_tokens(shown) > max_tokens:
+            shown = truncate_to_tokens(shown, max_tokens)
+        header = f"{repo_owner}/{repo_name}:{prefix or '/'} - {len(paths)} file(s)"
+        if pattern:
+            header += f" matching {pattern!r}"
+        return f"{header}\n{shown}"
+    except Exception as e:
+        return f"Error fetching repository structure: {str(e)}"
+
+
+@tool("Get content of a specific file from repository")
+def get_file_content(repo_owner: str, repo_name: str, file_path: str) -> str:
+    """Get content of a specific file from repository"""
+    try:
+        content = get_repo_service(repo_owner, repo_name).file_text(file_path)
+        return f"Content of {file_path}:\n{content}"
+    except Exception as e:
+        return f"Error fetching file {file_path}: {str(e)}"
+
+
+@tool("Search all Python files of the repository for a regex or plain text and return path:line: matching line")
+def search_python_files(repo_owner: str, repo_name: str, query: str, max_results: int = 50) -> str:
+    """Grep over a local indexed checkout instead of fetching files one by one"""
+    try:
+        matches = get_repo_service(repo_owner, repo_name).search(query, ".py", max_results)
+        if not matches:
+            return f"No matches for {query!r} in Python files of {repo_owner}/{repo_name}"
+        lines = [f"{path}:{line_no}: {line[:MAX_LINE_CHARS]}" for path, line_no, line in matches]
+        if len(matches) >= max_results:
+            lines.append(f"... stopped after {max_results} matches; narrow the query for more")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Error searching {repo_owner}/{repo_name}: {str(e)}"
+
+
+def _numbered(lines: List[str], first: int) -> str:
+    width = len(str(first + len(lines)))
+    return "\n".join(f"{first + i:>{width}} | {line[:MAX_LINE_CHARS * 2]}" for i, line in enumerate(lines))
+
+
+@tool("View part of a file with line numbers: a line range, the definition of a symbol "
+      "(function, class or Class.method), or the matches of a search term with context lines")
+def view_file(repo_owner: str, repo_name: str, file_path: str, start_line: int = 1, end_line: int = 0,
+              symbol: str = "", search: str = "", context: int = 5) -> str:
+    """Slices of a file from the local index instead of the whole file"""
+    try:
+        service = get_repo_service(repo_owner, repo_name)
+        index = service.index()
+        path = file_path.strip().lstrip("/")
+        if path.startswith("./"):
+            path = path[2:]
+        if path not in index.files:
+            return f"Error: {file_path} is not a text file in {repo_owner}/{repo_name}"
+        total = index.line_count(path)
+
+        if search:
+            pattern = service.compile_query(search)
+            hits = [line_no for _, line_no, _ in index.grep(pattern, max_results=50, paths=[path])]
+            if not hits:
+                return f"No matches for {search!r} in {path} ({total} lines)"
+            blocks = []
+            for line_no in hits[:MAX_SEARCH_HITS]:
+                first, last = max(line_no - context, 1), min(line_no + context, total)
+                blocks.append(f"--- {path} lines {first}-{last} (match at {line_no}) ---\n"
+                              + _numbered(index.lines(path, first, last), first))
+            if len(hits) > MAX_SEARCH_HITS:
+                blocks.append(f"... {len(hits) - MAX_SEARCH_HITS} more match(es) at lines "
+                              + ", ".join(map(str, hits[MAX_SEARCH_HITS:MAX_SEARCH_HITS + 20])))
+            return "\n".join(blocks)
+
+        if symbol:
+            found = service.symbol_range(path, symbol)
+            if found is None:
+                return f"Error: symbol {symbol!r} not found in {path}"
+            start_line, end_line = found
+
+        first = max(start_line, 1)
+        last = end_line if end_line >= first else first + DEFAULT_VIEW_LINES - 1
+        last = min(last, first + MAX_VIEW_LINES - 1, total)
+        if first > total:
+            return f"Error: {path} has only {total} lines"
+        note = f"; showing at most {MAX_VIEW_LINES} lines per call" if end_line - first + 1 > MAX_VIEW_LINES else ""
+        return (f"--- {path} lines {first}-{last} of {total}{note} ---\n"
+                + _numbered(index.lines(path, first, last), first))
+    except Exception as e:
+        return f"Error viewing {file_path}: {str(e)}"
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4:
+        print("Usage: python github_tools.py <owner> <repo> <query>")
+        sys.exit(1)
+    print(search_python_files(sys.argv[1], sys.argv[2], sys.argv[3]))
+    print()
+    print(TOOL_STATS.report())
@@ -0,0 +1,181 @@
+"""
+Conversation-history compaction for long agent sessions.
+Recent turns are kept verbatim; older tool observations (file dumps, long
+command output) are collapsed into short digests that carry a handle, and the
+exact content stays retrievable through HistoryManager.recall. The compaction
+boundary only moves every `polling` messages and digests are deterministic,
+so the compacted prefix stays byte-stable for provider prompt caching.
+
+Usage: python history.py <run.traj> [--keep-last 6 --max-tokens 8000]
+replays a recorded SWE-agent trajectory and prints per-call input tokens
+with and without compaction.
+"""
+import argparse
+import copy
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from llm_usage import estimate_tokens
+
+OBSERVATION_ROLES = ("tool", "function")
+
+
+def _content_text(content) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return "" if content is None else str(content)
+
+
+class HistoryManager:
+    """Sliding window over a message list with digests for older observations"""
+    def __init__(self, keep_last: int = 6, digest_chars: int = 300, min_digest_chars: int = 80,
+                 max_tokens: int = 8000, polling: int = 4):
+        self.keep_last = keep_last
+        self.digest_chars = digest_chars
+        self.min_digest_chars = min_digest_chars
+        self.max_tokens = max_tokens
+        self.polling = max(polling, 1)
+        self.store: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # ---- retrieval -------------------------------------------------------
+
+    def recall(self, handle: str) -> str:
+        """Exact content of an observation that was collapsed into a digest"""
+        with self._lock:
+            return self.store.get(handle, f"Unknown history handle: {handle}")
+
+    def _remember(self, text: str) -> str:
+        handle = "h" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+        with self._lock:
+            self.store[handle] = text
+        return handle
+
+    # ---- compaction ------------------------------------------------------
+
+    def digest(self, text: str, limit: int) -> str:
+        """First lines of the text plus a note on what was elided and how to get it back"""
+        if len(text) <= limit or len(text) <= self.min_digest_chars:
+            return text
+        handle = self._remember(text)
+        note = (f"... [{text.count(chr(10)) + 1} lines, {len(text)} chars elided; "
+                f"exact content: recall_observation('{handle}')]")
+        head = text[:limit]
+        if "\n" in head:
+            head = head[:head.rfind("\n")]
+        return f"{head}\n{note}" if head else note
+
+    def _head_count(self, messages: List[Dict]) -> int:
+        """System prompt(s) plus the first user message (the task) are never compacted"""
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+        if head < len(messages) and messages[head].get("role") == "user":
+            head += 1
+        return head
+
+    def _boundary(self, messages: List[Dict], head: int) -> int:
+        # Snap to a multiple of polling so earlier messages are rewritten in batches, not every call
+        older = max(len(messages) - self.keep_last - head, 0)
+        return head + (older // self.polling) * self.polling
+
+    def _compact_message(self, message: Dict, limit: int, include_assistant: bool) -> Dict:
+        role = message.get("role")
+        if role not in OBSERVATION_ROLES and not (role == "user" and message.get("message_type") == "observation") \
+                and not (include_assistant and role == "assistant"):
+            return message
+        compacted = copy.copy(message)
+        compacted["content"] = self.digest(_content_text(message.get("content")), limit)
+        if message.get("tool_responses"):
+            compacted["tool_responses"] = [
+                dict(response, content=self.digest(_content_text(response.get("content")), limit))
+                for response in message["tool_responses"]
+            ]
+        return compacted
+
+    def count_tokens(self, messages: List[Dict]) -> int:
+        return sum(estimate_tokens(_content_text(m.get("content"))) for m in messages)
+
+    def compact(self, messages: List[Dict]) -> List[Dict]:
+        """Return a compacted copy of messages; the input list is not modified"""
+        head = self._head_count(messages)
+        boundary = self._boundary(messages, head)
+        result = list(messages)
+        for i in range(head, boundary):
+            result[i] = self._compact_message(messages[i], self.digest_chars, include_assistant=False)
+
+        # Still over budget: shrink digests further, then digest long assistant turns too
+        if self.count_tokens(result) > self.max_tokens:
+            for i in range(head, boundary):
+                result[i] = self._compact_message(messages[i], self.min_digest_chars, include_assistant=True)
+
+        # Last resort, oldest first: keep only the one-line handle note
+        total = self.count_tokens(result)
+        for i in range(head, boundary):
+            if total <= self.max_tokens:
+                break
+            before = self.count_tokens([result[i]])
+            result[i] = self._compact_message(messages[i], 0, include_assistant=True)
+            total += self.count_tokens([result[i]]) - before
+        return result
+
+
+class CompactHistoryTransform:
+    """
+    autogen message transform (see autogen.agentchat.contrib.capabilities.transform_messages)
+    that applies a HistoryManager before every LLM call of the agent it is attached to.
+    """
+    def __init__(self, manager: Optional[HistoryManager] = None):
+        self.manager = manager or HistoryManager()
+
+    def apply_transform(self, messages: List[Dict]) -> List[Dict]:
+        return self.manager.compact(messages)
+
+    def get_logs(self, pre_transform_messages: List[Dict], post_transform_messages: List[Dict]):
+        before = self.manager.count_tokens(pre_transform_messages)
+        after = self.manager.count_tokens(post_transform_messages)
+        if after < before:
+            return f"History compacted from ~{before} to ~{after} tokens.", True
+        return "No history compaction applied.", False
+
+
+def attach_history_compaction(agent, manager: Optional[HistoryManager] = None) -> HistoryManager:
+    """Add compaction to an autogen ConversableAgent and return its manager for recall"""
+    from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+
+    transform = CompactHistoryTransform(manager)
+    TransformMessages(transforms=[transform]).add_to_agent(agent)
+    return transform.manager
+
+
+def replay_trajectory(traj_path: str, manager: HistoryManager) -> List[Dict]:
+    """Per-call input tokens of a recorded SWE-agent run, raw vs compacted"""
+    with open(traj_path, "r", encoding="utf-8") as f:
+        steps = json.load(f).get("trajectory", [])
+    rows = []
+    for i, step in enumerate(steps):
+        messages = step.get("messages", [])
+        rows.append({
+            "step": i + 1,
+            "messages": len(messages),
+            "raw_tokens": manager.count_tokens(messages),
+            "compacted_tokens": manager.count_tokens(manager.compact(messages)),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a .traj file through history compaction")
+    parser.add_argument("traj_path")
+    parser.add_argument("--keep-last", type=int, default=6)
+    parser.add_argument("--max-tokens", type=int, default=8000)
+    parser.add_argument("--polling", type=int, default=4)
+    args = parser.parse_args()
+
+    manager = HistoryManager(keep_last=args.keep_last, max_tokens=args.max_tokens, polling=args.polling)
+    print(f"{'step':>4} {'messages':>8} {'raw tok':>8} {'compacted':>9}")
+    for row in replay_trajectory(args.traj_path, manager):
+        print(f"{row['step']:>4} {row['messages']:>8} {row['raw_tokens']:>8} {row['compacted_tokens']:>9}")
+    print(f"\n{len(manager.store)} observation(s) retrievable by handle")
@@ -0,0 +1,265 @@
+"""
+Issue context from the GitHub GraphQL API.
+One query returns the issue title and body, labels, comments, linked pull
+requests, referenced commits and the default-branch head SHA. Many issues are
+fetched together as aliased fields of a single query, and only issues with
+more comments than fit the first page need follow-up requests. Batch runners
+call prefetch_issue_contexts for the issues they are about to run; each
+prefetched context then serves the next fetch_issue_context of its issue.
+
+Usage:
+  python issue_context.py <issue_url> [...] [--record responses.json]
+  python issue_context.py <issue_url> [...] --replay responses.json
+--record saves the raw GraphQL responses; --replay serves them back through
+RecordedTransport without touching the network.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from github_scheduler import GITHUB_API, github_post
+from llm_usage import truncate_to_tokens
+
+GRAPHQL_URL = f"{GITHUB_API}/graphql"
+# Prefetched contexts older than this are fetched again
+PREFETCH_TTL = float(os.getenv("ISSUE_PREFETCH_TTL", "600"))
+ISSUES_PER_QUERY = 20
+COMMENTS_PER_PAGE = 50
+MAX_COMMENT_PAGES = 4
+ISSUE_URL = re.compile(r"github\.com/(?:repos/)?([^/]+)/([^/]+)/issues/(\d+)")
+
+ISSUE_FIELDS = """
+      number title body state url
+      labels(first: 20) { nodes { name } }
+      comments(first: %(comments)d%(after)s) {
+        totalCount
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } body createdAt }
+      }
+      timelineItems(first: 30, itemTypes: [CROSS_REFERENCED_EVENT, CONNECTED_EVENT, REFERENCED_EVENT]) {
+        nodes {
+          __typename
+          ... on CrossReferencedEvent { source { ... on PullRequest { number title url state merged } } }
+          ... on ConnectedEvent { subject { ... on PullRequest { number title url state merged } } }
+          ... on ReferencedEvent { commit { oid messageHeadline url } }
+        }
+      }
+"""
+
+COMMENTS_ONLY = """
+      comments(first: %(comments)d%(after)s) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login } body createdAt }
+      }
+"""
+
+
+def parse_issue_url(issue_url: str) -> tuple:
+    """(owner, repo, number) from a web or API issue URL"""
+    match = ISSUE_URL.search(issue_url)
+    if not match:
+        raise ValueError(f"Invalid GitHub issue URL: {issue_url}")
+    return match.group(1), match.group(2), int(match.group(3))
+
+
+def graphql_post(query: str, variables: Optional[Dict] = None) -> Dict:
+    """Send one GraphQL request through the scheduler (GraphQL always needs a token)"""
+    response = github_post(GRAPHQL_URL, json={"query": query, "variables": variables or {}})
+    response.raise_for_status()
+    payload = response.json()
+    if payload.get("errors") and not payload.get("data"):
+        raise RuntimeError(f"GraphQL error: {payload['errors'][0].get('message')}")
+    return payload
+
+
+class RecordedTransport:
+    """Replays saved GraphQL responses in order, or records live ones when wrapping a transport"""
+    def __init__(self, responses: Optional[List[Dict]] = None, live: Optional[Callable] = None):
+        self.responses = list(responses or [])
+        self.live = live
+        self.queries: List[str] = []
+        self._next = 0
+
+    @classmethod
+    def load(cls, path: str) -> "RecordedTransport":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.responses, f, indent=2)
+
+    def __call__(self, query: str, variables: Optional[Dict] = None) -> Dict:
+        self.queries.append(query)
+        if self.live is not None:
+            payload = self.live(query, variables)
+            self.responses.append(payload)
+            return payload
+        if self._next >= len(self.responses):
+            raise RuntimeError(f"No recorded response left for request #{self._next + 1}")
+        payload = self.responses[self._next]
+        self._next += 1
+        return payload
+
+
+def _issue_query(issues: List[tuple], after: Optional[Dict[int, str]] = None, comments_only: bool = False) -> str:
+    fields = []
+    for i, (owner, repo, number) in enumerate(issues):
+        cursor = (after or {}).get(i)
+        body = (COMMENTS_ONLY if comments_only else ISSUE_FIELDS) % {
+            "comments": COMMENTS_PER_PAGE,
+            "after": f", after: {json.dumps(cursor)}" if cursor else "",
+        }
+        head = "" if comments_only else "    defaultBranchRef { name target { oid } }\n"
+        fields.append(f"  i{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{\n"
+                      f"{head}    issue(number: {number}) {{{body}    }}\n  }}")
+    return "query {\n" + "\n".join(fields) + "\n  rateLimit { cost remaining }\n}"
+
+
+def _comments(connection: Dict) -> List[Dict]:
+    return [
+        {"author": (c.get("author") or {}).get("login", "ghost"), "body": c.get("body", ""),
+         "created_at": c.get("createdAt")}
+        for c in connection.get("nodes", [])
+    ]
+
+
+def _context(issue_url: str, owner: str, repo: str, node: Dict) -> Dict:
+    issue = node.get("issue") or {}
+    branch = node.get("defaultBranchRef") or {}
+    linked_prs, commits = [], []
+    for event in (issue.get("timelineItems") or {}).get("nodes", []):
+        pr = event.get("source") or event.get("subject") or {}
+        if pr.get("number") and pr not in linked_prs:
+            linked_prs.append(pr)
+        commit = event.get("commit")
+        if commit and commit not in commits:
+            commits.append(commit)
+    comments = issue.get("comments") or {}
+    return {
+        "issue_url": issue_url,
+        "owner": owner,
+        "repo": repo,
+        "number": issue.get("number"),
+        "title": issue.get("title", ""),
+        "body": issue.get("body") or "",
+        "state": issue.get("state"),
+        "labels": [label["name"] for label in (issue.get("labels") or {}).get("nodes", [])],
+        "comments": _comments(comments),
+        "comment_count": comments.get("totalCount", 0),
+        "linked_prs": linked_prs,
+        "referenced_commits": commits,
+        "default_branch": branch.get("name"),
+        "head_sha": (branch.get("target") or {}).get("oid"),
+    }
+
+
+def fetch_issue_contexts(issue_urls: List[str], transport: Callable = graphql_post) -> Dict[str, Dict]:
+    """Context for many issues with one GraphQL request per ISSUES_PER_QUERY issues"""
+    contexts: Dict[str, Dict] = {}
+    for start in range(0, len(issue_urls), ISSUES_PER_QUERY):
+        urls = issue_urls[start:start + ISSUES_PER_QUERY]
+        issues = [parse_issue_url(url) for url in urls]
+        data = transport(_issue_query(issues)).get("data") or {}
+
+        cursors: Dict[int, str] = {}
+        for i, (url, (owner, repo, _)) in enumerate(zip(urls, issues)):
+            node = data.get(f"i{i}")
+            if not node or not node.get("issue"):
+                contexts[url] = {"issue_url": url, "error": "issue not found or not accessible"}
+                continue
+            contexts[url] = _context(url, owner, repo, node)
+            page_info = node["issue"]["comments"].get("pageInfo", {})
+            if page_info.get("hasNextPage"):
+                cursors[i] = page_info["endCursor"]
+
+        # Long discussions: page through remaining comments, still batched across issues
+        for _ in range(MAX_COMMENT_PAGES - 1):
+            if not cursors:
+                break
+            pending = sorted(cursors)
+            data = transport(_issue_query([issues[i] for i in pending],
+                                          {j: cursors[i] for j, i in enumerate(pending)},
+                                          comments_only=True)).get("data") or {}
+            next_cursors = {}
+            for j, i in enumerate(pending):
+                comments = (((data.get(f"i{j}") or {}).get("issue") or {}).get("comments")) or {}
+                contexts[urls[i]]["comments"].extend(_comments(comments))
+                if comments.get("pageInfo", {}).get("hasNextPage"):
+                    next_cursors[i] = comments["pageInfo"]["endCursor"]
+            cursors = next_cursors
+    return contexts
+
+
+_prefetched: Dict[str, tuple] = {}
+_prefetch_lock = threading.Lock()
+
+
+def prefetched(issue_url: str) -> bool:
+    with _prefetch_lock:
+        cached = _prefetched.get(issue_url)
+    return bool(cached) and time.time() - cached[0] < PREFETCH_TTL
+
+
+def prefetch_issue_contexts(issue_urls: List[str], transport: Callable = graphql_post) -> int:
+    """Batch-fetch the issues about to run; returns how many contexts were stored"""
+    now = time.time()
+    with _prefetch_lock:
+        for url in [url for url, (fetched, _) in _prefetched.items() if now - fetched >= PREFETCH_TTL]:
+            del _prefetched[url]
+        wanted = [url for url in dict.fromkeys(issue_urls) if url not in _prefetched]
+    if not wanted:
+        return 0
+    contexts = fetch_issue_contexts(wanted, transport)
+    with _prefetch_lock:
+        # Failed issues are left to the run itself, which falls back to REST
+        _prefetched.update((url, (now, context)) for url, context in contexts.items() if "error" not in context)
+    return sum("error" not in context for context in contexts.values())
+
+
+def fetch_issue_context(issue_url: str, transport: Callable = graphql_post) -> Dict:
+    """A prefetched context (used once) when there is a fresh one, otherwise a query of its own"""
+    with _prefetch_lock:
+        cached = _prefetched.pop(issue_url, None)
+    if cached and time.time() - cached[0] < PREFETCH_TTL:
+        return cached[1]
+    return fetch_issue_contexts([issue_url], transport)[issue_url]
+
+
+def problem_statement(context: Dict, max_comment_tokens: int = 2000) -> str:
+    """Title, body, labels, linked PRs and the discussion, with comments capped to a token budget"""
+    parts = [f"{context['title']}\n\n{context['body']}"]
+    if context.get("labels"):
+        parts.append("Labels: " + ", ".join(context["labels"]))
+    if context.get("linked_prs"):
+        parts.append("Linked pull requests:\n" + "\n".join(
+            f"- #{pr['number']} {pr.get('title', '')} ({pr.get('state', '').lower()})" for pr in context["linked_prs"]))
+    if context.get("comments"):
+        discussion = "\n\n".join(f"@{c['author']}: {c['body']}" for c in context["comments"])
+        parts.append("Comments:\n" + truncate_to_tokens(discussion, max_comment_tokens))
+    return "\n\n".join(parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch issue context with the GitHub GraphQL API")
+    parser.add_argument("issue_urls", nargs="+")
+    parser.add_argument("--record", help="save the raw GraphQL responses to this file")
+    parser.add_argument("--replay", help="answer from responses saved with --record")
+    args = parser.parse_args()
+
+    transport = RecordedTransport.load(args.replay) if args.replay else \
+        RecordedTransport(live=graphql_post) if args.record else graphql_post
+    contexts = fetch_issue_contexts(args.issue_urls, transport)
+    for url, context in contexts.items():
+        if "error" in context:
+            print(f"❌ {url}: {context['error']}")
+            continue
+        print(f"✅ {url}: {context['title']!r}, {len(context['comments'])}/{context['comment_count']} comment(s), "
+              f"{len(context['linked_prs'])} linked PR(s), head {str(context['head_sha'])[:8]}")
+    if args.record:
+        transport.save(args.record)
+        print(f"📝 {len(transport.responses)} response(s) saved to {args.record}")
@@ -0,0 +1,240 @@
+"""
+Near-duplicate issue detection with MinHash and LSH banding.
+Each issue's title and body are shingled into word 3-grams and reduced to a
+NUM_PERM MinHash signature. Signatures are split into BANDS bands whose hashes
+are kept in sorted arrays, so a lookup is a binary search per band plus an
+exact signature comparison against the few candidates, however many issues are
+stored. Everything is append-only on disk under DEDUP_DIR:
+  signatures.bin  uint32 rows, one per stored text (memory-mapped)
+  records.jsonl   "row<TAB>issue_url<TAB>json" lines, the last line per row wins
+so adding or updating an issue never rewrites the index.
+
+Usage: python issue_dedup.py <text_file> [threshold]
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEDUP_DIR = os.getenv("SWE_DEDUP_DIR", ".issue_index")
+NUM_PERM = 128
+BANDS = 16  # 8 rows per band: pairs above ~0.7 Jaccard collide in some band
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+SHORT_CIRCUIT_THRESHOLD = float(os.getenv("DEDUP_SHORT_CIRCUIT", "0.95"))
+# New rows are scanned linearly until the tail is this long, then merged into the sorted bands
+TAIL_MERGE_SIZE = 1024
+PRIME = 4294967311  # smallest prime above 2**32
+WORD = re.compile(r"\w+")
+ISSUE_REPO = re.compile(r"github\.com/(?:repos/)?([^/]+)/([^/]+)/issues/")
+# Fields of an approved record that only update() may change
+APPROVED_FIELDS = ("status", "patch", "reused_from")
+# Sections issue_context.problem_statement appends after the title and body
+TRAILING_SECTIONS = ("\n\nLabels: ", "\n\nLinked pull requests:\n", "\n\nComments:\n")
+
+_rng = np.random.RandomState(1204)
+PERM_A = _rng.randint(1, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+PERM_B = _rng.randint(0, 2 ** 31, size=NUM_PERM).astype(np.uint64)
+BAND_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15) ** np.arange(1, NUM_PERM // BANDS + 1, dtype=np.uint64))
+
+
+def issue_text(problem_statement: str) -> str:
+    """Title and body only; labels, linked PRs and comments would skew the similarity"""
+    cut = min((i for i in (problem_statement.find(s) for s in TRAILING_SECTIONS) if i >= 0),
+              default=len(problem_statement))
+    return problem_statement[:cut]
+
+
+def issue_repo(issue_url: str) -> str:
+    """owner/repo of a github.com or api.github.com issue URL, lowercased"""
+    match = ISSUE_REPO.search(issue_url or "")
+    return f"{match.group(1)}/{match.group(2)}".lower() if match else ""
+
+
+def shingles(text: str) -> set:
+    words = WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature of the text's shingles under NUM_PERM universal hash functions"""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+         for s in shingles(text)),
+        dtype=np.uint64)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    permuted = (PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % np.uint64(PRIME)
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """(rows, BANDS) uint64 hash of each band of each signature"""
+    rows = signatures.reshape(len(signatures), BANDS, NUM_PERM // BANDS).astype(np.uint64)
+    return (rows * BAND_MULTIPLIERS).sum(axis=2, dtype=np.uint64)
+
+
+class IssueIndex:
+    """Persistent MinHash/LSH index of issue texts with the analysis and patch recorded for each"""
+    def __init__(self, path: str = DEDUP_DIR):
+        self.path = path
+        self.signatures_path = os.path.join(path, "signatures.bin")
+        self.records_path = os.path.join(path, "records.jsonl")
+        self.offsets: Dict[int, int] = {}
+        self.rows_by_url: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # ---- storage ------------------------------------------------------------
+
+    def _load(self):
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    row, url, _ = line.split(b"\t", 2)
+                    self.offsets[int(row)] = offset
+                    self.rows_by_url[url.decode("utf-8")] = int(row)
+                    offset += len(line)
+        count = os.path.getsize(self.signatures_path) // (NUM_PERM * 4) if os.path.exists(self.signatures_path) else 0
+        self.signatures = np.memmap(self.signatures_path, dtype=np.uint32, mode="r", shape=(count, NUM_PERM)) \
+            if count else np.zeros((0, NUM_PERM), dtype=np.uint32)
+        self._build_bands(count)
+
+    def _build_bands(self, count: int):
+        # Only rows still referenced by some URL take part; re-added issues leave their old row behind
+        live = np.array(sorted(set(self.rows_by_url.values())), dtype=np.int64)
+        live = live[live < count]
+        keys = band_keys(np.asarray(self.signatures[live])) if live.size else np.zeros((0, BANDS), np.uint64)
+        order = np.argsort(keys, axis=0, kind="stable")
+        self.band_sorted = np.take_along_axis(keys, order, axis=0)
+        self.band_rows = live[order] if live.size else np.zeros((0, BANDS), dtype=np.int64)
+        self.tail_rows: List[int] = []
+        self.tail_keys: List[np.ndarray] = []
+        self.indexed_count = count
+
+    def _append_record(self, row: int, url: str, record: Dict):
+        line = f"{row}\t{url}\t{json.dumps(record, default=str)}\n".encode("utf-8")
+        with open(self.records_path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        self.offsets[row] = offset
+        self.rows_by_url[url] = row
+
+    def record(self, row: int) -> Dict:
+        with open(self.records_path, "rb") as f:
+            f.seek(self.offsets[row])
+            return json.loads(f.readline().split(b"\t", 2)[2])
+
+    def __len__(self):
+        return len(self.rows_by_url)
+
+    # ---- updates ------------------------------------------------------------
+
+    def add(self, issue_url: str, problem_statement: str, **fields) -> int:
+        """
+        Store or refresh an issue; fields (status, filepath, first_guess, patch, ...) are merged.
+        A re-analysis never demotes an approved record: its status and patch are kept.
+        """
+        text = issue_text(problem_statement)
+        sig = signature(text)
+        with self._lock:
+            row = self.rows_by_url.get(issue_url)
+            record = self.record(row) if row is not None else {}
+            if record.get("status") == "approved":
+                fields = {key: value for key, value in fields.items() if key not in APPROVED_FIELDS}
+            if row is None or not np.array_equal(self.signatures[row], sig):
+                with open(self.signatures_path, "ab") as f:
+                    f.write(sig.tobytes())
+                row = self.signatures.shape[0]
+                self.signatures = np.memmap(self.signatures_path, dtype=np.uint32, mode="r",
+                                            shape=(row + 1, NUM_PERM))
+                self.tail_rows.append(row)
+                self.tail_keys.append(band_keys(sig[None, :])[0])
+            record.update(fields, issue_url=issue_url, repo=issue_repo(issue_url), text=text[:2000])
+            self._append_record(row, issue_url, record)
+            if len(self.tail_rows) >= TAIL_MERGE_SIZE:
+                self._build_bands(self.signatures.shape[0])
+        return row
+
+    def update(self, issue_url: str, **fields):
+        """Merge fields into a stored issue (e.g. status="approved", patch=...)"""
+        with self._lock:
+            row = self.rows_by_url.get(issue_url)
+            if row is None:
+                return
+            record = self.record(row)
+            record.update(fields)
+            self._append_record(row, issue_url, record)
+
+    # ---- lookup -------------------------------------------------------------
+
+    def _candidates(self, keys: np.ndarray) -> set:
+        candidates = set()
+        for band in range(BANDS):
+            column = self.band_sorted[:, band]
+            left = np.searchsorted(column, keys[band], side="left")
+            right = np.searchsorted(column, keys[band], side="right")
+            candidates.update(self.band_rows[left:right, band].tolist())
+        for row, tail_keys in zip(self.tail_rows, self.tail_keys):
+            if np.any(tail_keys == keys):
+                candidates.add(row)
+        return candidates
+
+    def query(self, problem_statement: str, threshold: float = SIMILARITY_THRESHOLD,
+              exclude_url: Optional[str] = None, limit: int = 5) -> List[tuple]:
+        """[(estimated Jaccard similarity, record)] above threshold, most similar first"""
+        sig = signature(issue_text(problem_statement))
+        with self._lock:
+            live = set(self.rows_by_url.values())
+            rows = sorted(row for row in self._candidates(band_keys(sig[None, :])[0]) if row in live)
+            if not rows:
+                return []
+            similarity = (np.asarray(self.signatures[rows]) == sig).mean(axis=1)
+            matches = []
+            for i in np.argsort(-similarity):
+                if similarity[i] < threshold:
+                    break
+                record = self.record(rows[i])
+                if record.get("issue_url") != exclude_url:
+                    matches.append((round(float(similarity[i]), 3), record))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def find_resolved(self, problem_statement: str, repo: str, threshold: float = SIMILARITY_THRESHOLD,
+                      exclude_url: Optional[str] = None) -> Optional[Dict]:
+        """
+        Most similar stored issue of the same owner/repo with an approved patch, as its record plus
+        "similarity". Issues from other repositories never count: issue templates make unrelated
+        reports look alike, and their patches would not apply.
+        """
+        repo = repo.lower()
+        for similarity, record in self.query(problem_statement, threshold, exclude_url, limit=20):
+            # Records written before repo was stored fall back to their URL
+            same_repo = (record.get("repo") or issue_repo(record.get("issue_url", ""))) == repo
+            if same_repo and record.get("status") == "approved" and record.get("patch"):
+                return dict(record, similarity=similarity)
+        return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python issue_dedup.py <text_file> [threshold]")
+        sys.exit(1)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        query_text = f.read()
+    index = IssueIndex()
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else SIMILARITY_THRESHOLD
+    found = index.query(query_text, threshold)
+    print(f"{len(found)} near-duplicate(s) among {len(index)} stored issue(s)")
+    for similarity, rec in found:
+        print(f"  {similarity:.2f}  {rec['issue_url']}  [{rec.get('status', 'analyzed')}]")
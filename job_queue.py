@@ -0,0 +1,348 @@
+"""
+Persistent job queue for service mode and distributed workers, backed by SQLite.
+Jobs and their stage events survive restarts. Every thread gets its own
+connection and claims go through BEGIN IMMEDIATE, so workers in several
+processes (or on several machines sharing the file) can pull from one
+database. A claimed job is leased: its worker renews the lease with
+heartbeat(), and once a lease expires the job can be claimed again, up to
+max_attempts times. Results are only accepted from the worker that holds the
+lease, so a worker that comes back after losing its job cannot overwrite the
+result of the one that took over.
+
+Claims are repository-aware. Every job records its owner/repo (and base_commit
+when the payload has one), and each node (a worker process with its own clones,
+indexes and pipeline memo) records the repositories it has run recently. A
+claim prefers, within the highest queued priority: the node's warm
+repo@commit, then its warm repos, then repos no other live node holds, and
+only then steals from another node's group, so a repo's issues stay together
+on one node while nobody idles. locality() reports the hit rate against the
+FIFO order the queue used before.
+
+The database uses SQLite's rollback journal (journal_mode=DELETE) by default.
+WAL keeps its index in shared memory, which only works when every process is on
+the same machine, so it corrupts a database on NFS or any other network share;
+set SWE_QUEUE_JOURNAL=WAL only for a queue on local disk. Even in DELETE mode,
+SQLite relies on POSIX locks, so a shared file needs a filesystem whose locking
+actually works across machines (NFSv4, or NFSv3 with lockd running); where it
+does not, run a broker with its own server instead.
+
+Other brokers plug in through BROKERS and open_queue("<scheme>://...").
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+QUEUE_DB = os.getenv("SWE_QUEUE_DB", "swe_jobs.db")
+# DELETE is safe on shared storage; WAL is faster but only for a database on local disk
+QUEUE_JOURNAL = os.getenv("SWE_QUEUE_JOURNAL", "DELETE").upper()
+TERMINAL_STATES = ("done", "failed", "cancelled")
+LEASE_SECONDS = float(os.getenv("SWE_JOB_LEASE", "120"))
+MAX_ATTEMPTS = int(os.getenv("SWE_JOB_MAX_ATTEMPTS", "3"))
+# A node counts as holding a repo for this long after it last ran one of its issues
+AFFINITY_TTL = float(os.getenv("SWE_AFFINITY_TTL", "1800"))
+LOCALITY_TIERS = ("warm_commit", "warm_repo", "new_repo", "stolen")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    issue_url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload TEXT,
+    worker TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_expires REAL,
+    repo TEXT,
+    base_commit TEXT NOT NULL DEFAULT '',
+    node TEXT,
+    locality TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, created);
+CREATE INDEX IF NOT EXISTS jobs_issue ON jobs (issue_url, status);
+CREATE TABLE IF NOT EXISTS events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    time REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS affinity (
+    node TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    base_commit TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (node, repo, base_commit)
+);
+"""
+# Columns added after the first release; older databases get them on open
+MIGRATIONS = {
+    "attempts": "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    "max_attempts": "ALTER TABLE jobs ADD COLUMN max_attempts INTEGER NOT NULL DEFAULT 3",
+    "lease_expires": "ALTER TABLE jobs ADD COLUMN lease_expires REAL",
+    "repo": "ALTER TABLE jobs ADD COLUMN repo TEXT",
+    "base_commit": "ALTER TABLE jobs ADD COLUMN base_commit TEXT NOT NULL DEFAULT ''",
+    "node": "ALTER TABLE jobs ADD COLUMN node TEXT",
+    "locality": "ALTER TABLE jobs ADD COLUMN locality TEXT",
+}
+CLAIM_QUERY = """
+SELECT j.id, j.worker, j.attempts, j.max_attempts, j.status, j.repo, j.base_commit,
+  CASE
+    WHEN j.base_commit != '' AND EXISTS (SELECT 1 FROM affinity a WHERE a.node = :node AND a.repo = j.repo
+                                         AND a.base_commit = j.base_commit AND a.last_used > :fresh) THEN 0
+    WHEN EXISTS (SELECT 1 FROM affinity a WHERE a.node = :node AND a.repo = j.repo AND a.last_used > :fresh) THEN 1
+    WHEN NOT EXISTS (SELECT 1 FROM affinity a WHERE a.node != :node AND a.repo = j.repo
+                     AND a.last_used > :fresh) THEN 2
+    ELSE 3
+  END AS tier
+FROM jobs j
+WHERE j.status = 'queued' OR (j.status = 'running' AND j.lease_expires < :now)
+ORDER BY j.priority DESC, tier, j.created
+LIMIT 1
+"""
+
+
+def repo_key(issue_url: str) -> str:
+    """owner/repo of a GitHub issue URL"""
+    parts = issue_url.rstrip("/").split("/")
+    return f"{parts[-4]}/{parts[-3]}".lower() if len(parts) >= 4 else issue_url
+
+
+class JobQueue:
+    """Jobs move queued -> running -> done | failed (or cancelled while queued)"""
+    def __init__(self, path: str = QUEUE_DB, journal_mode: str = QUEUE_JOURNAL):
+        if journal_mode not in ("DELETE", "TRUNCATE", "PERSIST", "WAL"):
+            raise ValueError(f"Unsupported journal mode {journal_mode!r} for the job queue")
+        self.path = path
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            # NORMAL is only crash-safe with WAL; a rollback journal needs FULL
+            conn.execute(f"PRAGMA synchronous={'NORMAL' if self.journal_mode == 'WAL' else 'FULL'}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("payload", "result"):
+            job[key] = json.loads(job[key]) if job.get(key) else None
+        return job
+
+    # ---- producers -------------------------------------------------------
+
+    def submit(self, issue_url: str, priority: int = 0, payload: Optional[Dict] = None,
+               max_attempts: int = MAX_ATTEMPTS) -> Dict[str, Any]:
+        """Queue an issue; an issue that is already queued or running returns the existing job"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = conn.execute(
+                "SELECT * FROM jobs WHERE issue_url = ? AND status IN ('queued', 'running')", (issue_url,)).fetchone()
+            if existing:
+                conn.execute("COMMIT")
+                return self._job(existing)
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute("INSERT INTO jobs (id, issue_url, status, priority, payload, created, max_attempts, "
+                         "repo, base_commit) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                         (job_id, issue_url, priority, json.dumps(payload or {}), time.time(), max_attempts,
+                          repo_key(issue_url), (payload or {}).get("base_commit", "")))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.add_event(job_id, {"type": "queued"})
+        return self.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id))
+        if cursor.rowcount:
+            self.add_event(job_id, {"type": "cancelled"})
+        return bool(cursor.rowcount)
+
+    # ---- workers ---------------------------------------------------------
+
+    def claim(self, worker: str, lease_seconds: float = LEASE_SECONDS,
+              node: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take a queued job (or one whose worker stopped renewing its lease): highest priority first,
+        then the best repository locality for node (the worker's process; defaults to worker), then oldest.
+        """
+        conn = self._conn()
+        node = node or worker
+        now = time.time()
+        expired = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(CLAIM_QUERY, {"node": node, "now": now, "fresh": now - AFFINITY_TTL}).fetchone()
+                if row is None or row["attempts"] < row["max_attempts"]:
+                    break
+                # Every attempt died holding the lease; stop handing the job out
+                conn.execute("UPDATE jobs SET status = 'failed', finished = ?, lease_expires = NULL, "
+                             "error = ? WHERE id = ?",
+                             (now, f"lease expired on all {row['attempts']} attempt(s)", row["id"]))
+                expired.append(row)
+            if row is not None:
+                locality = LOCALITY_TIERS[row["tier"]]
+                conn.execute("UPDATE jobs SET status = 'running', worker = ?, started = ?, lease_expires = ?, "
+                             "attempts = attempts + 1, node = ?, locality = ? WHERE id = ?",
+                             (worker, now, now + lease_seconds, node, locality, row["id"]))
+                if row["repo"]:
+                    # The node now holds this repo (and commit); later claims keep its group here
+                    conn.execute("INSERT OR REPLACE INTO affinity (node, repo, base_commit, last_used) "
+                                 "VALUES (?, ?, ?, ?)", (node, row["repo"], row["base_commit"], now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for dead in expired:
+            self.add_event(dead["id"], {"type": "failed", "error": "lease expired", "worker": dead["worker"]})
+        if row is None:
+            return None
+        if row["status"] == "running":
+            self.add_event(row["id"], {"type": "lease_expired", "worker": row["worker"]})
+        self.add_event(row["id"], {"type": "started", "worker": worker, "attempt": row["attempts"] + 1,
+                                   "locality": locality})
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend the lease; False means the job was taken over and the worker should drop it"""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (time.time() + lease_seconds, job_id, worker))
+        return bool(cursor.rowcount)
+
+    def complete(self, job_id: str, result: Dict[str, Any], worker: Optional[str] = None) -> bool:
+        """Store the result; only the lease holder's first write counts, repeats are no-ops"""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'done', finished = ?, result = ?, lease_expires = NULL "
+            "WHERE id = ? AND status = 'running' AND (? IS NULL OR worker = ?)",
+            (time.time(), json.dumps(result, default=str), job_id, worker, worker))
+        if cursor.rowcount:
+            self.add_event(job_id, {"type": "done", "worker": worker})
+        return bool(cursor.rowcount)
+
+    def fail(self, job_id: str, error: str, worker: Optional[str] = None, retry: bool = False) -> bool:
+        """Mark the job failed, or queue it again when retry is set and attempts are left"""
+        conn = self._conn()
+        cursor = conn.execute(
+            "UPDATE jobs SET status = CASE WHEN ? AND attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "finished = ?, error = ?, lease_expires = NULL "
+            "WHERE id = ? AND status = 'running' AND (? IS NULL OR worker = ?)",
+            (retry, time.time(), error, job_id, worker, worker))
+        if cursor.rowcount:
+            status = self.get(job_id)["status"]
+            self.add_event(job_id, {"type": "retry" if status == "queued" else "failed", "error": error})
+        return bool(cursor.rowcount)
+
+    # ---- events and queries ----------------------------------------------
+
+    def add_event(self, job_id: str, data: Dict[str, Any]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM events WHERE job_id = ?",
+                               (job_id,)).fetchone()[0]
+            conn.execute("INSERT INTO events (job_id, seq, time, data) VALUES (?, ?, ?, ?)",
+                         (job_id, seq, time.time(), json.dumps(data, default=str)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT seq, time, data FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                    (job_id, since)).fetchall()
+        return [dict(json.loads(r["data"]), seq=r["seq"], time=r["time"]) for r in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._job(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        columns = "id, issue_url, status, priority, worker, attempts, created, started, finished, error"
+        if status:
+            rows = self._conn().execute(f"SELECT {columns} FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ?",
+                                        (status, limit)).fetchall()
+        else:
+            rows = self._conn().execute(f"SELECT {columns} FROM jobs ORDER BY created DESC LIMIT ?",
+                                        (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def upcoming(self, repo: str, limit: int) -> List[str]:
+        """Issue URLs of the queued jobs of repo in the order they will be claimed"""
+        rows = self._conn().execute("SELECT issue_url FROM jobs WHERE status = 'queued' AND repo = ? "
+                                    "ORDER BY priority DESC, created LIMIT ?", (repo, limit)).fetchall()
+        return [r["issue_url"] for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def locality(self) -> Dict[str, Any]:
+        """
+        Share of claimed jobs that landed on a node already holding their repo, next to the share
+        the old FIFO order would have had: the same jobs by submission time, round-robin over the same nodes.
+        """
+        rows = self._conn().execute("SELECT repo, node, locality FROM jobs WHERE locality IS NOT NULL "
+                                    "ORDER BY created").fetchall()
+        if not rows:
+            return {"jobs": 0}
+        by_tier = {tier: 0 for tier in LOCALITY_TIERS}
+        for r in rows:
+            by_tier[r["locality"]] += 1
+        nodes = sorted({r["node"] for r in rows})
+        seen = {node: set() for node in nodes}
+        fifo_hits = 0
+        for i, r in enumerate(rows):
+            node = nodes[i % len(nodes)]
+            fifo_hits += r["repo"] in seen[node]
+            seen[node].add(r["repo"])
+        hits = by_tier["warm_commit"] + by_tier["warm_repo"]
+        return {
+            "jobs": len(rows),
+            "nodes": len(nodes),
+            "repos": len({r["repo"] for r in rows}),
+            "by_tier": by_tier,
+            "hit_rate": round(hits / len(rows), 3),
+            "fifo_hit_rate": round(fifo_hits / len(rows), 3),
+        }
+
+
+BROKERS = {"sqlite": JobQueue}
+
+
+def open_queue(url: str = QUEUE_DB):
+    """sqlite:///path/to/jobs.db (or a bare path); other schemes come from BROKERS"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return JobQueue(url)
+    if scheme not in BROKERS:
+        raise ValueError(f"Unsupported job broker {scheme!r}, expected one of {sorted(BROKERS)}")
+    # sqlite:///abs/path -> /abs/path, sqlite://rel/path -> rel/path
+    return BROKERS[scheme](rest[1:] if rest.startswith("//") else rest)
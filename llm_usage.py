@@ -0,0 +1,129 @@
+"""
+Token and cost accounting for every LLM call made by the pipeline.
+Call sites pass the raw completion response to record_response together
+with the stage name, and reports are built from the shared LEDGER.
+"""
+import threading
+from typing import Dict, List, Optional
+
+# USD per 1M tokens: (input, output)
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+DEFAULT_PRICE = PRICES["gpt-4o"]
+# USD per 1M input tokens served from the provider's prompt-prefix cache
+CACHED_INPUT_PRICES = {
+    "gpt-4o": 1.25,
+    "gpt-4o-mini": 0.075,
+    "gpt-4.1": 0.50,
+    "gpt-4.1-mini": 0.10,
+}
+
+
+def _model_key(model: str) -> str:
+    """Price table key for a model name, ignoring provider prefixes such as azure/"""
+    name = (model or "").split("/")[-1]
+    # Longest key first so gpt-4o-mini is not priced as gpt-4o
+    for key in sorted(PRICES, key=len, reverse=True):
+        if name.startswith(key):
+            return key
+    return "gpt-4o"
+
+
+def price_for(model: str):
+    return PRICES.get(_model_key(model), DEFAULT_PRICE)
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    input_price, output_price = price_for(model)
+    cached_price = CACHED_INPUT_PRICES.get(_model_key(model), input_price)
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1_000_000
+
+
+def cache_savings(model: str, cached_tokens: int) -> float:
+    """Money not spent because cached_tokens were billed at the cached input price"""
+    input_price, _ = price_for(model)
+    cached_price = CACHED_INPUT_PRICES.get(_model_key(model), input_price)
+    return cached_tokens * (input_price - cached_price) / 1_000_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; about 4 characters per token for English and code"""
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of text within roughly max_tokens"""
+    max_chars = max(max_tokens, 0) * 4
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n... [{len(text) - max_chars} characters truncated] ...\n{text[-half:]}"
+
+
+class UsageLedger:
+    """Thread-safe list of per-call usage records"""
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               cost: Optional[float] = None, cached_tokens: int = 0) -> Dict:
+        entry = {
+            "stage": stage,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cost": token_cost(model, prompt_tokens, completion_tokens, cached_tokens) if cost is None else cost,
+            "saved": cache_savings(model, cached_tokens),
+        }
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    def total(self, **filters) -> float:
+        with self._lock:
+            return sum(r["cost"] for r in self.records
+                       if all(r.get(key) == value for key, value in filters.items()))
+
+    def by(self, key: str) -> Dict[str, Dict]:
+        """Aggregate tokens and cost grouped by a record field, e.g. "stage" or "model" """
+        totals: Dict[str, Dict] = {}
+        with self._lock:
+            for r in self.records:
+                bucket = totals.setdefault(r[key], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                    "completion_tokens": 0, "cost": 0.0, "saved": 0.0})
+                bucket["calls"] += 1
+                bucket["prompt_tokens"] += r["prompt_tokens"]
+                bucket["cached_tokens"] += r["cached_tokens"]
+                bucket["completion_tokens"] += r["completion_tokens"]
+                bucket["cost"] += r["cost"]
+                bucket["saved"] += r["saved"]
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+
+
+LEDGER = UsageLedger()
+
+
+def record_response(stage: str, model: str, response) -> Optional[Dict]:
+    """Record the usage block of a chat completion response, if it has one"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return LEDGER.record(
+        stage,
+        model,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+    )
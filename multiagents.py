@@ -1,15 +1,58 @@
+import argparse
 import asyncio
 import os
 import json
+import time
 import yaml
 import re
 from dotenv import load_dotenv
-import requests
-import base64
 from autogen import AssistantAgent, GroupChat, GroupChatManager, UserProxyAgent
 
+from github_tools import TOOL_STATS, convert_web_url_to_api, register_tools, repo_commit_for
+from history import HistoryManager, attach_history_compaction
+from patch_model import extract_patch, parse_patch
+from tool_cache import ToolSession
+
+ROUND_TIMEOUT = float(os.getenv("GROUPCHAT_ROUND_TIMEOUT", "300"))
+CHAT_TIMEOUT = float(os.getenv("GROUPCHAT_TIMEOUT", "1800"))
+
+# Respuestas simultáneas permitidas por agente, compartidas por todos los group chats del proceso
+AGENT_CONCURRENCY = {
+    "analyzer": int(os.getenv("ANALYZER_CONCURRENCY", "4")),
+    "swe_agent": int(os.getenv("SWE_AGENT_CONCURRENCY", "1")),
+    "reviser": int(os.getenv("REVISER_CONCURRENCY", "4")),
+}
+_agent_semaphores = {}
+
+
+def agent_semaphore(name: str) -> asyncio.Semaphore:
+    if name not in _agent_semaphores:
+        _agent_semaphores[name] = asyncio.Semaphore(AGENT_CONCURRENCY.get(name, 4))
+    return _agent_semaphores[name]
+
+
+class BoundedAssistantAgent(AssistantAgent):
+    """AssistantAgent whose replies are limited per agent name and cancelled after round_timeout"""
+    def __init__(self, *args, round_timeout: float = ROUND_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_timeout = round_timeout
+        self.timed_out_rounds = 0
+
+    async def a_generate_reply(self, messages=None, sender=None, **kwargs):
+        async with agent_semaphore(self.name):
+            try:
+                return await asyncio.wait_for(
+                    super().a_generate_reply(messages=messages, sender=sender, **kwargs),
+                    timeout=self.round_timeout
+                )
+            except asyncio.TimeoutError:
+                self.timed_out_rounds += 1
+                print(f"⏱️  {self.name} superó {self.round_timeout}s en esta ronda; respuesta cancelada")
+                return None
+
+
 # Carga YAML sin modificar estructura
-def load_agent_from_yaml(filepath, config):
+def load_agent_from_yaml(filepath, config, round_timeout=ROUND_TIMEOUT):
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             data = yaml.safe_load(f)
@@ -21,73 +64,15 @@ def load_agent_from_yaml(filepath, config):
         print(f"Asegúrate que el archivo exista en el directorio actual.")
         raise
 
-    return AssistantAgent(
+    return BoundedAssistantAgent(
         name=data["name"],
         system_message=data["system_message"],
-        llm_config={"config_list": [config], "temperature": data.get("temperature", 0.1)}
+        llm_config={"config_list": [config], "temperature": data.get("temperature", 0.1)},
+        round_timeout=round_timeout
     )
 
-def convert_web_url_to_api(url: str) -> str:
-    try:
-        if "github.com" in url and "/issues/" in url:
-            parts = url.split("github.com/")[1].split("/issues/")
-            repo_path = parts[0]
-            issue_number = parts[1]
-            return f"https://api.github.com/repos/{repo_path}/issues/{issue_number}"
-        else:
-            raise ValueError("Formato de URL no reconocido")
-    except Exception as e:
-        return f"Error convirtiendo URL: {str(e)}"
-
-def get_github_issue(issue_url: str) -> str:
-    try:
-        response = requests.get(issue_url)
-        response.raise_for_status()
-        issue_data = response.json()
-
-        return f"""
-Title: {issue_data['title']}
-State: {issue_data['state']}
-URL: {issue_data['html_url']}
-Body: {issue_data['body']}
-"""
-    except Exception as e:
-        return f"Error obteniendo issue: {str(e)}"
-
-def get_repository_structure(repo_owner: str, repo_name: str, path: str = "") -> str:
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{path}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        contents = response.json()
-
-        structure = []
-        for item in contents:
-            if item['type'] == 'file':
-                structure.append(f"FILE: {item['path']}")
-            elif item['type'] == 'dir':
-                structure.append(f"DIR: {item['path']}/")
-        return "\n".join(structure)
-    except Exception as e:
-        return f"Error obteniendo estructura del repo: {str(e)}"
-
-def get_file_content(repo_owner: str, repo_name: str, file_path: str) -> str:
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{file_path}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        file_data = response.json()
-
-        if file_data.get('encoding') == 'base64':
-            content = base64.b64decode(file_data['content']).decode('utf-8')
-            return f"Contenido de {file_path}:\n{content}"
-        else:
-            return f"No se pudo decodificar el contenido de {file_path}"
-    except Exception as e:
-        return f"Error obteniendo archivo {file_path}: {str(e)}"
-
 class AnalyzerDataStore:
-    def _init_(self):
+    def __init__(self):
         self.json_data = None
         self.raw_content = None
         self.timestamp = None
@@ -95,7 +80,7 @@ class AnalyzerDataStore:
     def save_data(self, json_data, raw_content=None):
         self.json_data = json_data
         self.raw_content = raw_content
-        self.timestamp = asyncio.get_event_loop().time()
+        self.timestamp = time.time()
 
     def get_data(self):
         return {
@@ -107,77 +92,166 @@ class AnalyzerDataStore:
     def has_data(self):
         return self.json_data is not None
 
-analyzer_store = AnalyzerDataStore()
+ANALYSIS_FIELDS = ("problem_statement", "filepath", "first_guess", "paradigm")
+KEY_VALUE_LINE = re.compile(r'^\s*[-*]?\s*"?(problem_statement|filepath|first_guess|paradigm)"?\s*:\s*(.*)$', re.MULTILINE)
+APPROVAL_PATTERN = re.compile(r"\bLGTM\b|👍")
+
+
+def message_text(message) -> str:
+    if isinstance(message, dict):
+        return message.get("content") or ""
+    return "" if message is None else str(message)
+
+def extract_json_objects(content: str):
+    """Todos los objetos JSON del texto, incluidos los anidados que un regex no-greedy corta"""
+    decoder = json.JSONDecoder()
+    objects = []
+    pos = content.find("{")
+    while pos != -1:
+        try:
+            obj, end = decoder.raw_decode(content, pos)
+        except ValueError:
+            pos = content.find("{", pos + 1)
+            continue
+        if isinstance(obj, dict):
+            objects.append(obj)
+        pos = content.find("{", end)
+    return objects
+
+def parse_analysis(content: str):
+    """Análisis del analyzer como JSON o como texto key: value; None si aún está incompleto"""
+    for obj in extract_json_objects(content):
+        if obj.get("filepath") and obj.get("problem_statement"):
+            return obj
+    fields = {key: value.strip().strip('"').strip() for key, value in KEY_VALUE_LINE.findall(content)}
+    if fields.get("filepath") and fields.get("problem_statement"):
+        return {key: fields.get(key, "") for key in ANALYSIS_FIELDS}
+    return None
+
+def parse_patch_reply(content: str):
+    """JSON del swe_agent con "patch", o un diff suelto; None si no hay parche"""
+    for obj in extract_json_objects(content):
+        if obj.get("patch"):
+            return obj
+    patch = extract_patch(content)
+    if patch:
+        return {"patch": patch, "filepath": (parse_patch(patch).touched_paths() or [""])[0]}
+    return None
+
+def is_approval(content: str) -> bool:
+    return bool(APPROVAL_PATTERN.search(content))
+
+
+class SpeakerStateMachine:
+    """
+    Selección de orador determinista para el GroupChat (speaker_selection_method).
+    user -> analyzer; analyzer -> swe_agent cuando hay análisis completo;
+    swe_agent -> reviser cuando hay parche; reviser -> fin con LGTM, si no -> swe_agent.
+    Las llamadas a herramientas vuelven al agente que las pidió. No hace llamadas LLM.
+    """
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+        self.analysis = None
+        self.patch = None
+        self.approved = False
+        self.rounds = 0
+        self.transitions = {}
+        self._turn_start = None
+
+    def _write_output(self, filename, data):
+        if self.output_dir:
+            with open(os.path.join(self.output_dir, filename), "w") as f:
+                json.dump(data, f, indent=2)
+
+    def _record(self, last_name, next_name):
+        now = time.perf_counter()
+        if self._turn_start is not None:
+            # Latencia del turno de last_name, que termina con esta transición
+            stats = self.transitions.setdefault(f"{last_name}->{next_name}",
+                                                {"count": 0, "total": 0.0, "max": 0.0})
+            elapsed = now - self._turn_start
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+        self._turn_start = now
+        self.rounds += 1
+
+    def next_speaker(self, last_name: str, message) -> str:
+        content = message_text(message)
+        if isinstance(message, dict) and (message.get("tool_calls") or message.get("function_call")):
+            return last_name
+        if isinstance(message, dict) and (message.get("role") == "tool" or message.get("tool_responses")):
+            return last_name
+        if last_name == "analyzer":
+            analysis = parse_analysis(content)
+            if analysis is None:
+                return "analyzer"
+            self.analysis = analysis
+            self._write_output("analyzer_output.json", analysis)
+            return "swe_agent"
+        if last_name == "swe_agent":
+            patch = parse_patch_reply(content)
+            if patch is None:
+                return "swe_agent"
+            self.patch = patch
+            self._write_output("swe_agent_output.json", patch)
+            return "reviser"
+        if last_name == "reviser":
+            if is_approval(content):
+                self.approved = True
+                return None
+            return "swe_agent"
+        return "analyzer"
+
+    def __call__(self, last_speaker, groupchat):
+        message = groupchat.messages[-1] if groupchat.messages else None
+        next_name = self.next_speaker(last_speaker.name, message)
+        self._record(last_speaker.name, next_name or "end")
+        if next_name is None:
+            return None
+        print(f"🔀 Ronda {self.rounds}: {last_speaker.name} -> {next_name}")
+        return groupchat.agent_by_name(next_name)
+
+    def metrics(self):
+        transitions = {
+            name: dict(stats, mean=stats["total"] / stats["count"])
+            for name, stats in self.transitions.items()
+        }
+        return {"rounds": self.rounds, "approved": self.approved, "transitions": transitions}
+
 
 class CustomGroupChatManager(GroupChatManager):
-    def _init_(self, *args, **kwargs):
-        super()._init_(*args, **kwargs)
-        self.analyzer_json = None
-        self.swe_json = None
+    def __init__(self, *args, output_dir=".", **kwargs):
+        # La selección de orador la hace SpeakerStateMachine, así que el manager no necesita LLM
+        kwargs.setdefault("llm_config", False)
+        super().__init__(*args, **kwargs)
+        # Cada chat escribe en su propio directorio para que varios chats no se pisen
+        self.output_dir = output_dir
+        self.analyzer_store = AnalyzerDataStore()
+        os.makedirs(output_dir, exist_ok=True)
+        self.router = self.groupchat.speaker_selection_method
+        if isinstance(self.router, SpeakerStateMachine):
+            self.router.output_dir = output_dir
 
     def _process_received_message(self, message, sender, silent):
         result = super()._process_received_message(message, sender, silent)
-
-        if hasattr(sender, 'name'):
-            content = ""
-            if isinstance(message, dict):
-                content = message.get('content', '') or str(message)
-            elif isinstance(message, str):
-                content = message
-            else:
-                content = str(message)
-
-            if sender.name == "analyzer":
-                match = re.search(r"\{[\s\S]*?\}", content)
-                if match:
-                    try:
-                        analyzer_json = json.loads(match.group())
-                        self.analyzer_json = analyzer_json
-                        with open("analyzer_output.json", "w") as f:
-                            json.dump(analyzer_json, f, indent=2)
-                    except Exception as e:
-                        print(f"Error parsing analyzer JSON: {e}")
-
-            elif sender.name == "swe_agent":
-                match = re.search(r"\{[\s\S]*?\}", content)
-                if match:
-                    try:
-                        swe_json = json.loads(match.group())
-                        self.swe_json = swe_json
-                        with open("swe_agent_output.json", "w") as f:
-                            json.dump(swe_json, f, indent=2)
-                        reviser_agent = None
-                        for agent in self.groupchat.agents:
-                            if agent.name == "reviser":
-                                reviser_agent = agent
-                                break
-                        if reviser_agent:
-                            swe_message = json.dumps(swe_json, indent=2)
-                            self.groupchat.send_message(
-                                sender=self.groupchat.get_agent_by_name("swe_agent"),
-                                recipient=reviser_agent,
-                                message=swe_message
-                            )
-                            print("✅ Enviado output de SWE Agent al reviser.")
-                        else:
-                            print("❌ No se encontró agente reviser en el groupchat.")
-                    except Exception as e:
-                        print(f"Error parsing SWE JSON: {e}")
+        if getattr(sender, 'name', None) == "analyzer" and isinstance(self.router, SpeakerStateMachine):
+            analysis = parse_analysis(message_text(message))
+            if analysis is not None:
+                self.analyzer_store.save_data(analysis, message_text(message))
         return result
 
     def get_analyzer_data(self):
-        return self.analyzer_json
+        return self.router.analysis if isinstance(self.router, SpeakerStateMachine) else None
 
     def get_swe_data(self):
-        return self.swe_json
+        return self.router.patch if isinstance(self.router, SpeakerStateMachine) else None
 
-async def main():
-    load_dotenv()
-
-    user_input_url = input("Introduce la URL del issue de GitHub: ").strip()
-    issue_url = convert_web_url_to_api(user_input_url)
+    def get_metrics(self):
+        return self.router.metrics() if isinstance(self.router, SpeakerStateMachine) else {}
 
-    # Configuraciones LLM separadas
+def build_configs():
+    """Configuraciones LLM separadas por agente"""
     config_analyzer = {
         "api_type": "azure",  # o "local" si usas local
         "api_key": os.getenv("AGENTS_API_KEY"),
@@ -200,65 +274,149 @@ async def main():
         "api_version": os.getenv("AGENTS_API_VERSION"),
         "model": os.getenv("AGENTS_MODEL_NAME", "gpt-4o")
     }
+    return config_analyzer, config_swe_agent, config_reviser
 
-    # Verificar archivos YAML
-    yaml_files = ["analyzer.yaml", "swe_agent.yaml", "reviser.yaml"]
-    for yaml_file in yaml_files:
-        if not os.path.exists(yaml_file):
-            print(f"Error: No se encontró el archivo {yaml_file}")
-            print(f"Archivos en el directorio actual: {os.listdir('.')}")
-            return
+def issue_slug(issue_url: str) -> str:
+    """https://api.github.com/repos/owner/repo/issues/7 -> owner__repo-7"""
+    match = re.search(r"repos/([^/]+)/([^/]+)/issues/(\d+)", issue_url)
+    if not match:
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", issue_url)[-60:]
+    return f"{match.group(1)}__{match.group(2)}-{match.group(3)}"
+
+async def run_group_chat(issue_url, max_round=20, round_timeout=ROUND_TIMEOUT, output_dir="multiagent_runs"):
+    """Un group chat completo para un issue; cada llamada crea sus propios agentes y estado"""
+    config_analyzer, config_swe_agent, config_reviser = build_configs()
 
     # Cargar agentes con sus configs respectivas
-    analyzer = load_agent_from_yaml("analyzer.yaml", config_analyzer)
-    swe_agent = load_agent_from_yaml("swe_agent.yaml", config_swe_agent)
-    reviser = load_agent_from_yaml("reviser.yaml", config_reviser)
-    print("✅ Agentes cargados exitosamente desde YAML")
-
-    # Registrar funciones para analyzer
-    analyzer.register_for_execution(name="get_github_issue")(get_github_issue)
-    analyzer.register_for_llm(description="Fetch GitHub issue details using the full issue API URL")(get_github_issue)
-    analyzer.register_for_execution(name="get_repository_structure")(get_repository_structure)
-    analyzer.register_for_llm(description="Get repository file and folder structure")(get_repository_structure)
-    analyzer.register_for_execution(name="get_file_content")(get_file_content)
-    analyzer.register_for_llm(description="Get content of a specific file from repository")(get_file_content)
+    analyzer = load_agent_from_yaml("analyzer.yaml", config_analyzer, round_timeout)
+    swe_agent = load_agent_from_yaml("swe_agent.yaml", config_swe_agent, round_timeout)
+    reviser = load_agent_from_yaml("reviser.yaml", config_reviser, round_timeout)
+    print(f"✅ Agentes cargados exitosamente desde YAML para {issue_url}")
+
+    # Compactar historial largo: las observaciones viejas se resumen y se recuperan por handle
+    history = HistoryManager(
+        keep_last=int(os.getenv("HISTORY_KEEP_LAST", "6")),
+        max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "8000")),
+    )
+    for agent in (analyzer, swe_agent, reviser):
+        attach_history_compaction(agent, history)
+
+    def recall_observation(handle: str) -> str:
+        return history.recall(handle)
+
+    # Registrar herramientas compartidas para analyzer (async: corren en un hilo y no bloquean el event loop)
+    # Resultados memoizados por chat y compartidos entre chats del mismo commit; los largos se paginan
+    tool_session = ToolSession(commit_for=repo_commit_for)
+    register_tools(analyzer, asynchronous=True, session=tool_session)
+    analyzer.register_for_execution(name="recall_observation")(recall_observation)
+    analyzer.register_for_llm(description="Return the exact content of an earlier tool result that was summarized in the history")(recall_observation)
 
     # Crear agente usuario (sin input humano en este ejemplo)
     user = UserProxyAgent(
         name="user",
         code_execution_config=False,
         human_input_mode="NEVER",
-        is_termination_msg=lambda x: "LGTM" in x.get("content", "") or "👍" in x.get("content", "")
+        is_termination_msg=lambda x: "LGTM" in (x.get("content") or "") or "👍" in (x.get("content") or "")
     )
 
-    # Crear grupo de chat con todos los agentes
+    # Crear grupo de chat con todos los agentes; el orden lo decide la máquina de estados
+    speaker_selector = SpeakerStateMachine()
     groupchat = GroupChat(
         agents=[user, analyzer, swe_agent, reviser],
         messages=[],
-        max_round=20
+        max_round=max_round,
+        speaker_selection_method=speaker_selector
     )
 
-    # Crear manager personalizado
+    # Crear manager personalizado (sin llm_config: elegir orador no cuesta llamadas LLM)
     manager = CustomGroupChatManager(
         groupchat=groupchat,
-        llm_config={"config_list": [config_analyzer], "temperature": 0.1}
+        output_dir=os.path.join(output_dir, issue_slug(issue_url))
     )
 
-    # Registrar el listener del manager para controlar flujos
-    # Enviaremos mensajes manualmente para forzar el flujo secuencial:
-    # 1) usuario -> analyzer
-    # 2) analyzer -> swe_agent
-    # 3) swe_agent -> reviser
-
-    # Enviar el input inicial al analyzer
-    manager.groupchat.send_message(
-        sender=user,
-        recipient=analyzer,
+    # Enviar el input inicial y ejecutar el chat sin bloquear el event loop
+    start = time.perf_counter()
+    await user.a_initiate_chat(
+        manager,
         message=f"Por favor analiza este issue:\n{issue_url}"
     )
+    elapsed = time.perf_counter() - start
+    timeouts = sum(agent.timed_out_rounds for agent in (analyzer, swe_agent, reviser))
+    metrics = manager.get_metrics()
+    print(f"   {tool_session.report()}")
+    print(f"🏁 {issue_url}: {metrics['rounds']} ronda(s), {len(groupchat.messages)} mensajes en {elapsed:.1f}s "
+          f"({timeouts} ronda(s) con timeout, aprobado: {metrics['approved']})")
+    for transition, stats in sorted(metrics["transitions"].items()):
+        print(f"   {transition:<22} x{stats['count']:<3} media {stats['mean']:.1f}s  max {stats['max']:.1f}s")
+    return {
+        "issue_url": issue_url,
+        "messages": len(groupchat.messages),
+        "elapsed": elapsed,
+        "timed_out_rounds": timeouts,
+        "metrics": metrics,
+        "tool_cache": dict(tool_session.stats),
+        "analyzer": manager.get_analyzer_data(),
+        "swe_agent": manager.get_swe_data(),
+    }
+
+async def run_group_chats(issue_urls, max_chats=2, chat_timeout=CHAT_TIMEOUT, **kwargs):
+    """Varios group chats en paralelo en un solo proceso; un chat que falla o expira no cancela a los demás"""
+    limit = asyncio.Semaphore(max_chats)
+
+    async def bounded(issue_url):
+        async with limit:
+            try:
+                return await asyncio.wait_for(run_group_chat(issue_url, **kwargs), timeout=chat_timeout)
+            except asyncio.TimeoutError:
+                print(f"⏱️  Chat de {issue_url} cancelado tras {chat_timeout}s")
+                return {"issue_url": issue_url, "error": f"timeout after {chat_timeout}s"}
+            except Exception as e:
+                print(f"❌ Error en el chat de {issue_url}: {e}")
+                return {"issue_url": issue_url, "error": str(e)}
+
+    return await asyncio.gather(*(bounded(url) for url in issue_urls))
+
+async def main():
+    load_dotenv()
 
-    # Ejecutar el loop del manager
-    await manager.run_chat()
+    parser = argparse.ArgumentParser(description="Run the analyzer / swe_agent / reviser group chat on GitHub issues")
+    parser.add_argument("issue_urls", nargs="+", help="GitHub issue URL(s), e.g. https://github.com/owner/repo/issues/1")
+    parser.add_argument("--max-round", type=int, default=20)
+    parser.add_argument("--round-timeout", type=float, default=ROUND_TIMEOUT, help="seconds per agent reply")
+    parser.add_argument("--chat-timeout", type=float, default=CHAT_TIMEOUT, help="seconds per group chat")
+    parser.add_argument("--max-chats", type=int, default=2, help="group chats running at the same time")
+    parser.add_argument("--output-dir", default="multiagent_runs")
+    args = parser.parse_args()
+
+    # Verificar archivos YAML
+    yaml_files = ["analyzer.yaml", "swe_agent.yaml", "reviser.yaml"]
+    for yaml_file in yaml_files:
+        if not os.path.exists(yaml_file):
+            print(f"Error: No se encontró el archivo {yaml_file}")
+            print(f"Archivos en el directorio actual: {os.listdir('.')}")
+            return
+
+    issue_urls = []
+    for url in args.issue_urls:
+        issue_url = convert_web_url_to_api(url.strip())
+        if issue_url.startswith("Error"):
+            print(f"❌ {url}: {issue_url}")
+            continue
+        issue_urls.append(issue_url)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = await run_group_chats(
+        issue_urls,
+        max_chats=args.max_chats,
+        chat_timeout=args.chat_timeout,
+        max_round=args.max_round,
+        round_timeout=args.round_timeout,
+        output_dir=args.output_dir
+    )
+    with open(os.path.join(args.output_dir, "summary.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    print(TOOL_STATS.report())
+    print(f"📝 Resumen guardado en {os.path.join(args.output_dir, 'summary.json')}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -3,11 +3,23 @@ import subprocess
 import sys
 import json
 from openai import AzureOpenAI
-import requests
 from urllib.parse import urlparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from github_scheduler import github_get
+from artifact_store import instance_id
+from fix_memory import EXAMPLE_VERDICTS, FixMemory, format_examples
+from issue_dedup import SHORT_CIRCUIT_THRESHOLD, IssueIndex
+from issue_context import fetch_issue_context, problem_statement as issue_problem_statement
+from llm_usage import LEDGER, estimate_tokens, record_response, truncate_to_tokens
+from patch_model import Patch, parse_patch, parse_patch_file
+from prompt_cache import cache_report, prefix_messages
+from provisioning import EnvironmentProvisioner, IssueTimeline
+from router import ModelRouter
+from traceback_locator import describe_crash_site, locate_crash_site
+
 # Azure OpenAI config
 load_dotenv()
 CLIENT = AzureOpenAI(
@@ -25,106 +37,206 @@ def transform_github_url_to_api(issue_url):
     return f"https://api.github.com/repos/{owner}/{repo}/issues/{issue_number}", owner, repo
 
 def fetch_issue_data(api_url):
-    headers = {"Accept": "application/vnd.github+json"}
-    response = requests.get(api_url, headers=headers)
+    response = github_get(api_url)
     response.raise_for_status()
     return response.json()
 
-def fetch_repo_tree(owner, repo):
-    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/HEAD?recursive=1"
-    response = requests.get(url)
+def fetch_repo_tree(owner, repo, ref="HEAD"):
+    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{ref}?recursive=1"
+    response = github_get(url)
     response.raise_for_status()
     tree_data = response.json().get("tree", [])
     return [item['path'] for item in tree_data if item['type'] == 'blob']
 
 def fetch_file_content(owner, repo, filepath):
     url = f"https://raw.githubusercontent.com/{owner}/{repo}/HEAD/{filepath}"
-    response = requests.get(url)
+    response = github_get(url)
     if response.status_code == 200:
         return response.text
     return ""
 
+def fetch_issue_bundle(issue_url):
+    """
+    Problem statement (with comments and linked PRs) and head SHA from one GraphQL query.
+    Falls back to the REST issue endpoint when GraphQL is unavailable, e.g. without a token.
+    """
+    try:
+        context = fetch_issue_context(issue_url)
+        if "error" not in context:
+            return issue_problem_statement(context), context.get("head_sha") or "HEAD"
+        print(f"⚠️  GraphQL issue context failed: {context['error']}; using REST")
+    except Exception as e:
+        print(f"⚠️  GraphQL issue context failed: {e}; using REST")
+    api_url, _, _ = transform_github_url_to_api(issue_url)
+    issue_data = fetch_issue_data(api_url)
+    return f"{issue_data.get('title', '')}\n\n{issue_data.get('body', '')}", "HEAD"
+
 def build_codebase(owner, repo, paths):
     codebase = {}
     for path in paths:
         code = fetch_file_content(owner, repo, path)
         codebase[path] = code
     return codebase
-def guess_most_relevant_file(problem_statement, tree_data):
-    prompt = f"""
-You are an assistant helping a software engineer fix an issue.
 
-Given this problem statement:
----
-{problem_statement}
----
 
-And here is the code tree data:
----
-{tree_data}
----
+# Prompts are laid out static-first so the provider can reuse the cached prefix:
+# fixed system prompt, then content shared by calls on the same repo, then the issue.
+GUESS_FILE_SYSTEM_PROMPT = """You are an assistant helping a software engineer fix an issue.
+You will receive the code tree of a repository followed by a problem statement.
 Which file is most likely to be the one that contains the bug? Return only the file path, try to always return a file path, even if you are not sure.
-Response example: `path/to/file.py`
-        """
+Response example: `path/to/file.py`"""
+
+FIRST_GUESS_SYSTEM_PROMPT = """You will receive a problem statement and the most relevant file for it.
+What is likely the root cause of this issue? Provide a brief, direct analysis in 1-2 sentences, try to always return something on this field."""
+
+PARADIGMS = [
+    "Procedural Programming",
+    "Objected-Oriented Programming",
+    "Procedural and Objected-Oriented Programming",
+]
+
+PARADIGM_SYSTEM_PROMPT = """You will receive a problem statement and the most relevant file for it.
+Which programming paradigm does the affected code use? Answer with exactly one of:
+""" + "\n".join(PARADIGMS)
+
+
+def guess_most_relevant_file(problem_statement, tree_data, model="gpt-4o"):
+    tree = "\n".join(tree_data) if isinstance(tree_data, list) else str(tree_data)
+    messages = prefix_messages(
+        "guess_file",
+        GUESS_FILE_SYSTEM_PROMPT,
+        f"Code tree data:\n---\n{tree}\n---",
+        f"Problem statement:\n---\n{problem_statement}\n---"
+    )
     try:
         response = CLIENT.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            messages=messages,
             max_tokens=50,
             temperature=0.3
         )
+        record_response("guess_file", model, response)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Exception: GPT-4 guess failed: {e}")
         return None
 
 
-def guess_what_went_wrong(problem_statement, file_guess):
-    prompt = f"""
-Given this problem statement:
----
-{problem_statement}
----
-
-And the most relevant file: {file_guess}
+def guess_what_went_wrong(problem_statement, file_guess, file_outline=None, model="gpt-4o", crash_site=None,
+                          examples=""):
+    outline = ""
+    if file_outline:
+        outline = "\nDefinitions in that file:\n" + "\n".join(file_outline)
+    if crash_site:
+        outline += "\n" + describe_crash_site(crash_site)
+    if examples:
+        outline += "\n\n" + examples
+    messages = prefix_messages(
+        "first_guess",
+        FIRST_GUESS_SYSTEM_PROMPT,
+        "",
+        f"Problem statement:\n---\n{problem_statement}\n---\n\nMost relevant file: {file_guess}{outline}"
+    )
 
-What is likely the root cause of this issue? Provide a brief, direct analysis in 1-2 sentences, try to always return something on this field.
-"""
-    
     try:
         response = CLIENT.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            messages=messages,
             max_tokens=100,
             temperature=0.3
         )
+        record_response("first_guess", model, response)
         return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Exception: Failed to guess what went wrong: {e}")
         return "Unable to analyze the problem at this time."
 
 
+def classify_paradigm(problem_statement, file_guess, model="gpt-4o"):
+    messages = prefix_messages(
+        "paradigm",
+        PARADIGM_SYSTEM_PROMPT,
+        "",
+        f"Problem statement:\n---\n{problem_statement}\n---\n\nMost relevant file: {file_guess}"
+    )
+
+    try:
+        response = CLIENT.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=20,
+            temperature=0.0
+        )
+        record_response("paradigm", model, response)
+        answer = response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Exception: Failed to classify paradigm: {e}")
+        return ""
+    # Longest first so the combined label wins over its substrings
+    for paradigm in sorted(PARADIGMS, key=len, reverse=True):
+        if paradigm.lower() in answer.lower():
+            return paradigm
+    return ""
+
 
-def run_analyzer(issue_url):
+
+def run_analyzer(issue_url, router=None, dedup=None, memory=None):
     api_url, owner, repo = transform_github_url_to_api(issue_url)
-    issue_data = fetch_issue_data(api_url)
-    title = issue_data.get("title", "")
-    body = issue_data.get("body", "")
-    problem_statement = f"{title}\n\n{body}"
+    problem_statement, head_sha = fetch_issue_bundle(issue_url)
+    # The issue's own earlier runs are not examples of how to solve it
+    similar_fixes = memory.search(problem_statement, verdicts=EXAMPLE_VERDICTS,
+                                  exclude=(issue_url, instance_id(issue_url))) if memory else []
+    fix_examples = format_examples(similar_fixes)
+
+    # A near-duplicate of an issue we already fixed reuses that analysis instead of new LLM calls
+    duplicate = dedup.find_resolved(problem_statement, f"{owner}/{repo}", exclude_url=issue_url) if dedup else None
 
-    file_paths = fetch_repo_tree(owner, repo)
+    # Tree at the exact commit the issue context was read at
+    file_paths = fetch_repo_tree(owner, repo, head_sha)
     # codebase = build_codebase(owner, repo, file_paths)
 
-    file_guess = guess_most_relevant_file(problem_statement, file_paths)
+    route = None
+    model = "gpt-4o"
+    if router:
+        route = router.route(problem_statement, file_paths, f"{owner}/{repo}")
+        model = router.model(route["tiers"]["analyzer"])
+
+    # A pasted traceback usually names the file already; only ask the LLM when it doesn't
+    crash_site = locate_crash_site(problem_statement, file_paths)
+    if duplicate and duplicate.get("filepath") in file_paths:
+        file_guess = duplicate["filepath"]
+        print(f"♻️  Near-duplicate of {duplicate['issue_url']} (similarity {duplicate['similarity']}), "
+              f"reusing its analysis")
+    elif crash_site and crash_site["confident"]:
+        file_guess = crash_site["filepath"]
+        print(f"🎯 {describe_crash_site(crash_site)}, skipping the file-guess call")
+    else:
+        file_guess = guess_most_relevant_file(problem_statement, file_paths, model=model)
 
-    first_guess = guess_what_went_wrong(problem_statement, file_guess)
+    if duplicate and duplicate.get("first_guess") and file_guess == duplicate.get("filepath"):
+        first_guess = duplicate["first_guess"]
+    else:
+        first_guess = guess_what_went_wrong(problem_statement, file_guess, model=model, crash_site=crash_site,
+                                            examples=fix_examples)
 
     analyzer_result = {
         "problem_statement": problem_statement,
         "github_url": issue_url,
         "first_guess": first_guess,
-        "filepath": file_guess  # optional: truncate or remove if too large
+        "filepath": file_guess,  # optional: truncate or remove if too large
+        "base_commit": head_sha
     }
+    if crash_site:
+        analyzer_result["crash_site"] = crash_site
+    if similar_fixes:
+        analyzer_result["similar_fixes"] = [{"key": r["key"], "score": score} for score, r in similar_fixes]
+        analyzer_result["fix_examples"] = fix_examples
+    if duplicate:
+        analyzer_result["duplicate_of"] = {key: duplicate.get(key) for key in ("issue_url", "similarity", "patch")}
+    if dedup:
+        dedup.add(issue_url, problem_statement, status="analyzed", filepath=file_guess, first_guess=first_guess)
+    if route:
+        analyzer_result["route"] = route
 
     return analyzer_result
 
@@ -142,48 +254,125 @@ def truncate_github_url(issue_url):
     return f"https://github.com/{owner}/{repo}"
 
 
-def send_to_swe_agent(data):
-    # Mocked call to SWE agent - replace with actual implementation
+SWE_AGENT_PREFIX_CACHE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "swe_agent_prefix_cache.yaml")
+
+
+SWE_AGENT_PROBLEM_DIR = os.path.join(".fix_memory", "problem_statements")
+
+
+def write_problem_statement(data):
+    """Issue text plus retrieved past fixes as a file SWE-agent can read instead of the GitHub issue"""
+    instance = instance_id(data['github_url'])
+    os.makedirs(SWE_AGENT_PROBLEM_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(SWE_AGENT_PROBLEM_DIR, f"{instance}.md"))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{data['problem_statement']}\n\n{data['fix_examples']}\n")
+    return path, instance
+
+
+def swe_agent_command(data, extra_args=()):
+    """SWE-agent run command for data['github_url'], with the optional model override and extra CLI args"""
     github_repo_url = truncate_github_url(data['github_url'])
     problem_statement_github_url = data['github_url']
+    if data.get('fix_examples') and data.get('problem_statement'):
+        # Same instance id as the GitHub problem statement so trajectories/ keeps its naming
+        problem_path, instance = write_problem_statement(data)
+        problem_args = [f"--problem_statement.path={problem_path}", f"--problem_statement.id={instance}"]
+    else:
+        problem_args = [f"--problem_statement.github_url={problem_statement_github_url}"]
 
     # Run python SWE-Agent/sweagent/run/run.py run \
     # --env.repo.github_url={github_repo_url} \
     # --problem.statement.github_url={problem_statement_github_url} \
     # --config SWE-Agent/config/custom_env.yaml 
-    result = subprocess.run([
+    cmd = [
         "python", "SWE-agent/sweagent/run/run.py", "run",
         "--config", "SWE-agent/config/custom_env.yaml",
-        f"--env.repo.github_url={github_repo_url}",
-        f"--problem_statement.github_url={problem_statement_github_url}"
-    ], capture_output=True, text=True)
-    print("\n -------------------------------------------------------\n")
-    print(result.stdout)
-    print("\n------------------------------------------------------\n\n")
-
+        # A prepared local workspace (see workspaces.py) saves SWE-agent its own clone
+        f"--env.repo.path={data['repo_path']}" if data.get('repo_path') else f"--env.repo.github_url={github_repo_url}",
+        *problem_args
+    ]
+    if os.getenv("SWE_AGENT_PREFIX_CACHE", "1") != "0" and os.path.exists(SWE_AGENT_PREFIX_CACHE_CONFIG):
+        # Overlay that keeps the SWE-agent prompt prefix stable across issues and steps
+        cmd += ["--config", SWE_AGENT_PREFIX_CACHE_CONFIG]
+    if data.get('model'):
+        cmd.append(f"--agent.model.name=azure/{data['model']}")
+    if data.get('output_dir'):
+        # Patch and trajectory go straight to this directory (e.g. staged in the artifact store)
+        cmd.append(f"--output_dir={data['output_dir']}")
+    return cmd + list(extra_args)
+
+
+def collect_swe_agent_patch(stdout, data):
+    """
+    Parse the patch SWE-agent wrote (in data['output_dir'] or as reported in stdout) into data['patch_model'].
+    Returns that Patch, still mapped over the .patch file, or None when the run produced no diff;
+    the caller closes it once the run is reviewed and recorded.
+    """
+    # data is reused across escalation tiers; a run without a patch must not report the previous tier's
+    for key in ('patch', 'patch_model', 'patch_file_path', 'patch_files'):
+        data.pop(key, None)
+    data['swe_cost'] = 0.0
+    patches = sorted(Path(data['output_dir']).rglob("*.patch")) if data.get('output_dir') else []
     # Need to find the result of PATCH_FILE_PATH from result.stdout
     # Ex. PATCH_FILE_PATH='/home/omarmacma/Tec/AplicacionesAvanzadas/SWE-lutions/trajectories/omarmacma/custom_env__azure/gpt-4o__t-0.00__p-1.00__c-15.00___SWE-agent__test-repo-i1/SWE-agent__test-repo-i1/SWE-agent__te-repo-i1.patch'
-    if "PATCH_FILE_PATH=" in result.stdout:
-        patch_file_path = result.stdout.split("PATCH_FILE_PATH='")[1].split("'")[0]
+    if patches:
+        patch_file_path = str(patches[0])
+    elif "PATCH_FILE_PATH=" in stdout:
+        patch_file_path = stdout.split("PATCH_FILE_PATH='")[1].split("'")[0]
         # Replace " \n " with "st"
         patch_file_path = patch_file_path.replace(" \n ", "st")
         patch_file_path = patch_file_path.strip()
     else:
         print("********************************************ERROR: PATCH_FILE_PATH not found in output.*********************************************")
-        return
+        return None
     print(f"📂 Patch file generated at: {patch_file_path}")
-    with open(patch_file_path, 'r') as file:
-        patch_content = file.read()
-    data['patch'] = patch_content
-    print("\n📜 Patch content:")
-    print(patch_content[:500] + "\n...\n" if len(patch_content) > 500 else patch_content)
-    return patch_content
+    data['patch_file_path'] = patch_file_path
+    data['swe_cost'] = record_swe_agent_cost(patch_file_path, data.get('model', "gpt-4o"))
+    patch = parse_patch_file(patch_file_path)
+    if not patch.files:
+        patch.close()
+        print("No diff in the patch file.")
+        return None
+    data['patch_model'] = patch
+    data['patch_files'] = patch.touched_paths()
+    print("\n📜 Patch summary:")
+    print(patch.summary())
+    if data.get('filepath') and not patch.touches(data['filepath']):
+        print(f"⚠️  Patch does not touch the analyzer's file guess: {data['filepath']}")
+    return patch
+
+
+def send_to_swe_agent(data):
+    result = subprocess.run(swe_agent_command(data), capture_output=True, text=True)
+    print("\n -------------------------------------------------------\n")
+    print(result.stdout)
+    print("\n------------------------------------------------------\n\n")
+    return collect_swe_agent_patch(result.stdout, data)
+
+
+def record_swe_agent_cost(patch_file_path, model):
+    """Read model_stats from the .traj written next to the patch and add it to the usage ledger"""
+    traj_path = os.path.splitext(patch_file_path)[0] + ".traj"
+    try:
+        with open(traj_path, 'r') as file:
+            stats = json.load(file).get("info", {}).get("model_stats", {})
+    except (OSError, json.JSONDecodeError):
+        return 0.0
+    LEDGER.record("swe_agent", model, prompt_tokens=stats.get("tokens_sent", 0),
+                  completion_tokens=stats.get("tokens_received", 0), cost=stats.get("instance_cost", 0.0))
+    return stats.get("instance_cost", 0.0)
 
 
 # Revisor
+MIN_UNIT_TOKENS = 600
+UNIT_OVERHEAD_TOKENS = 120
+
+
 class Revisor:
-    def __init__(self):
+    def __init__(self, model="gpt-4o"):
         """Initialize the code reviewer with Azure OpenAI configuration"""
+        self.model = model
         self.system_prompt = """You are a lenient code reviewer. Your task is to analyze patches and determine if they should be approved or need fixes.
 
 You will receive:
@@ -213,15 +402,16 @@ You must respond with a JSON object containing:
 Default to APPROVED unless there are serious functional problems.
 Return no more than 2 suggestions and 2 issues at most."""
 
-    def _call_gpt(self, messages):
+    def _call_gpt(self, messages, max_tokens=1000):
         """Make API call to Azure OpenAI using the client"""
         try:
             response = CLIENT.chat.completions.create(
-                model="gpt-4o",
+                model=self.model,
                 messages=messages,
                 temperature=0.3,
-                max_tokens=1000
+                max_tokens=max_tokens
             )
+            record_response("revisor", self.model, response)
             return response.choices[0].message.content
 
         except Exception as e:
@@ -266,6 +456,144 @@ Provide your analysis as a JSON object with the required fields."""}
                 "suggestions": ["Check system configuration and retry"]
             }
 
+    def review_patch_units(self, problem_statement: str, patch, repo_dir: str = None, unit: str = "file",
+                           context_lines: int = 20, max_total_tokens: int = 12000, max_workers: int = 4) -> dict:
+        """
+        Review a patch split into per-file or per-hunk units, each with a window of the
+        surrounding source from repo_dir, concurrently. Total prompt tokens stay under
+        max_total_tokens however big the patch is. Returns the same shape as review_patch
+        plus a "units" list with the per-unit verdicts.
+        """
+        parsed = patch if isinstance(patch, Patch) else parse_patch(patch)
+        units = self._split_units(parsed, unit)
+        if not units:
+            return self.review_patch(problem_statement, parsed.text() if isinstance(patch, Patch) else patch)
+
+        # Too many units for the budget: coalesce neighbours so each keeps a useful share
+        system_tokens = estimate_tokens(self.system_prompt)
+        max_units = max(1, max_total_tokens // (system_tokens + MIN_UNIT_TOKENS))
+        if len(units) > max_units:
+            size = -(-len(units) // max_units)
+            units = [(", ".join(label for label, _ in units[i:i + size]),
+                      [h for _, pieces in units[i:i + size] for h in pieces])
+                     for i in range(0, len(units), size)]
+
+        per_unit = max_total_tokens // len(units) - system_tokens
+        problem_budget = max(per_unit // 4, 50)
+        problem = truncate_to_tokens(problem_statement, problem_budget)
+        code_budget = max(per_unit - estimate_tokens(problem) - UNIT_OVERHEAD_TOKENS, 50)
+
+        def review_unit(index_and_unit):
+            index, (label, pieces) = index_and_unit
+            chunks, previous = [], None
+            for file_patch, start, end, _ in pieces:
+                chunk = parsed.slice(start, end)
+                # A hunk cut out of its file still needs the file's ---/+++ headers to read as a diff
+                if file_patch is not previous and not chunk.startswith(("diff ", "--- ")):
+                    chunk = self._diff_header(file_patch) + chunk
+                chunks.append(chunk)
+                previous = file_patch
+            diff = "".join(chunks)
+            # Added files have no pre-patch source
+            source = "\n".join(
+                self._source_window(repo_dir, file_patch.old_path, old_range, context_lines)
+                for file_patch, _, _, old_range in pieces if repo_dir
+            ).strip()
+            diff = truncate_to_tokens(diff, code_budget // 2 if source else code_budget)
+            source = truncate_to_tokens(source, code_budget - estimate_tokens(diff)) if source else ""
+            messages = [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": f"""PROBLEM STATEMENT:
+{problem}
+
+Please review part {index + 1} of {len(units)} of a code patch ({label}).
+The other parts are reviewed separately, so only judge what is visible in this part.
+
+CODE PATCH (this part only):
+{diff}
+
+SURROUNDING SOURCE BEFORE THE PATCH:
+{source or "(not available)"}
+
+Provide your analysis as a JSON object with the required fields."""}
+            ]
+            result = self._extract_json_from_response(self._call_gpt(messages, max_tokens=300))
+            if not result:
+                result = {"status": "ERROR", "confidence": 0.0, "reason": "Failed to parse reviewer response",
+                          "issues_found": [], "suggestions": []}
+            result["unit"] = label
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            verdicts = list(pool.map(review_unit, enumerate(units)))
+        return self._merge_verdicts(verdicts)
+
+    @staticmethod
+    def _diff_header(file_patch):
+        old = f"a/{file_patch.old_path}" if file_patch.old_path and not file_patch.is_new else "/dev/null"
+        new = f"b/{file_patch.path}" if not file_patch.is_deleted else "/dev/null"
+        return f"--- {old}\n+++ {new}\n"
+
+    @staticmethod
+    def _split_units(parsed, unit):
+        """Each unit is (label, [(file_patch, start, end, old_range), ...]) pointing into the patch buffer"""
+        units = []
+        for file_patch in parsed:
+            if not file_patch.hunks:
+                continue
+            if unit == "hunk":
+                for i, hunk in enumerate(file_patch.hunks):
+                    units.append((f"{file_patch.path} hunk {i + 1}/{len(file_patch.hunks)}",
+                                  [(file_patch, hunk.start, hunk.end, hunk.old_range)]))
+            else:
+                pieces = [(file_patch, h.start, h.end, h.old_range) for h in file_patch.hunks]
+                # Keep the file header with the first hunk so the model sees the path
+                pieces[0] = (pieces[0][0], file_patch.start, pieces[0][2], pieces[0][3])
+                units.append((file_patch.path, pieces))
+        return units
+
+    @staticmethod
+    def _source_window(repo_dir, path, old_range, context_lines):
+        """Numbered lines around a hunk from the checked-out (pre-patch) file"""
+        if not path:
+            return ""
+        full_path = os.path.join(repo_dir, path)
+        try:
+            with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError:
+            return ""
+        first = max(old_range[0] - context_lines, 1)
+        last = min(old_range[1] + context_lines, len(lines))
+        window = "".join(f"{n:>6}: {lines[n - 1]}" for n in range(first, last + 1))
+        return f"--- {path} lines {first}-{last}\n{window}"
+
+    @staticmethod
+    def _merge_verdicts(verdicts):
+        """Fold per-unit verdicts into the single-review result shape"""
+        statuses = [v.get("status", "UNCLEAR") for v in verdicts]
+        if "NEEDS_FIX" in statuses:
+            status = "NEEDS_FIX"
+        elif all(s == "ERROR" for s in statuses):
+            status = "ERROR"
+        elif "APPROVED" in statuses:
+            status = "APPROVED"
+        else:
+            status = "UNCLEAR"
+
+        decisive = [v for v in verdicts if v.get("status") == status] or verdicts
+        confidences = [float(v.get("confidence", 0.0) or 0.0) for v in decisive]
+        issues = [i for v in verdicts for i in (v.get("issues_found") or [])]
+        suggestions = [s for v in verdicts for s in (v.get("suggestions") or [])]
+        return {
+            "status": status,
+            "confidence": min(confidences) if confidences else 0.0,
+            "reason": " | ".join(f"{v['unit']}: {v.get('reason', '')}" for v in decisive)[:500],
+            "issues_found": issues[:2],
+            "suggestions": suggestions[:2],
+            "units": [{key: v.get(key) for key in ("unit", "status", "confidence", "reason")} for v in verdicts],
+        }
+
     def _extract_json_from_response(self, response: str) -> dict:
         """Extract JSON object from GPT response"""
         try:
@@ -329,12 +657,23 @@ Provide your analysis as a JSON object with the required fields."""}
             }
 
 
-def run_revisor(swe_agent_output_dict: str) -> dict:
-    reviewer = Revisor()
+def run_revisor(swe_agent_output_dict: str, model="gpt-4o") -> dict:
+    reviewer = Revisor(model=model)
 
+    # REVISOR_MODE=file|hunk reviews the patch unit by unit against the local checkout
+    mode = os.getenv("REVISOR_MODE", "whole")
+    if mode in ("file", "hunk"):
+        return reviewer.review_patch_units(
+            problem_statement=swe_agent_output_dict.get("problem_statement", ""),
+            patch=swe_agent_output_dict.get("patch_model") or swe_agent_output_dict.get("patch", ""),
+            repo_dir=swe_agent_output_dict.get("repo_dir"),
+            unit=mode
+        )
+
+    patch_model = swe_agent_output_dict.get("patch_model")
     result = reviewer.review_patch(
         problem_statement=swe_agent_output_dict.get("problem_statement", ""),
-        patch=swe_agent_output_dict.get("patch", "")
+        patch=swe_agent_output_dict.get("patch") or (patch_model.text() if patch_model else "")
     )
     return result
 
@@ -347,24 +686,96 @@ def main():
 
     issue_url = sys.argv[1]
     print(f"Processing GitHub issue URL: {issue_url}")
-    analyzer_result = run_analyzer(issue_url)
+    timeline = IssueTimeline()
+    # SWE-agent's image and checkout are prepared while the analyzer runs instead of after it
+    _, owner, repo = transform_github_url_to_api(issue_url)
+    provisioner = EnvironmentProvisioner(owner, repo, timeline=timeline).start()
+    router = ModelRouter.from_trajectories()
+    dedup = IssueIndex()
+    memory = FixMemory()
+    added = memory.ingest_trajectories()
+    if added:
+        print(f"🧠 Fix memory: {added} new past run(s), {len(memory)} stored")
+    with timeline.span("analyzer"):
+        analyzer_result = run_analyzer(issue_url, router=router, dedup=dedup, memory=memory)
+    route = analyzer_result.pop("route")
     print("\n------------------------------------------------------\nAnalyzer Result:")
     print(json.dumps(analyzer_result, indent=2))
     print("\n------------------------------------------------------\n")
 
-    print("Initiating SWE-Agent to generate a patch...")
-
-    patch = send_to_swe_agent(analyzer_result)
-    if patch and analyzer_result["problem_statement"]:
-        swe_output_json = {
-            "problem_statement": analyzer_result["problem_statement"],
-            "patch": patch,
-        }
-
-        print("\n------------------------------------------------------\nRevision Outcome:")
-        print(run_revisor(swe_output_json))
-    else:
-        print("No patch generated or problem statement missing. Exiting.")
+    duplicate = analyzer_result.get("duplicate_of")
+    tiers = router.escalation(route["tiers"]["swe_agent"])
+    revisor_model = router.model(route["tiers"]["revisor"])
+    if duplicate and duplicate["similarity"] >= SHORT_CIRCUIT_THRESHOLD:
+        # Same report as an issue of this repo we already fixed: try its patch before running SWE-agent,
+        # but only record it once the revisor approves it for this issue
+        print(f"♻️  Trying the approved patch of {duplicate['issue_url']} before SWE-agent")
+        with timeline.span("revisor:reused"):
+            review = run_revisor({"problem_statement": analyzer_result["problem_statement"],
+                                  "patch": duplicate["patch"]}, model=revisor_model)
+        print(review)
+        if review.get("status") == "APPROVED":
+            print(duplicate["patch"])
+            dedup.update(issue_url, status="approved", patch=duplicate["patch"], reused_from=duplicate["issue_url"])
+            tiers = []
+        else:
+            print("The reused patch was not approved; running SWE-agent")
+
+    if tiers:
+        repo_path = provisioner.wait(analyzer_result.get("base_commit"))
+        if repo_path:
+            analyzer_result["repo_path"] = repo_path
+    # Start on the routed tier and only move up when the revisor rejects the patch
+    for tier in tiers:
+        print(f"Initiating SWE-Agent ({tier} tier) to generate a patch...")
+        analyzer_result["model"] = router.model(tier)
+        with timeline.span(f"swe_agent:{tier}"):
+            patch_model = send_to_swe_agent(analyzer_result)
+        if not (patch_model and analyzer_result["problem_statement"]):
+            router.record_outcome("swe_agent", tier, analyzer_result.get("swe_cost", 0.0), approved=False)
+            print("No patch generated or problem statement missing.")
+            if patch_model:
+                patch_model.close()
+            continue
+
+        # The patch stays mapped until this tier is recorded; hunk reviews slice it, the rest read its text
+        with patch_model:
+            swe_output_json = {
+                "problem_statement": analyzer_result["problem_statement"],
+                "patch_model": patch_model,
+                # Checkout at the base commit; REVISOR_MODE=file|hunk reads the code around each hunk from it
+                "repo_dir": analyzer_result.get("repo_path"),
+            }
+            print("\n------------------------------------------------------\nRevision Outcome:")
+            with timeline.span(f"revisor:{tier}"):
+                review = run_revisor(swe_output_json, model=revisor_model)
+            print(review)
+            approved = review.get("status") == "APPROVED"
+            router.record_outcome("swe_agent", tier, analyzer_result.get("swe_cost", 0.0), approved)
+            if approved:
+                patch = patch_model.text()
+                dedup.update(issue_url, status="approved", patch=patch)
+                memory.add(issue_url, analyzer_result["problem_statement"], patch, "approved",
+                           instance_id=instance_id(issue_url), edited_files=analyzer_result.get("patch_files", []))
+        analyzer_result.pop("patch_model", None)
+        if approved:
+            break
+
+    provisioner.close()
+    print("\n------------------------------------------------------\nTimeline:")
+    print(timeline.render())
+    waited = timeline.get("env_wait")
+    print(f"Overlap with the analyzer: checkout {timeline.overlap('analyzer', 'env_checkout'):.1f}s, "
+          f"image {timeline.overlap('analyzer', 'env_image'):.1f}s; SWE-agent waited "
+          f"{(waited['end'] - waited['start']) if waited else 0.0:.1f}s for its environment")
+
+    print("\n------------------------------------------------------\nCost by stage:")
+    for stage, totals in LEDGER.by("stage").items():
+        print(f"  {stage}: {totals['calls']} call(s), ${totals['cost']:.4f}")
+    print("\nPrompt cache:")
+    print(cache_report())
+    print("\nRouting outcomes so far:")
+    print(router.report())
 
 
 if __name__ == "__main__":
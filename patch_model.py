@@ -0,0 +1,277 @@
+"""
+Single-pass unified-diff parser.
+The parser walks the raw patch buffer once and records byte offsets for every
+file and hunk, so callers can slice out just the parts they need instead of
+copying the whole patch around. Works on str, bytes or an mmap of a .patch file.
+"""
+import mmap
+import re
+from typing import Iterator, List, Optional, Tuple, Union
+
+HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+GIT_HEADER = re.compile(rb"^diff --git (?:\"?a/)?(.+?)\"? (?:\"?b/)?(.+?)\"?$")
+
+
+def _clean_path(raw: bytes) -> Optional[str]:
+    """Strip a/ b/ prefixes and trailing timestamps from a ---/+++ path"""
+    path = raw.split(b"\t", 1)[0].strip().decode("utf-8", errors="replace")
+    if path == "/dev/null":
+        return None
+    if path[:2] in ("a/", "b/"):
+        path = path[2:]
+    return path
+
+
+class Hunk:
+    """One @@ block; start/end are byte offsets into the patch buffer"""
+    __slots__ = ("old_start", "old_count", "new_start", "new_count", "section",
+                 "added", "removed", "start", "end")
+
+    def __init__(self, old_start, old_count, new_start, new_count, section, start):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.section = section
+        self.added = 0
+        self.removed = 0
+        self.start = start
+        self.end = start
+
+    @property
+    def old_range(self) -> Tuple[int, int]:
+        return self.old_start, self.old_start + max(self.old_count, 1) - 1
+
+    @property
+    def new_range(self) -> Tuple[int, int]:
+        return self.new_start, self.new_start + max(self.new_count, 1) - 1
+
+    def to_dict(self) -> dict:
+        return {
+            "old_start": self.old_start, "old_count": self.old_count,
+            "new_start": self.new_start, "new_count": self.new_count,
+            "section": self.section, "added": self.added, "removed": self.removed,
+            "offset": [self.start, self.end],
+        }
+
+
+class FilePatch:
+    """All hunks touching one file; start/end span the file header and its hunks"""
+    __slots__ = ("old_path", "new_path", "hunks", "start", "end",
+                 "is_new", "is_deleted", "is_rename", "is_binary")
+
+    def __init__(self, start, old_path=None, new_path=None):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.hunks: List[Hunk] = []
+        self.start = start
+        self.end = start
+        self.is_new = False
+        self.is_deleted = False
+        self.is_rename = False
+        self.is_binary = False
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.new_path or self.old_path
+
+    @property
+    def added(self) -> int:
+        return sum(h.added for h in self.hunks)
+
+    @property
+    def removed(self) -> int:
+        return sum(h.removed for h in self.hunks)
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path, "old_path": self.old_path, "new_path": self.new_path,
+            "added": self.added, "removed": self.removed,
+            "is_new": self.is_new, "is_deleted": self.is_deleted,
+            "is_rename": self.is_rename, "is_binary": self.is_binary,
+            "offset": [self.start, self.end],
+            "hunks": [h.to_dict() for h in self.hunks],
+        }
+
+
+class Patch:
+    """Parsed view over a patch buffer. Text is only materialised by the slice helpers."""
+    def __init__(self, data: Union[bytes, mmap.mmap], files: List[FilePatch]):
+        self.data = data
+        self.files = files
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self) -> Iterator[FilePatch]:
+        return iter(self.files)
+
+    @property
+    def added(self) -> int:
+        return sum(f.added for f in self.files)
+
+    @property
+    def removed(self) -> int:
+        return sum(f.removed for f in self.files)
+
+    def touched_paths(self) -> List[str]:
+        return [f.path for f in self.files if f.path]
+
+    def get_file(self, path: str) -> Optional[FilePatch]:
+        path = path.strip().strip("`")
+        if path.startswith("./"):
+            path = path[2:]
+        for file_patch in self.files:
+            if path in (file_patch.new_path, file_patch.old_path):
+                return file_patch
+        return None
+
+    def touches(self, path: str) -> bool:
+        return bool(path) and self.get_file(path) is not None
+
+    def slice(self, start: int, end: int) -> str:
+        return bytes(self.data[start:end]).decode("utf-8", errors="replace")
+
+    def file_text(self, file_patch: FilePatch) -> str:
+        return self.slice(file_patch.start, file_patch.end)
+
+    def hunk_text(self, hunk: Hunk) -> str:
+        return self.slice(hunk.start, hunk.end)
+
+    def text(self) -> str:
+        if not self.files:
+            return ""
+        return self.slice(self.files[0].start, self.files[-1].end)
+
+    def summary(self) -> str:
+        lines = [f"{len(self.files)} file(s), +{self.added} -{self.removed}"]
+        for f in self.files:
+            ranges = ", ".join(f"{h.new_range[0]}-{h.new_range[1]}" for h in f.hunks)
+            lines.append(f"  {f.path}: +{f.added} -{f.removed} ({len(f.hunks)} hunk(s): {ranges})")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"added": self.added, "removed": self.removed,
+                "files": [f.to_dict() for f in self.files]}
+
+    def close(self):
+        """Unmap a patch read by parse_patch_file; slices taken earlier stay valid"""
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self) -> "Patch":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_patch(data: Union[str, bytes, mmap.mmap]) -> Patch:
+    """Parse a unified diff in one pass; text outside file sections (e.g. log lines) is skipped"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    files: List[FilePatch] = []
+    current: Optional[FilePatch] = None
+    hunk: Optional[Hunk] = None
+    old_left = new_left = 0
+    pos = 0
+    size = len(data)
+
+    while pos < size:
+        nl = data.find(b"\n", pos)
+        end = size if nl == -1 else nl + 1
+        line = data[pos:end].rstrip(b"\r\n")
+
+        if hunk is not None:
+            marker = line[:1]
+            if marker == b"+":
+                hunk.added += 1
+                new_left -= 1
+            elif marker == b"-":
+                hunk.removed += 1
+                old_left -= 1
+            elif marker == b" " or line == b"":
+                old_left -= 1
+                new_left -= 1
+            elif marker != b"\\":
+                # Truncated hunk; fall through and treat the line as a header
+                hunk = None
+            if hunk is not None:
+                hunk.end = current.end = end
+                if old_left <= 0 and new_left <= 0:
+                    hunk = None
+                pos = end
+                continue
+
+        if line.startswith(b"\\") and current is not None and current.hunks:
+            # "\ No newline at end of file" right after the last hunk line
+            current.hunks[-1].end = current.end = end
+        elif line.startswith(b"diff --git "):
+            match = GIT_HEADER.match(line)
+            current = FilePatch(pos)
+            if match:
+                current.old_path = match.group(1).decode("utf-8", errors="replace")
+                current.new_path = match.group(2).decode("utf-8", errors="replace")
+            current.end = end
+            files.append(current)
+        elif line.startswith(b"--- "):
+            if current is None or current.hunks:
+                # Plain unified diff without a git header
+                current = FilePatch(pos)
+                files.append(current)
+            current.old_path = _clean_path(line[4:])
+            current.end = end
+        elif line.startswith(b"+++ ") and current is not None and not current.hunks:
+            current.new_path = _clean_path(line[4:])
+            if current.old_path is None and current.new_path is not None:
+                current.is_new = True
+            current.end = end
+        elif line.startswith(b"@@ ") and current is not None:
+            match = HUNK_HEADER.match(line)
+            if match:
+                old_count = int(match.group(2)) if match.group(2) is not None else 1
+                new_count = int(match.group(4)) if match.group(4) is not None else 1
+                hunk = Hunk(int(match.group(1)), old_count, int(match.group(3)), new_count,
+                            match.group(5).decode("utf-8", errors="replace"), pos)
+                hunk.end = end
+                current.hunks.append(hunk)
+                current.end = end
+                old_left, new_left = old_count, new_count
+        elif current is not None and not current.hunks:
+            # Extended git header lines
+            if line.startswith(b"new file mode"):
+                current.is_new = True
+            elif line.startswith(b"deleted file mode"):
+                current.is_deleted = True
+            elif line.startswith(b"rename from ") or line.startswith(b"rename to "):
+                current.is_rename = True
+            elif line.startswith(b"Binary files ") or line.startswith(b"GIT binary patch"):
+                current.is_binary = True
+            elif not (line.startswith(b"index ") or line.startswith(b"similarity index")
+                      or line.startswith(b"old mode") or line.startswith(b"new mode")
+                      or line.startswith(b"copy ")):
+                pos = end
+                continue
+            current.end = end
+        pos = end
+
+    for file_patch in files:
+        if file_patch.is_deleted and file_patch.new_path == file_patch.old_path:
+            file_patch.new_path = None
+    return Patch(data, files)
+
+
+def parse_patch_file(path: str) -> Patch:
+    """Parse a .patch file through mmap so large patches are never read into memory at once"""
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return Patch(b"", [])
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return parse_patch(data)
+
+
+def extract_patch(text: str) -> str:
+    """Return only the diff sections of a larger text such as SWE-Agent stdout"""
+    patch = parse_patch(text)
+    return "".join(patch.file_text(f) for f in patch.files)
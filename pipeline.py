@@ -0,0 +1,368 @@
+import argparse
+import asyncio
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+import repo_index
+
+EXECUTORS = ("thread", "process", "asyncio")
+# Stage results kept in memory; older ones are evicted (and read back from cache_dir when it is set)
+MEMO_SIZE = 1024
+
+
+class PipelineError(Exception):
+    """Raised when a pipeline definition is invalid or a stage fails"""
+
+
+def resolve_function(ref: str) -> Callable:
+    """Resolve a "module:function" reference to a callable"""
+    module_name, _, func_name = ref.partition(":")
+    if not module_name or not func_name:
+        raise PipelineError(f"Invalid function reference: {ref!r} (expected 'module:function')")
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, func_name)
+    except AttributeError:
+        raise PipelineError(f"Module {module_name!r} has no function {func_name!r}")
+
+
+def _call_stage(ref: str, kwargs: Dict[str, Any]) -> Any:
+    """Entry point used by pool workers; resolves the stage by name so only strings cross the boundary"""
+    func = resolve_function(ref)
+    result = func(**kwargs)
+    if inspect.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+def input_hash(stage_name: str, ref: str, kwargs: Dict[str, Any]) -> str:
+    """Stable hash of a stage invocation used as the memoisation key"""
+    payload = json.dumps({"stage": stage_name, "function": ref, "inputs": kwargs},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Stage:
+    """A single pipeline step declared in YAML"""
+    def __init__(self, name: str, function: str, inputs: List[str], outputs: List[str],
+                 executor: Optional[str] = None, cache: bool = True):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.executor = executor
+        self.cache = cache
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Stage":
+        try:
+            return cls(
+                name=data["name"],
+                function=data["function"],
+                inputs=data.get("inputs", []),
+                outputs=data.get("outputs", []),
+                executor=data.get("executor"),
+                cache=data.get("cache", True),
+            )
+        except KeyError as e:
+            raise PipelineError(f"Stage definition missing required key: {e}")
+
+    def normalize_result(self, result: Any) -> Dict[str, Any]:
+        """Map a stage return value onto its declared outputs"""
+        if len(self.outputs) == 1 and not (isinstance(result, dict) and self.outputs[0] in result):
+            return {self.outputs[0]: result}
+        if not isinstance(result, dict):
+            raise PipelineError(f"Stage {self.name!r} must return a dict with keys {self.outputs}")
+        missing = [key for key in self.outputs if key not in result]
+        if missing:
+            raise PipelineError(f"Stage {self.name!r} did not produce outputs: {missing}")
+        return {key: result[key] for key in self.outputs}
+
+
+class Pipeline:
+    """
+    DAG of stages wired together by named inputs and outputs.
+    Stages whose inputs are available run concurrently; results are memoised by input hash.
+    """
+    def __init__(self, stages: List[Stage], inputs: List[str], executor: str = "thread",
+                 max_workers: int = 4, cache_dir: Optional[str] = None, name: str = "pipeline",
+                 preload_indexes: Optional[List[str]] = None, memo_size: int = MEMO_SIZE):
+        if executor not in EXECUTORS:
+            raise PipelineError(f"Unknown executor {executor!r}, expected one of {EXECUTORS}")
+        self.name = name
+        self.stages = stages
+        self.inputs = list(inputs)
+        self.executor = executor
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.preload_indexes = list(preload_indexes or [])
+        self.memo: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.memo_size = memo_size
+        self._memo_lock = threading.Lock()
+        self.timeline: List[Dict[str, Any]] = []
+        self._pools: Dict[str, Any] = {}
+        self._pool_lock = threading.Lock()
+        self._validate()
+
+    def _validate(self):
+        producers = {name: "<input>" for name in self.inputs}
+        for stage in self.stages:
+            if stage.executor and stage.executor not in EXECUTORS:
+                raise PipelineError(f"Stage {stage.name!r} has unknown executor {stage.executor!r}")
+            for output in stage.outputs:
+                if output in producers:
+                    raise PipelineError(
+                        f"Output {output!r} of stage {stage.name!r} is already produced by {producers[output]!r}")
+                producers[output] = stage.name
+
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in producers]
+            if missing:
+                raise PipelineError(f"Stage {stage.name!r} needs inputs nobody produces: {missing}")
+
+        # Kahn's algorithm, only to reject cycles up front
+        available = set(self.inputs)
+        remaining = list(self.stages)
+        while remaining:
+            ready = [s for s in remaining if all(i in available for i in s.inputs)]
+            if not ready:
+                raise PipelineError(f"Cycle detected between stages: {[s.name for s in remaining]}")
+            for stage in ready:
+                available.update(stage.outputs)
+                remaining.remove(stage)
+
+    # ---- executors -------------------------------------------------------
+
+    def _pool(self, kind: str):
+        with self._pool_lock:
+            return self._pool_locked(kind)
+
+    def _pool_locked(self, kind: str):
+        if kind not in self._pools:
+            if kind == "process":
+                # Workers live as long as the pipeline and open the repo indexes once at startup
+                self._pools[kind] = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=repo_index.preload_indexes,
+                    initargs=(self.preload_indexes,),
+                )
+            else:
+                self._pools[kind] = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._pools[kind]
+
+    async def _dispatch(self, stage: Stage, kwargs: Dict[str, Any]) -> Any:
+        kind = stage.executor or self.executor
+        loop = asyncio.get_running_loop()
+        if kind == "process":
+            return await loop.run_in_executor(self._pool("process"), _call_stage, stage.function, kwargs)
+
+        func = resolve_function(stage.function)
+        if kind == "asyncio":
+            if inspect.iscoroutinefunction(func):
+                return await func(**kwargs)
+            return await asyncio.to_thread(_call_stage, stage.function, kwargs)
+        return await loop.run_in_executor(self._pool("thread"), _call_stage, stage.function, kwargs)
+
+    def shutdown(self):
+        """Release worker pools"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+        self._pools.clear()
+
+    # ---- memoisation -----------------------------------------------------
+
+    def _cache_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _memo_put(self, key: str, outputs: Dict[str, Any]):
+        with self._memo_lock:
+            self.memo[key] = outputs
+            self.memo.move_to_end(key)
+            while len(self.memo) > self.memo_size:
+                self.memo.popitem(last=False)
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._memo_lock:
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                return self.memo[key]
+        path = self._cache_path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    outputs = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return None
+            self._memo_put(key, outputs)
+            return outputs
+        return None
+
+    def _cache_put(self, key: str, outputs: Dict[str, Any]):
+        self._memo_put(key, outputs)
+        path = self._cache_path(key)
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written next to the entry and renamed, so concurrent runs never read a half-written file
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(outputs, f)
+                os.replace(tmp, path)
+            except TypeError:
+                # Outputs that are not JSON serialisable are only memoised in memory
+                os.remove(tmp)
+
+    # ---- execution -------------------------------------------------------
+
+    async def _run_stage(self, stage: Stage, kwargs: Dict[str, Any], t0: float, timeline: List[Dict[str, Any]],
+                         on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        def emit(event_type: str, **data):
+            if on_event:
+                on_event(dict(data, type=event_type, stage=stage.name, elapsed=round(time.perf_counter() - t0, 3)))
+
+        key = input_hash(stage.name, stage.function, kwargs)
+        start = time.perf_counter()
+        if stage.cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                timeline.append({"stage": stage.name, "start": start - t0,
+                                 "end": time.perf_counter() - t0, "cached": True})
+                emit("stage_cached")
+                return cached
+
+        print(f"▶️  Stage {stage.name} started")
+        emit("stage_started")
+        try:
+            result = await self._dispatch(stage, kwargs)
+        except PipelineError as e:
+            emit("stage_failed", error=str(e))
+            raise
+        except Exception as e:
+            emit("stage_failed", error=str(e))
+            raise PipelineError(f"Stage {stage.name!r} failed: {e}") from e
+        outputs = stage.normalize_result(result)
+        end = time.perf_counter()
+        timeline.append({"stage": stage.name, "start": start - t0, "end": end - t0, "cached": False})
+        print(f"✅ Stage {stage.name} finished in {end - start:.2f}s")
+        emit("stage_finished", seconds=round(end - start, 3))
+
+        if stage.cache:
+            self._cache_put(key, outputs)
+        return outputs
+
+    async def arun(self, inputs: Dict[str, Any],
+                   on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Run every stage once, starting each as soon as its inputs exist.
+        on_event receives stage_started/stage_finished/stage_cached/stage_failed events.
+        Several runs may share one Pipeline (and its pools and memo) concurrently.
+        """
+        missing = [name for name in self.inputs if name not in inputs]
+        if missing:
+            raise PipelineError(f"Missing pipeline inputs: {missing}")
+
+        values = dict(inputs)
+        pending = list(self.stages)
+        running: Dict[asyncio.Future, Stage] = {}
+        timeline: List[Dict[str, Any]] = []
+        self.timeline = timeline
+        t0 = time.perf_counter()
+
+        try:
+            while pending or running:
+                for stage in [s for s in pending if all(i in values for i in s.inputs)]:
+                    kwargs = {name: values[name] for name in stage.inputs}
+                    running[asyncio.ensure_future(self._run_stage(stage, kwargs, t0, timeline, on_event))] = stage
+                    pending.remove(stage)
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.pop(task)
+                    values.update(task.result())
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return values
+
+    def run(self, inputs: Dict[str, Any],
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Synchronous wrapper around arun"""
+        return asyncio.run(self.arun(inputs, on_event))
+
+
+def load_pipeline(filepath: str = "pipeline.yaml", **overrides) -> Pipeline:
+    """Build a Pipeline from its YAML definition"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+    except UnicodeDecodeError:
+        with open(filepath, 'r', encoding='utf-8-sig') as f:
+            data = yaml.safe_load(f)
+    except FileNotFoundError:
+        print(f"Error: Could not find {filepath} file")
+        raise
+
+    settings = {
+        "name": data.get("name", "pipeline"),
+        "inputs": data.get("inputs", []),
+        "executor": data.get("executor", "thread"),
+        "max_workers": data.get("max_workers", 4),
+        "cache_dir": data.get("cache_dir"),
+        "preload_indexes": data.get("preload_indexes", []),
+        "memo_size": data.get("memo_size", MEMO_SIZE),
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    stages = [Stage.from_dict(item) for item in data.get("stages", [])]
+    return Pipeline(stages=stages, **settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SWE-lutions stage pipeline")
+    parser.add_argument("issue_url", help="GitHub issue URL")
+    parser.add_argument("--config", default="pipeline.yaml", help="Pipeline definition")
+    parser.add_argument("--executor", choices=EXECUTORS, help="Override the default executor")
+    parser.add_argument("--max-workers", type=int, help="Worker pool size")
+    parser.add_argument("--output", help="Write final results to this JSON file")
+    parser.add_argument("--base-commit", default="", help="Commit to run SWE-agent on (default: the branch head)")
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.config, executor=args.executor, max_workers=args.max_workers)
+    try:
+        results = pipeline.run({"issue_url": args.issue_url, "run_id": uuid.uuid4().hex,
+                                "base_commit": args.base_commit})
+    finally:
+        pipeline.shutdown()
+
+    print("\n------------------------------------------------------\nPipeline Result:")
+    print(json.dumps(results, indent=2, default=str))
+    # Stages that overlapped (e.g. provision_env next to the analysis stages) show intersecting ranges
+    print("\nTimeline:")
+    for entry in sorted(pipeline.timeline, key=lambda e: e["start"]):
+        print(f"  {entry['stage']:<18} {entry['start']:7.2f}s - {entry['end']:7.2f}s"
+              + ("  (cached)" if entry["cached"] else ""))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    main()
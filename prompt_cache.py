@@ -0,0 +1,130 @@
+"""
+Helpers for provider-side prompt-prefix caching.
+Providers cache the longest identical prefix of a request (at least 1024
+tokens, then in 128-token steps), so message assembly keeps static text first
+and byte-stable. This module checks that the static prefixes really do not
+drift, reports cache hits recorded in the usage ledger, and estimates how much
+of each recorded SWE-agent call could have been served from the cache.
+
+Usage: python prompt_cache.py [trajectories_dir]
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Dict, List
+
+from llm_usage import LEDGER, cache_savings
+
+MIN_CACHEABLE_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+
+_prefix_hashes: Dict[str, str] = {}
+_prefix_lock = threading.Lock()
+
+
+def static_prefix(stage: str, text: str) -> str:
+    """Register the static prefix of a stage's prompt and warn if it ever changes"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _prefix_lock:
+        previous = _prefix_hashes.setdefault(stage, digest)
+    if previous != digest:
+        print(f"⚠️  Static prompt prefix for {stage} changed; provider cache hits will drop")
+        with _prefix_lock:
+            _prefix_hashes[stage] = digest
+    return text
+
+
+def prefix_messages(stage: str, system_prompt: str, stable: str, variable: str) -> List[Dict]:
+    """System prompt, then content shared across calls, then the per-call part"""
+    static_prefix(stage, system_prompt)
+    content = f"{stable}\n\n{variable}" if stable else variable
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content},
+    ]
+
+
+def cache_report(ledger=LEDGER) -> str:
+    """Cache-hit ratio and money saved per stage from recorded responses"""
+    lines = [f"{'stage':<14} {'calls':>5} {'prompt tok':>10} {'cached tok':>10} {'hit %':>6} {'cost $':>9} {'saved $':>9}"]
+    for stage, t in sorted(ledger.by("stage").items()):
+        ratio = t["cached_tokens"] / t["prompt_tokens"] if t["prompt_tokens"] else 0.0
+        lines.append(f"{stage:<14} {t['calls']:>5} {t['prompt_tokens']:>10} {t['cached_tokens']:>10} "
+                     f"{ratio:>6.0%} {t['cost']:>9.4f} {t['saved']:>9.4f}")
+    return "\n".join(lines)
+
+
+# ---- recorded trajectories ---------------------------------------------------
+
+def _content_text(content) -> str:
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content or "")
+
+
+def _serialize(messages: List[Dict]) -> str:
+    return "".join(f"<{m.get('role')}>{_content_text(m.get('content'))}" for m in messages)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def cacheable_tokens(prefix_tokens: int) -> int:
+    if prefix_tokens < MIN_CACHEABLE_TOKENS:
+        return 0
+    return prefix_tokens - (prefix_tokens - MIN_CACHEABLE_TOKENS) % CACHE_INCREMENT_TOKENS
+
+
+def trajectory_prefix_stats(traj_path: str, model: str = "gpt-4o") -> Dict:
+    """How much of each step's prompt matched the previous step's prompt byte for byte"""
+    with open(traj_path, "r", encoding="utf-8") as f:
+        steps = json.load(f).get("trajectory", [])
+    previous = ""
+    prompt_tokens = cached = 0
+    for step in steps:
+        current = _serialize(step.get("messages", []))
+        # About 4 characters per token
+        prompt_tokens += len(current) // 4
+        cached += cacheable_tokens(_common_prefix(previous, current) // 4)
+        previous = current
+    return {
+        "calls": len(steps),
+        "prompt_tokens": prompt_tokens,
+        "cacheable_tokens": cached,
+        "hit_ratio": cached / prompt_tokens if prompt_tokens else 0.0,
+        "saved": cache_savings(model, cached),
+    }
+
+
+def cross_issue_prefix_tokens(traj_paths: List[str]) -> int:
+    """Tokens of the first request that are identical across different issues"""
+    firsts = []
+    for traj_path in traj_paths:
+        with open(traj_path, "r", encoding="utf-8") as f:
+            steps = json.load(f).get("trajectory", [])
+        if steps:
+            firsts.append(_serialize(steps[0].get("messages", [])))
+    if len(firsts) < 2:
+        return 0
+    return min(_common_prefix(firsts[0], other) for other in firsts[1:]) // 4
+
+
+if __name__ == "__main__":
+    trajectories_dir = sys.argv[1] if len(sys.argv) > 1 else "trajectories"
+    traj_paths = sorted(glob.glob(os.path.join(trajectories_dir, "**", "*.traj"), recursive=True))
+    print(f"{'run':<40} {'calls':>5} {'prompt tok':>10} {'cacheable':>10} {'hit %':>6} {'saved $':>8}")
+    for traj_path in traj_paths:
+        stats = trajectory_prefix_stats(traj_path)
+        name = os.path.basename(traj_path)[:-len(".traj")]
+        print(f"{name:<40} {stats['calls']:>5} {stats['prompt_tokens']:>10} {stats['cacheable_tokens']:>10} "
+              f"{stats['hit_ratio']:>6.0%} {stats['saved']:>8.4f}")
+    print(f"\nPrefix shared by the first call of every issue: ~{cross_issue_prefix_tokens(traj_paths)} tokens "
+          f"(caching needs {MIN_CACHEABLE_TOKENS})")
@@ -0,0 +1,165 @@
+"""
+SWE-agent environment provisioning that overlaps with the analyzer.
+As soon as an issue URL is parsed into owner/repo, a background thread pulls
+the SWE-agent Docker image (if it is missing) and prepares a self-contained
+checkout of the repository head in the workspace store, while the analyzer is
+still fetching the issue and calling the LLM. SWE-agent then gets the local
+checkout through --env.repo.path instead of cloning inside its own startup.
+IssueTimeline records when each step ran, so the overlap can be checked per issue.
+
+Usage: python provisioning.py <GitHub Issue URL>
+"""
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from github_tools import get_repo_service
+from workspaces import WORKSPACES, WorkspaceManager
+
+SWE_AGENT_IMAGE = os.getenv("SWE_AGENT_IMAGE", "python:3.11")
+BAR_WIDTH = 50
+
+
+class IssueTimeline:
+    """Start and end of each step of one issue run, in seconds since the timeline was created"""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, step: str):
+        start = time.perf_counter() - self.t0
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.spans.append({"step": step, "start": round(start, 3),
+                                   "end": round(time.perf_counter() - self.t0, 3)})
+
+    def get(self, step: str) -> Optional[Dict]:
+        with self._lock:
+            return next((s for s in self.spans if s["step"] == step), None)
+
+    def overlap(self, a: str, b: str) -> float:
+        """Seconds during which steps a and b were both running"""
+        first, second = self.get(a), self.get(b)
+        if not first or not second:
+            return 0.0
+        return round(max(0.0, min(first["end"], second["end"]) - max(first["start"], second["start"])), 3)
+
+    def render(self) -> str:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+        if not spans:
+            return "(no steps recorded)"
+        total = max(s["end"] for s in spans) or 1.0
+        width = max(len(s["step"]) for s in spans)
+        lines = []
+        for s in spans:
+            left = min(int(s["start"] / total * BAR_WIDTH), BAR_WIDTH - 1)
+            length = min(max(1, int((s["end"] - s["start"]) / total * BAR_WIDTH)), BAR_WIDTH - left)
+            lines.append(f"  {s['step']:<{width}} |{' ' * left}{'█' * length}{' ' * (BAR_WIDTH - left - length)}| "
+                         f"{s['start']:7.1f}s - {s['end']:7.1f}s")
+        return "\n".join(lines)
+
+
+def pull_image(image: str = SWE_AGENT_IMAGE) -> bool:
+    """Make sure the SWE-agent image is local; False when Docker is not available or the pull failed"""
+    if not shutil.which("docker"):
+        return False
+    if subprocess.run(["docker", "image", "inspect", image], capture_output=True).returncode == 0:
+        return True
+    print(f"🐳 Pulling {image} for SWE-agent")
+    result = subprocess.run(["docker", "pull", image], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"⚠️  docker pull {image} failed: {result.stderr.strip()[-300:]}")
+    return result.returncode == 0
+
+
+def head_commit(owner: str, repo: str) -> str:
+    """Default branch head from the API, so a store cloned earlier is brought up to date"""
+    try:
+        return get_repo_service(owner, repo).commit()
+    except Exception as e:
+        print(f"⚠️  Could not read the head of {owner}/{repo}: {e}; using the stored HEAD")
+        return "HEAD"
+
+
+class EnvironmentProvisioner:
+    """Image pull and repository checkout for one issue, started early and collected by the SWE-agent step"""
+    def __init__(self, owner: str, repo: str, commit: Optional[str] = None,
+                 timeline: Optional[IssueTimeline] = None, workspaces: WorkspaceManager = WORKSPACES,
+                 image: str = SWE_AGENT_IMAGE):
+        self.owner = owner
+        self.repo = repo
+        self.commit = commit
+        self.timeline = timeline or IssueTimeline()
+        self.workspaces = workspaces
+        self.image = image
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="provision")
+        self._image = None
+        self._checkout = None
+
+    def start(self) -> "EnvironmentProvisioner":
+        self._image = self._pool.submit(self._pull)
+        self._checkout = self._pool.submit(self._prepare_checkout)
+        return self
+
+    def _pull(self) -> bool:
+        with self.timeline.span("env_image"):
+            return pull_image(self.image)
+
+    def _prepare_checkout(self) -> str:
+        with self.timeline.span("env_checkout"):
+            commit = self.commit or head_commit(self.owner, self.repo)
+            return self.workspaces.pristine(self.owner, self.repo, commit, standalone=True)
+
+    def wait(self, base_commit: Optional[str] = None, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Checkout path for SWE-agent's --env.repo.path, or None to let SWE-agent clone as before.
+        A base_commit other than the one provisioned (e.g. the analyzer saw a newer head) is checked
+        out from the now warm store.
+        """
+        if self._checkout is None:
+            self.start()
+        with self.timeline.span("env_wait"):
+            try:
+                self._image.result(timeout)
+            except Exception as e:
+                # SWE-agent pulls the image itself (pull: missing), so only the head start is lost
+                print(f"⚠️  Pulling {self.image} failed: {e}")
+            try:
+                path = self._checkout.result(timeout)
+            except Exception as e:
+                print(f"⚠️  Environment provisioning for {self.owner}/{self.repo} failed: {e}")
+                return None
+            if base_commit and base_commit != "HEAD":
+                try:
+                    if self.workspaces.resolve(self.owner, self.repo, base_commit) != os.path.basename(path):
+                        path = self.workspaces.pristine(self.owner, self.repo, base_commit, standalone=True)
+                except Exception as e:
+                    print(f"⚠️  Could not check out {base_commit} of {self.owner}/{self.repo}: {e}")
+                    return None
+        return path
+
+    def close(self):
+        """Waits for a provisioning step still running so the store is never left half-cloned"""
+        self._pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python provisioning.py <GitHub Issue URL>")
+        sys.exit(1)
+    parts = sys.argv[1].rstrip("/").split("/")
+    provisioner = EnvironmentProvisioner(parts[-4], parts[-3]).start()
+    print(f"📦 Environment ready at {provisioner.wait()}")
+    provisioner.close()
+    print(provisioner.timeline.render())
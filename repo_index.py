@@ -0,0 +1,225 @@
+"""
+Memory-mapped index of a local repository checkout.
+All text files are concatenated into one .blob file and a small JSON sidecar
+maps each path to its (offset, length). Worker processes receive only the
+index path and mmap the blob, so file contents never get pickled.
+A rebuild writes both files under temporary names and renames them into
+place, so readers that already mapped the old blob keep a valid view; the
+blob ends with the build id from the sidecar, which lets a reader that
+raced the two renames notice the mismatch and open the pair again.
+"""
+import ast
+from array import array
+import json
+import mmap
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Pattern, Tuple
+
+# Larger than the 1 MB the contents API will serve; the blob is mmap'ed, so size only costs disk
+MAX_FILE_SIZE = int(os.getenv("SWE_INDEX_MAX_FILE_SIZE", str(8 * 1024 * 1024)))
+SKIP_DIRS = {".git", "__pycache__", "node_modules", ".tox", ".venv", "venv"}
+INDEX_SUFFIX = ".swe_index"
+OPEN_ATTEMPTS = 5
+
+
+def _is_text(chunk: bytes) -> bool:
+    return b"\0" not in chunk
+
+
+def index_path_for(repo_dir: str) -> str:
+    """Default index path: next to the checkout, so it never shows up as untracked files in it"""
+    return os.path.abspath(repo_dir).rstrip(os.sep) + INDEX_SUFFIX
+
+
+def build_index(repo_dir: str, index_path: Optional[str] = None) -> str:
+    """Index every text file under repo_dir and return the index path (without extension)"""
+    repo_dir = os.path.abspath(repo_dir)
+    index_path = index_path or index_path_for(repo_dir)
+    files: Dict[str, List[int]] = {}
+    offset = 0
+    build = uuid.uuid4().hex
+    tmp_blob, tmp_meta = f"{index_path}.blob.{build}.tmp", f"{index_path}.json.{build}.tmp"
+
+    # Never truncate the live blob: other processes may have it mmap'ed
+    try:
+        with open(tmp_blob, "wb") as blob:
+            for root, dirs, names in os.walk(repo_dir):
+                dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+                for name in sorted(names):
+                    full_path = os.path.join(root, name)
+                    # Also skips indexes older versions wrote inside the checkout
+                    if full_path.startswith(index_path) or name.startswith(INDEX_SUFFIX):
+                        continue
+                    try:
+                        if os.path.getsize(full_path) > MAX_FILE_SIZE:
+                            continue
+                        with open(full_path, "rb") as f:
+                            data = f.read()
+                    except OSError:
+                        continue
+                    if not _is_text(data[:8192]):
+                        continue
+                    rel_path = os.path.relpath(full_path, repo_dir).replace(os.sep, "/")
+                    blob.write(data)
+                    files[rel_path] = [offset, len(data)]
+                    offset += len(data)
+            # Trailer matched against the sidecar when the pair is opened
+            blob.write(build.encode("ascii"))
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"root": repo_dir, "files": files, "build": build}, f)
+        os.replace(tmp_blob, index_path + ".blob")
+        os.replace(tmp_meta, index_path + ".json")
+    except BaseException:
+        for tmp in (tmp_blob, tmp_meta):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    # open_index sees the new sidecar and maps the new blob on its next call
+    return index_path
+
+
+class RepoIndex:
+    """Read-only view over an index created by build_index"""
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        for attempt in range(OPEN_ATTEMPTS):
+            with open(index_path + ".json", "r", encoding="utf-8") as f:
+                # Identifies this build, so open_index notices when the index is rebuilt
+                self.stamp = _stamp(os.fstat(f.fileno()))
+                meta = json.load(f)
+            self._file = open(index_path + ".blob", "rb")
+            size = os.fstat(self._file.fileno()).st_size
+            # mmap refuses empty files
+            self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            build = meta.get("build", "").encode("ascii")
+            if not build or self._blob[-len(build):] == build:
+                break
+            # Opened between a rebuild's two renames; the sidecar and blob come from different builds
+            self.close()
+            if attempt == OPEN_ATTEMPTS - 1:
+                raise OSError(f"Index {index_path} is being rebuilt, sidecar and blob do not match")
+            time.sleep(0.05 * (attempt + 1))
+        self.root = meta["root"]
+        self.files: Dict[str, List[int]] = meta["files"]
+        self._line_offsets: Dict[str, array] = {}
+
+    def paths(self, suffix: str = "") -> List[str]:
+        return [path for path in self.files if path.endswith(suffix)]
+
+    def read(self, path: str) -> bytes:
+        offset, length = self.files[path]
+        return self._blob[offset:offset + length]
+
+    def text(self, path: str) -> str:
+        return self.read(path).decode("utf-8", errors="replace")
+
+    def line_offsets(self, path: str) -> array:
+        """Byte offset of every line start in path; computed once, then each slice is a lookup"""
+        offsets = self._line_offsets.get(path)
+        if offsets is None:
+            start, length = self.files[path]
+            end = start + length
+            offsets = array("Q", [0])
+            pos = self._blob.find(b"\n", start, end)
+            while pos != -1:
+                offsets.append(pos + 1 - start)
+                pos = self._blob.find(b"\n", pos + 1, end)
+            if length and offsets[-1] == length:
+                # A trailing newline does not start another line
+                offsets.pop()
+            self._line_offsets[path] = offsets
+        return offsets
+
+    def line_count(self, path: str) -> int:
+        return len(self.line_offsets(path)) if self.files[path][1] else 0
+
+    def lines(self, path: str, first: int, last: int) -> List[str]:
+        """Lines first..last (1-based, inclusive) of path"""
+        offsets = self.line_offsets(path)
+        start, length = self.files[path]
+        first = max(first, 1)
+        last = min(last, len(offsets))
+        if first > last:
+            return []
+        end = offsets[last] if last < len(offsets) else length
+        chunk = self._blob[start + offsets[first - 1]:start + end]
+        return chunk.decode("utf-8", errors="replace").splitlines()
+
+    def grep(self, pattern: Pattern[bytes], suffix: str = "", max_results: int = 50,
+             paths: Optional[List[str]] = None) -> List[Tuple[str, int, str]]:
+        """(path, line number, line) for regex matches, searched in place over the mmap'ed blob"""
+        results = []
+        for path in self.paths(suffix) if paths is None else paths:
+            offset, length = self.files[path]
+            end = offset + length
+            line_start = offset
+            line_no = 1
+            for match in pattern.finditer(self._blob, offset, end):
+                start = match.start()
+                line_no += self._blob[line_start:start].count(b"\n")
+                line_start = self._blob.rfind(b"\n", offset, start) + 1 or offset
+                line_end = self._blob.find(b"\n", start, end)
+                line = self._blob[line_start:end if line_end == -1 else line_end]
+                results.append((path, line_no, line.decode("utf-8", errors="replace").strip()))
+                if len(results) >= max_results:
+                    return results
+        return results
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+
+def _stamp(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_ino, stat.st_mtime_ns
+
+
+# One open index per process; pool workers reuse it across tasks
+_OPEN_INDEXES: Dict[str, RepoIndex] = {}
+
+
+def open_index(index_path: str) -> RepoIndex:
+    """Open index, reused until build_index writes a new one at the same path"""
+    index = _OPEN_INDEXES.get(index_path)
+    try:
+        current = _stamp(os.stat(index_path + ".json"))
+    except OSError:
+        current = None
+    if index is None or (current is not None and current != index.stamp):
+        # The old view stays valid for callers still holding it and is released with them
+        index = _OPEN_INDEXES[index_path] = RepoIndex(index_path)
+    return index
+
+
+def preload_indexes(index_paths: List[str]):
+    """Process pool initializer: open indexes before the first task arrives"""
+    for index_path in index_paths:
+        try:
+            open_index(index_path)
+        except OSError as e:
+            print(f"⚠️  Could not preload index {index_path}: {e}")
+
+
+def outline_source(source: str) -> List[str]:
+    """Return the classes and functions defined in a Python source file"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        return [f"SyntaxError: line {e.lineno}: {e.msg}"]
+
+    symbols = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            symbols.append(f"class {node.name} (line {node.lineno})")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            symbols.append(f"def {node.name} (line {node.lineno})")
+    return symbols
+
+
+def outline_paths(index_path: str, paths: List[str]) -> Dict[str, List[str]]:
+    """AST-outline the given Python files straight from the index"""
+    index = open_index(index_path)
+    return {path: outline_source(index.text(path)) for path in paths if path in index.files}
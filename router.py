@@ -0,0 +1,169 @@
+"""
+Model routing by issue difficulty.
+Cheap local signals (issue length, candidate files, stack traces, past
+outcomes for the repo in trajectories/) decide which model tier each stage
+starts with. A stage escalates to the large tier only when the revisor
+rejects the cheaper attempt, and per-tier cost/success is persisted so the
+thresholds can be tuned.
+"""
+import glob
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+TIERS = {
+    "small": os.getenv("AGENTS_MODEL_SMALL", "gpt-4o-mini"),
+    "large": os.getenv("AGENTS_MODEL_NAME", "gpt-4o"),
+}
+TIER_ORDER = ["small", "large"]
+
+# A stage starts on the small tier when the difficulty score is below its threshold.
+# None means the stage always runs on the large tier.
+STAGE_THRESHOLDS = {
+    "analyzer": 0.6,
+    "swe_agent": 0.4,
+    "revisor": None,
+}
+
+STATS_FILE = os.getenv("ROUTER_STATS_FILE", "router_stats.json")
+TRACEBACK_PATTERN = re.compile(r"Traceback \(most recent call last\)|File \"[^\"]+\", line \d+|^E\s+\w+Error",
+                               re.MULTILINE)
+INSTANCE_SUFFIX = re.compile(r"-i\d+$")
+WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+def repo_key_from_instance(instance_id: str) -> str:
+    """SWE-agent__test-repo-i22 -> SWE-agent/test-repo"""
+    owner, _, rest = instance_id.partition("__")
+    return f"{owner}/{INSTANCE_SUFFIX.sub('', rest)}"
+
+
+def load_history(trajectories_dir: str = "trajectories") -> Dict[str, Dict]:
+    """Per-repo outcomes of previous SWE-agent runs recorded as .traj files"""
+    history: Dict[str, Dict] = {}
+    for traj_path in glob.glob(os.path.join(trajectories_dir, "**", "*.traj"), recursive=True):
+        try:
+            with open(traj_path, "r", encoding="utf-8") as f:
+                info = json.load(f).get("info", {})
+        except (OSError, json.JSONDecodeError):
+            continue
+        instance_id = os.path.basename(traj_path)[:-len(".traj")]
+        stats = history.setdefault(repo_key_from_instance(instance_id),
+                                   {"runs": 0, "submitted": 0, "cost": 0.0})
+        stats["runs"] += 1
+        stats["submitted"] += 1 if info.get("exit_status") == "submitted" and info.get("submission") else 0
+        stats["cost"] += info.get("model_stats", {}).get("instance_cost", 0.0)
+    return history
+
+
+def issue_signals(problem_statement: str, file_paths: List[str], repo_history: Optional[Dict] = None) -> Dict:
+    """Local, LLM-free features describing how hard an issue looks"""
+    words = set(WORD_PATTERN.findall(problem_statement.lower()))
+    candidates = [
+        path for path in file_paths
+        if os.path.splitext(os.path.basename(path))[0].lower() in words or path.lower() in problem_statement.lower()
+    ]
+    signals = {
+        "length": len(problem_statement),
+        "candidates": len(candidates),
+        "has_traceback": bool(TRACEBACK_PATTERN.search(problem_statement)),
+        "tree_size": len(file_paths),
+        "repo_success_rate": None,
+    }
+    if repo_history and repo_history.get("runs"):
+        signals["repo_success_rate"] = repo_history["submitted"] / repo_history["runs"]
+    return signals
+
+
+def difficulty_score(signals: Dict) -> float:
+    """0.0 (trivial) .. 1.0 (hard)"""
+    score = min(signals["length"] / 4000, 1.0) * 0.3
+    # No candidate file, or many of them, both mean the model has to search
+    if signals["candidates"] == 0:
+        score += 0.25
+    elif signals["candidates"] > 3:
+        score += 0.15
+    # A traceback pinpoints the failure, which makes the issue easier
+    if not signals["has_traceback"]:
+        score += 0.15
+    score += min(signals["tree_size"] / 5000, 1.0) * 0.15
+    if signals["repo_success_rate"] is not None:
+        score += (1.0 - signals["repo_success_rate"]) * 0.15
+    return round(min(score, 1.0), 3)
+
+
+class ModelRouter:
+    """Chooses a model tier per stage and keeps per-tier cost/success statistics"""
+    def __init__(self, history: Optional[Dict[str, Dict]] = None, stats_file: Optional[str] = STATS_FILE):
+        self.history = history or {}
+        self.stats_file = stats_file
+        self.stats = self._load_stats()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_trajectories(cls, trajectories_dir: str = "trajectories", **kwargs) -> "ModelRouter":
+        return cls(history=load_history(trajectories_dir), **kwargs)
+
+    def route(self, problem_statement: str, file_paths: List[str], repo_key: str = "") -> Dict:
+        """Return {"score", "signals", "tiers": {stage: tier}}"""
+        signals = issue_signals(problem_statement, file_paths, self.history.get(repo_key))
+        score = difficulty_score(signals)
+        tiers = {}
+        for stage, threshold in STAGE_THRESHOLDS.items():
+            tiers[stage] = "small" if threshold is not None and score < threshold else "large"
+        print(f"🧭 Difficulty {score} -> " + ", ".join(f"{s}: {t}" for s, t in tiers.items()))
+        return {"score": score, "signals": signals, "tiers": tiers}
+
+    @staticmethod
+    def model(tier: str) -> str:
+        return TIERS[tier]
+
+    @staticmethod
+    def escalation(start_tier: str) -> List[str]:
+        """Tiers to try in order, starting from start_tier"""
+        return TIER_ORDER[TIER_ORDER.index(start_tier):]
+
+    # ---- statistics ------------------------------------------------------
+
+    def _load_stats(self) -> Dict:
+        if self.stats_file and os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass
+        return {}
+
+    def record_outcome(self, stage: str, tier: str, cost: float, approved: bool):
+        with self._lock:
+            bucket = self.stats.setdefault(stage, {}).setdefault(tier, {"attempts": 0, "approved": 0, "cost": 0.0})
+            bucket["attempts"] += 1
+            bucket["approved"] += 1 if approved else 0
+            bucket["cost"] += cost
+            if self.stats_file:
+                with open(self.stats_file, "w", encoding="utf-8") as f:
+                    json.dump(self.stats, f, indent=2)
+
+    def report(self) -> str:
+        lines = [f"{'stage':<12} {'tier':<6} {'attempts':>8} {'approved':>8} {'rate':>6} {'cost $':>9} {'$/approved':>11}"]
+        for stage, tiers in sorted(self.stats.items()):
+            for tier in TIER_ORDER:
+                if tier not in tiers:
+                    continue
+                b = tiers[tier]
+                rate = b["approved"] / b["attempts"] if b["attempts"] else 0.0
+                per_approved = b["cost"] / b["approved"] if b["approved"] else float("nan")
+                lines.append(f"{stage:<12} {tier:<6} {b['attempts']:>8} {b['approved']:>8} {rate:>6.0%} "
+                             f"{b['cost']:>9.4f} {per_approved:>11.4f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    router = ModelRouter.from_trajectories()
+    print("Repository history from trajectories/:")
+    for repo_key, stats in sorted(router.history.items()):
+        print(f"  {repo_key}: {stats['submitted']}/{stats['runs']} submitted, ${stats['cost']:.4f}")
+    print("\nPer-tier outcomes:")
+    print(router.report())
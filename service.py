@@ -0,0 +1,222 @@
+"""
+Long-running service mode.
+One process keeps the stage pipeline (its thread/process pools, preloaded
+indexes and memo), the LLM client, the GitHub token pool and the repo clones
+warm, and runs submitted issues from a persistent job queue on a bounded set
+of worker threads. Jobs are leased like in distributed.py, so workers started
+with `python distributed.py work` against the same database share the load,
+and jobs left running by a crashed process are retried once their lease expires.
+
+HTTP/JSON API:
+  POST /jobs                  {"issue_url": ..., "priority": 0}  -> job
+  POST /jobs/batch            {"issue_urls": [<url> | {"issue_url": ..., "payload": {...}}, ...], "priority": 0}
+                              -> [job, ...]
+  GET  /jobs[?status=queued]  recent jobs
+  GET  /jobs/<id>             job with its result
+  GET  /jobs/<id>/events      stage events as NDJSON; ?since=<seq>, ?follow=1 streams until the job ends
+  POST /jobs/<id>/cancel      cancel a queued job
+  GET  /health                queue counts, workers and cache reports
+
+Usage: python service.py [--host 127.0.0.1] [--port 8765] [--workers 4] [--db swe_jobs.db] [--lease 120]
+With --workers 0 the service only accepts and reports jobs (coordinator) for remote workers.
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from artifact_store import open_store
+from distributed import Worker
+from github_scheduler import SCHEDULER
+from issue_context import prefetch_issue_contexts
+from job_queue import LEASE_SECONDS, QUEUE_DB, TERMINAL_STATES, JobQueue, open_queue
+from llm_usage import LEDGER
+from pipeline import Pipeline, load_pipeline
+from prompt_cache import cache_report
+
+POLL_INTERVAL = 1.0
+FOLLOW_INTERVAL = 0.5
+
+
+class Service:
+    """Worker threads pulling jobs from the queue and running them on one shared pipeline"""
+    def __init__(self, queue: JobQueue, pipeline: Pipeline, workers: int = 4, lease_seconds: float = LEASE_SECONDS):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.workers = workers
+        self.started = time.time()
+        node = f"{socket.gethostname()}-{os.getpid()}"
+        self._workers = [Worker(queue, pipeline, f"{node}-{i + 1}", lease_seconds, open_store(), node=node)
+                         for i in range(workers)]
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def active(self) -> Dict[str, str]:
+        return {w.name: w.current for w in self._workers if w.current}
+
+    def start(self):
+        for worker in self._workers:
+            thread = threading.Thread(target=worker.run_forever, args=(self._stop, self._wake), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self.pipeline.shutdown()
+
+    def notify(self):
+        with self._wake:
+            self._wake.notify_all()
+
+    def prefetch(self, issue_urls: list):
+        """Batched GitHub context for a submitted batch, fetched in the background for the local workers"""
+        if not self.workers or not issue_urls:
+            return
+
+        def run():
+            try:
+                prefetch_issue_contexts(issue_urls)
+            except Exception as e:
+                print(f"⚠️  Prefetching {len(issue_urls)} issue context(s) failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "uptime": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "active": dict(self.active),
+            "jobs": self.queue.counts(),
+            "repo_locality": self.queue.locality(),
+            "pipeline_memo": len(self.pipeline.memo),
+            "github": SCHEDULER.report(),
+            "prompt_cache": cache_report(),
+            "cost_by_stage": LEDGER.by("stage"),
+        }
+
+
+def make_handler(service: Service):
+    queue = service.queue
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Any):
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> Optional[Dict]:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                return None
+
+        def do_POST(self):
+            parts = urlparse(self.path).path.strip("/").split("/")
+            body = self._body()
+            if body is None:
+                return self._send(400, {"error": "invalid JSON body"})
+            if parts == ["jobs"]:
+                if not body.get("issue_url"):
+                    return self._send(400, {"error": "issue_url is required"})
+                job = queue.submit(body["issue_url"], int(body.get("priority", 0)), body.get("payload"))
+                service.notify()
+                return self._send(202, job)
+            if parts == ["jobs", "batch"]:
+                items = [item if isinstance(item, dict) else {"issue_url": item} for item in body.get("issue_urls", [])]
+                if not all(item.get("issue_url") for item in items):
+                    return self._send(400, {"error": "every batch item needs an issue_url"})
+                # A payload (e.g. base_commit) travels with its item, like a line of a distributed.py batch file
+                jobs = [queue.submit(item["issue_url"], int(body.get("priority", 0)), item.get("payload"))
+                        for item in items]
+                service.prefetch([job["issue_url"] for job in jobs])
+                service.notify()
+                return self._send(202, jobs)
+            if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                if queue.cancel(parts[1]):
+                    return self._send(200, queue.get(parts[1]))
+                return self._send(409, {"error": "only queued jobs can be cancelled"})
+            self._send(404, {"error": "not found"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if parts == ["health"]:
+                return self._send(200, service.health())
+            if parts == ["jobs"]:
+                return self._send(200, queue.list(query.get("status"), int(query.get("limit", 100))))
+            if len(parts) >= 2 and parts[0] == "jobs":
+                job = queue.get(parts[1])
+                if job is None:
+                    return self._send(404, {"error": f"unknown job {parts[1]}"})
+                if len(parts) == 2:
+                    return self._send(200, job)
+                if parts[2] == "events":
+                    return self._stream_events(job, int(query.get("since", 0)), query.get("follow") == "1")
+            self._send(404, {"error": "not found"})
+
+        def _stream_events(self, job: Dict, since: int, follow: bool):
+            """NDJSON, one event per line; with follow the response stays open until the job ends"""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            while True:
+                for event in queue.events(job["id"], since):
+                    self.wfile.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+                    since = event["seq"]
+                self.wfile.flush()
+                if not follow or queue.get(job["id"])["status"] in TERMINAL_STATES:
+                    # One more read so events written just before the status change are not lost
+                    for event in queue.events(job["id"], since):
+                        self.wfile.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+                    return
+                time.sleep(FOLLOW_INTERVAL)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SWE-lutions as a service with an HTTP job API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="issues processed at the same time")
+    parser.add_argument("--db", default=QUEUE_DB, help="job queue, a SQLite path or sqlite:///...")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="seconds before a silent worker's job is retried")
+    parser.add_argument("--config", default="pipeline.yaml", help="Pipeline definition")
+    args = parser.parse_args()
+
+    service = Service(open_queue(args.db), load_pipeline(args.config), workers=args.workers, lease_seconds=args.lease)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"🛰️  Listening on http://{args.host}:{server.server_address[1]} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    main()
@@ -0,0 +1,227 @@
+"""
+Stage adapters for pipeline.yaml.
+Each function takes the stage inputs as keyword arguments and returns a dict keyed by its outputs.
+"""
+import os
+import re
+import threading
+
+import github_tools
+import repo_index
+from artifact_store import instance_id, open_store, run_key
+from fix_memory import EXAMPLE_VERDICTS, FixMemory, format_examples
+from issue_dedup import SHORT_CIRCUIT_THRESHOLD, IssueIndex
+from provisioning import head_commit, pull_image
+from workspaces import WORKSPACES
+from patch_model import parse_patch
+from traceback_locator import locate_crash_site
+from orchestrator import (
+    classify_paradigm,
+    fetch_issue_bundle,
+    fetch_repo_tree,
+    guess_most_relevant_file,
+    guess_what_went_wrong,
+    run_revisor,
+    send_to_swe_agent,
+    transform_github_url_to_api,
+)
+
+
+_issue_index = None
+_fix_memory = None
+_shared_lock = threading.Lock()
+
+
+def issue_index():
+    """IssueIndex shared by the stages of this process"""
+    global _issue_index
+    with _shared_lock:
+        if _issue_index is None:
+            _issue_index = IssueIndex()
+        return _issue_index
+
+
+def fix_memory():
+    """FixMemory shared by the stages of this process, with this machine's trajectories/ ingested once"""
+    global _fix_memory
+    with _shared_lock:
+        if _fix_memory is None:
+            _fix_memory = FixMemory()
+            added = _fix_memory.ingest_trajectories()
+            if added:
+                print(f"🧠 Fix memory: {added} new past run(s), {len(_fix_memory)} stored")
+        return _fix_memory
+
+
+def parse_issue_url(issue_url):
+    api_url, owner, repo = transform_github_url_to_api(issue_url)
+    return {"api_url": api_url, "owner": owner, "repo": repo}
+
+
+def fetch_issue(issue_url):
+    # GraphQL issue context (comments, linked PRs), prefetched with the rest of its batch by
+    # distributed and service workers, with a REST fallback
+    problem_statement, _ = fetch_issue_bundle(issue_url)
+    return {"problem_statement": problem_statement}
+
+
+def find_duplicate(issue_url, owner, repo, problem_statement):
+    """Approved near-duplicate of the issue in the same repository, or None"""
+    return {"duplicate": issue_index().find_resolved(problem_statement, f"{owner}/{repo}", exclude_url=issue_url)}
+
+
+def recall_fixes(issue_url, problem_statement):
+    """Prompt block with past fixes of similar issues; the issue's own earlier runs are left out"""
+    matches = fix_memory().search(problem_statement, verdicts=EXAMPLE_VERDICTS,
+                                  exclude=(issue_url, instance_id(issue_url)))
+    return {"fix_examples": format_examples(matches)}
+
+
+def fetch_tree(owner, repo, base_commit=""):
+    # The files SWE-agent will see, so guess_file never picks one that only exists at another commit
+    return {"file_paths": fetch_repo_tree(owner, repo, base_commit or "HEAD")}
+
+
+def guess_file(problem_statement, file_paths, duplicate=None):
+    # A near-duplicate we already fixed reuses that analysis instead of new LLM calls
+    if duplicate and duplicate.get("filepath") in file_paths:
+        return {"filepath": duplicate["filepath"]}
+    site = locate_crash_site(problem_statement, file_paths)
+    if site and site["confident"]:
+        return {"filepath": site["filepath"]}
+    return {"filepath": guess_most_relevant_file(problem_statement, file_paths)}
+
+
+def clone_repo(owner, repo):
+    """Shallow clone of the default branch, reused across runs and moved to the current head"""
+    return {"repo_dir": github_tools.get_repo_service(owner, repo).checkout()}
+
+
+def provision_env(owner, repo, base_commit=""):
+    """SWE-agent image and a self-contained checkout of base_commit (or the head), ready before the analysis finishes"""
+    pull_image()
+    commit = base_commit or head_commit(owner, repo)
+    return {"repo_path": WORKSPACES.pristine(owner, repo, commit, standalone=True)}
+
+
+# CPU-bound stages below are declared with executor: "process" in pipeline.yaml.
+# They only take paths, the contents are read from the mmap'ed index inside the worker.
+
+def index_repo(repo_dir):
+    # clone_repo leaves an index that matches the checked out head; build one for other checkouts
+    index_path = repo_index.index_path_for(repo_dir)
+    if os.path.exists(index_path + ".json"):
+        return {"index_path": index_path}
+    return {"index_path": repo_index.build_index(repo_dir, index_path)}
+
+
+def outline_file(index_path, filepath):
+    path = (filepath or "").strip().strip("`")
+    return {"file_outline": repo_index.outline_paths(index_path, [path]).get(path, [])}
+
+
+def first_guess(problem_statement, filepath, file_outline, duplicate=None, fix_examples=""):
+    if duplicate and duplicate.get("first_guess") and filepath == duplicate.get("filepath"):
+        return {"first_guess": duplicate["first_guess"]}
+    return {"first_guess": guess_what_went_wrong(problem_statement, filepath, file_outline, examples=fix_examples)}
+
+
+def paradigm(problem_statement, filepath):
+    return {"paradigm": classify_paradigm(problem_statement, filepath)}
+
+
+def swe_agent(issue_url, problem_statement, filepath, first_guess, repo_path=None, run_id=None, duplicate=None,
+              fix_examples=""):
+    if duplicate and duplicate["similarity"] >= SHORT_CIRCUIT_THRESHOLD:
+        # Same report as an issue of this repo we already fixed: its patch replaces the SWE-agent run
+        # only if the revisor approves it for this issue
+        print(f"♻️  Trying the approved patch of {duplicate['issue_url']} before SWE-agent")
+        reused = run_revisor({"problem_statement": problem_statement, "patch": duplicate["patch"]})
+        if reused.get("status") == "APPROVED":
+            return {"patch": duplicate["patch"]}
+        print("The reused patch was not approved; running SWE-agent")
+    data = {
+        "problem_statement": problem_statement,
+        "github_url": issue_url,
+        "first_guess": first_guess,
+        "filepath": filepath,
+        "repo_path": repo_path,
+        "fix_examples": fix_examples,
+    }
+    store = open_store()
+    if store is not None:
+        # Distributed runs: SWE-agent writes into the shared artifact store rather than local trajectories/
+        data["output_dir"] = store.staging()
+    patch_model = send_to_swe_agent(data)
+    patch = ""
+    if patch_model:
+        # Stage outputs are JSON, so the diff is read out of the mapped .patch before it moves or is unmapped
+        with patch_model:
+            patch = patch_model.text()
+    if store is not None:
+        # Stored per job attempt, so another job or attempt for the same issue never supplies this run's patch
+        store.put_tree(run_key(issue_url, run_id), "swe_agent", data["output_dir"])
+    return {"patch": patch}
+
+
+DEBUG_LEFTOVERS = re.compile(r"^\+.*\b(breakpoint\(\)|pdb\.set_trace\(\)|import pdb)")
+CONFLICT_MARKERS = re.compile(r"^\+(<<<<<<<|=======|>>>>>>>)( |$)")
+
+
+def static_prereview(patch, filepath):
+    """Cheap local checks on a patch that do not need an LLM"""
+    warnings = []
+    if not patch.strip():
+        return {"prereview": {"ok": False, "files": [], "warnings": ["Empty patch"]}}
+
+    parsed = parse_patch(patch)
+    files = parsed.touched_paths()
+    for file_patch in parsed:
+        if not file_patch.hunks and not file_patch.is_binary:
+            warnings.append(f"No hunks for {file_patch.path}")
+        for hunk in file_patch.hunks:
+            for line in parsed.hunk_text(hunk).splitlines():
+                if DEBUG_LEFTOVERS.match(line):
+                    warnings.append(f"Debugging leftover in {file_patch.path}: {line[1:].strip()}")
+                elif CONFLICT_MARKERS.match(line):
+                    warnings.append(f"Merge conflict marker added in {file_patch.path}")
+
+    if not files:
+        warnings.append("No file headers found in patch")
+    elif filepath and not parsed.touches(filepath):
+        warnings.append(f"Patch does not touch the analyzer's file guess {filepath}")
+
+    return {"prereview": {
+        "ok": bool(files) and not warnings,
+        "files": files,
+        "added": parsed.added,
+        "removed": parsed.removed,
+        "warnings": warnings,
+    }}
+
+
+def review(problem_statement, patch, repo_path):
+    if not patch:
+        return {"review": {
+            "status": "ERROR",
+            "confidence": 0.0,
+            "reason": "No patch generated",
+            "issues_found": ["SWE-Agent produced no patch"],
+            "suggestions": ["Retry the SWE-Agent run"]
+        }}
+    # repo_path is the pristine checkout at the commit the patch was written against
+    return {"review": run_revisor({"problem_statement": problem_statement, "patch": patch, "repo_dir": repo_path})}
+
+
+def record_issue(issue_url, problem_statement, filepath, first_guess, patch, review, duplicate=None):
+    """Store the analysis in the issue index, and the patch (also in the fix memory) once the revisor approved it"""
+    index = issue_index()
+    index.add(issue_url, problem_statement, status="analyzed", filepath=filepath, first_guess=first_guess)
+    if review.get("status") != "APPROVED":
+        return {"issue_status": "analyzed"}
+    fields = {"status": "approved", "patch": patch}
+    if duplicate and duplicate.get("patch") == patch:
+        fields["reused_from"] = duplicate["issue_url"]
+    index.update(issue_url, **fields)
+    fix_memory().add(issue_url, problem_statement, patch, "approved", instance_id=instance_id(issue_url))
+    return {"issue_status": "approved"}
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import best_of_n
+from best_of_n import AttemptBudget, attempt_variants
+
+
+@pytest.fixture(autouse=True)
+def runs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(best_of_n, "RUNS_DIR", str(tmp_path))
+    monkeypatch.setattr(best_of_n, "ATTEMPT_COST_LIMIT", 3.0)
+
+
+def fake_attempts(monkeypatch, plan):
+    """plan[attempt] = (seconds, cost, verdict); verdict None means no patch"""
+    events = []
+
+    async def run_attempt(data, variant, cost_limit, output_dir):
+        seconds, cost, verdict = plan[variant["attempt"]]
+        events.append(("start", variant["attempt"], cost_limit))
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            events.append(("killed", variant["attempt"]))
+            raise
+        return dict(data, swe_cost=cost, patch_model=bool(verdict), attempt_no=variant["attempt"])
+
+    async def review_attempt(attempt, revisor_model):
+        verdict = plan[attempt["attempt_no"]][2]
+        await asyncio.sleep(0.01)
+        attempt["review"] = {"status": verdict}
+        if verdict == "APPROVED":
+            attempt["patch"] = f"patch {attempt['attempt_no']}"
+        return attempt
+
+    monkeypatch.setattr(best_of_n, "run_attempt", run_attempt)
+    monkeypatch.setattr(best_of_n, "review_attempt", review_attempt)
+    return events
+
+
+def test_budget_reserves_only_what_is_left():
+    budget = AttemptBudget(4.0)
+    assert budget.reserve(3.0) == 3.0
+    assert budget.reserve(3.0) == 1.0
+    assert budget.reserve(3.0) == 0.0
+    budget.settle(3.0, 1.2)
+    assert budget.reserve(3.0) == pytest.approx(1.8)
+    assert budget.spent == pytest.approx(1.2)
+
+
+def test_variants_spread_over_models_then_temperatures():
+    variants = attempt_variants(["a", "b"], 3)
+    assert [(v["model"], v["temperature"]) for v in variants] == [("a", 0.0), ("b", 0.0), ("a", 0.5)]
+
+
+def test_first_approval_cancels_the_attempts_still_running(monkeypatch):
+    events = fake_attempts(monkeypatch, {1: (0.01, 0.4, "APPROVED"), 2: (5, 0.0, "APPROVED")})
+    result = asyncio.run(best_of_n.best_of_n({}, ["a", "b"], attempts=2, max_parallel=2, cost_cap=10))
+    assert result["approved"] and result["winner"] == 1 and result["patch"] == "patch 1"
+    assert ("killed", 2) in events
+    outcomes = {o["attempt"]: o for o in result["attempts"]}
+    assert outcomes[1]["status"] == "approved" and outcomes[2]["status"] == "cancelled"
+    # A killed run is charged its whole reservation
+    assert outcomes[2]["cost"] == 3.0 and result["cost"] == pytest.approx(3.4)
+
+
+def test_cost_cap_limits_attempts_and_waits_for_running_ones_to_settle(monkeypatch):
+    plan = {n: (0.01 * n, 0.5, None) for n in range(1, 5)}
+    events = fake_attempts(monkeypatch, plan)
+    result = asyncio.run(best_of_n.best_of_n({}, ["a"], attempts=4, max_parallel=4, cost_cap=4.0))
+    starts = [e for e in events if e[0] == "start"]
+    # Two reservations fill the cap; later attempts start from what settled runs gave back
+    assert starts == [("start", 1, 3.0), ("start", 2, 1.0), ("start", 3, 2.5), ("start", 4, 0.5)]
+    assert all(o["status"] == "no_patch" for o in result["attempts"])
+    assert not result["approved"] and result["cost"] == pytest.approx(2.0)
+
+
+def test_attempts_not_started_once_the_cap_is_spent(monkeypatch):
+    fake_attempts(monkeypatch, {1: (0.01, 3.8, "REJECTED"), 2: (0.01, 0.0, "APPROVED")})
+    result = asyncio.run(best_of_n.best_of_n({}, ["a"], attempts=2, max_parallel=1, cost_cap=4.0))
+    assert [o["status"] for o in result["attempts"]] == ["rejected"]
+    assert not result["approved"] and result["cost"] == pytest.approx(3.8)
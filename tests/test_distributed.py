@@ -0,0 +1,123 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+from artifact_store import instance_id, open_store
+from job_queue import JobQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stand-ins for the GitHub/LLM/SWE-agent stages; issue 4's first attempt hangs until its worker is killed
+FAKE_STAGES = '''
+import os
+import time
+
+from artifact_store import open_store, run_key
+
+
+def parse(issue_url):
+    return {"number": int(issue_url.rsplit("/", 1)[1])}
+
+
+def solve(issue_url, run_id, base_commit, number):
+    if number == 4 and run_id.endswith("-a1"):
+        with open(os.environ["HANG_PID_FILE"], "w") as f:
+            f.write(str(os.getpid()))
+        time.sleep(120)
+    store = open_store()
+    staged = store.staging()
+    with open(os.path.join(staged, "fix.patch"), "w") as f:
+        f.write(f"patch for {number} from {run_id}")
+    store.put_tree(run_key(issue_url, run_id), "swe_agent", staged)
+    return {"patch": f"patch for {number}", "pid": os.getpid(), "commit": base_commit}
+'''
+
+FAKE_PIPELINE = '''
+name: "fake"
+executor: "thread"
+inputs: [issue_url, run_id, base_commit]
+stages:
+  - name: "parse"
+    function: "fake_stages:parse"
+    inputs: ["issue_url"]
+    outputs: ["number"]
+  - name: "solve"
+    function: "fake_stages:solve"
+    inputs: ["issue_url", "run_id", "base_commit", "number"]
+    outputs: ["patch", "pid", "commit"]
+    cache: false
+'''
+
+
+def test_local_workers_drain_the_queue_and_retry_a_killed_worker(tmp_path):
+    (tmp_path / "fake_stages.py").write_text(textwrap.dedent(FAKE_STAGES))
+    (tmp_path / "pipeline.yaml").write_text(textwrap.dedent(FAKE_PIPELINE))
+    db, artifacts, pid_file = tmp_path / "jobs.db", tmp_path / "artifacts", tmp_path / "hang.pid"
+    queue = JobQueue(str(db))
+    urls = [f"https://github.com/octo/repo{n % 2}/issues/{n}" for n in range(1, 9)]
+    # Odd issues name the commit to work on, as a batch file line would
+    jobs = {url: queue.submit(url, payload={"base_commit": "c0ffee"} if n % 2 else None, max_attempts=2)["id"]
+            for n, url in enumerate(urls, 1)}
+
+    env = dict(os.environ, HANG_PID_FILE=str(pid_file),
+               PYTHONPATH=os.pathsep.join([str(tmp_path), ROOT] + sys.path))
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "distributed.py"), "local", "3", "--queue", f"sqlite:///{db}",
+         "--config", str(tmp_path / "pipeline.yaml"), "--artifacts", str(artifacts), "--lease", "2",
+         "--exit-when-idle"], cwd=tmp_path, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.time() + 60
+        while not pid_file.exists() and time.time() < deadline:
+            time.sleep(0.2)
+        assert pid_file.exists(), "no worker picked up the hanging job"
+        hung_pid = int(pid_file.read_text())
+        os.kill(hung_pid, signal.SIGKILL)
+        output = proc.communicate(timeout=90)[0].decode(errors="replace")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    assert all(queue.get(job_id)["status"] == "done" for job_id in jobs.values()), output
+    # The killed worker's lease expired and a surviving worker ran issue 4 again
+    retried = queue.get(jobs[urls[3]])
+    assert retried["attempts"] == 2 and retried["result"]["pid"] != hung_pid
+    assert [queue.get(jobs[url])["result"]["commit"] for url in urls] == ["c0ffee", ""] * 4
+
+    store = open_store(str(artifacts))
+    for url, job_id in jobs.items():
+        runs = sorted(os.listdir(artifacts / instance_id(url)))
+        job = queue.get(job_id)
+        # Each job stores under its own id and attempt; the dead first attempt of issue 4 left nothing
+        assert runs == [f"{job_id}-a{job['attempts']}"]
+        patch = store.get(f"{instance_id(url)}/{runs[0]}", "swe_agent")
+        assert open(os.path.join(patch, "fix.patch")).read().endswith(runs[0])
+        assert store.get_json(f"{instance_id(url)}/{runs[0]}", "result.json")["job_id"] == job_id
+
+
+def test_transient_failures_are_retried_and_others_fail(tmp_path):
+    import requests
+
+    from distributed import Worker
+    from pipeline import PipelineError
+
+    class FailingPipeline:
+        def __init__(self, error):
+            self.error = error
+
+        def run(self, inputs, on_event=None):
+            try:
+                raise self.error
+            except Exception as e:
+                raise PipelineError(f"Stage 'fetch_issue' failed: {e}") from e
+
+    outage = requests.HTTPError("502 Server Error", response=type("Response", (), {"status_code": 502})())
+    for n, (error, status) in enumerate(((requests.ConnectionError("reset"), "queued"), (outage, "queued"),
+                                         (ValueError("bad patch"), "failed"))):
+        queue = JobQueue(str(tmp_path / f"jobs{n}.db"))
+        job = queue.submit("https://github.com/octo/repo/issues/1", max_attempts=2)
+        worker = Worker(queue, FailingPipeline(error), "w")
+        worker.run_job(queue.claim("w", 60))
+        assert queue.get(job["id"])["status"] == status
@@ -0,0 +1,49 @@
+import json
+
+from fix_memory import EXAMPLE_VERDICTS, FixMemory, format_examples, trajectory_record
+
+ISSUE = "TypeError when parsing an empty config file with load_config"
+
+
+def test_search_returns_only_approved_fixes_of_other_issues(tmp_path):
+    memory = FixMemory(str(tmp_path))
+    memory.add("https://github.com/o/r/issues/1", ISSUE, "patch 1", "approved", instance_id="o__r-i1")
+    memory.add("trajectories/o__r-i2.traj", ISSUE, "patch 2", "submitted", instance_id="o__r-i2")
+    memory.add("trajectories/o__r-i3.traj", ISSUE, "patch 3", "approved", instance_id="o__r-i3")
+
+    patches = [record["patch"] for _, record in memory.search(ISSUE)]
+    assert sorted(patches) == ["patch 1", "patch 3"]
+    excluded = memory.search(ISSUE, exclude=("https://github.com/o/r/issues/3", "o__r-i3"))
+    assert [record["patch"] for _, record in excluded] == ["patch 1"]
+
+
+def test_retrieved_examples_are_not_part_of_the_stored_issue(tmp_path):
+    prompt = (f"ISSUE:\n{ISSUE}\n\nPreviously solved issues that look similar:\n\nold issue\n\n"
+              "INSTRUCTIONS:\nfix it")
+    traj = tmp_path / "o__r-i4.traj"
+    traj.write_text(json.dumps({"history": [{"role": "user", "content": prompt}], "info": {}}))
+    assert trajectory_record(str(traj))["problem_statement"] == ISSUE
+
+
+def test_approved_fix_is_found_behind_many_closer_unapproved_runs(tmp_path):
+    memory = FixMemory(str(tmp_path))
+    for n in range(20):
+        memory.add(f"trajectories/o__r-i{n}.traj", ISSUE, f"patch {n}", "submitted", instance_id=f"o__r-i{n}")
+    memory.add("https://github.com/o/r/issues/99", ISSUE + " in the parser", "approved patch", "approved")
+    assert [record["patch"] for _, record in memory.search(ISSUE, k=1)] == ["approved patch"]
+
+
+def test_submitted_runs_are_offered_with_an_unreviewed_label(tmp_path):
+    memory = FixMemory(str(tmp_path))
+    memory.add("trajectories/o__r-i2.traj", ISSUE, "patch 2", "submitted", instance_id="o__r-i2")
+    examples = format_examples(memory.search(ISSUE, verdicts=EXAMPLE_VERDICTS))
+    assert "unreviewed SWE-agent patch" in examples and "patch 2" in examples
+
+
+def test_rows_added_by_another_process_are_searched(tmp_path):
+    reader, writer = FixMemory(str(tmp_path)), FixMemory(str(tmp_path))
+    writer.add("https://github.com/o/r/issues/1", ISSUE, "patch 1", "approved")
+    assert writer.add("https://github.com/o/r/issues/2", ISSUE, "patch 2", "approved") == 1
+    assert sorted(record["patch"] for _, record in reader.search(ISSUE)) == ["patch 1", "patch 2"]
+    # Row numbers stay consistent when both append
+    assert reader.add("https://github.com/o/r/issues/3", ISSUE, "patch 3", "approved") == 2
@@ -0,0 +1,43 @@
+import time
+
+from github_scheduler import GITHUB_API, GitHubScheduler, RateLimitStubServer
+
+
+def test_tokens_only_sent_to_the_api_host():
+    with RateLimitStubServer(limit=10, window=60) as api, RateLimitStubServer(limit=10, window=60) as other:
+        scheduler = GitHubScheduler(tokens=["token-aaaa"], api_url=api.url)
+        assert scheduler.get(f"{GITHUB_API}/repos/o/r/issues/1").json()["token"] == "token-aaaa"
+        # e.g. a URL a model passed to get_github_issue
+        assert scheduler.get(f"{other.url}/repos/o/r/issues/1").json()["token"] == "anonymous"
+        assert scheduler.tokens[0].requests == 1
+
+
+def test_lookalike_host_is_not_rewritten_to_the_api():
+    scheduler = GitHubScheduler(tokens=["token-aaaa"], api_url="http://127.0.0.1:1")
+    assert scheduler._resolve(f"{GITHUB_API}.evil.example/x") == f"{GITHUB_API}.evil.example/x"
+    assert not scheduler._trusted(f"{GITHUB_API}.evil.example/x")
+
+
+def test_requests_spread_over_tokens_and_wait_for_the_reset():
+    with RateLimitStubServer(limit=3, window=1.0) as stub:
+        scheduler = GitHubScheduler(tokens=["token-aaaa", "token-bbbb"], api_url=stub.url,
+                                    min_remaining=0, batch_reserve=0)
+        statuses = [scheduler.get(f"{GITHUB_API}/n/{i}").status_code for i in range(8)]
+        assert statuses == [200] * 8
+        assert [s.requests > 0 for s in scheduler.tokens] == [True, True]
+        assert sum(s.requests for s in scheduler.tokens) == 8
+        assert scheduler.waited > 0
+
+
+def test_batch_reserve_scales_with_each_token_limit():
+    scheduler = GitHubScheduler(tokens=[None, "token-aaaa"], api_url="http://127.0.0.1:1",
+                                min_remaining=2, batch_reserve=0.01)
+    anonymous, token = scheduler.tokens
+    for state, limit, remaining in ((anonymous, 60, 5), (token, 5000, 40)):
+        state.limit, state.remaining, state.reset_at = limit, remaining, time.time() + 600
+    # 1 of 60 kept back anonymously, 50 of 5000 with a token
+    assert (anonymous.reserve(0.01), token.reserve(0.01)) == (1, 50)
+    assert scheduler._pick("batch", time.time()) is anonymous
+    assert scheduler._pick("interactive", time.time()) is token
+    anonymous.remaining = 3
+    assert scheduler._pick("batch", time.time()) is None
@@ -0,0 +1,68 @@
+import subprocess
+
+import github_tools
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def test_checkout_and_index_follow_the_head(tmp_path, monkeypatch):
+    source = tmp_path / "src"
+    source.mkdir()
+    git("init", "-q", cwd=source)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=source)
+    (source / "a.py").write_text("def old():\n    pass\n")
+    git("add", ".", cwd=source)
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "one", cwd=source)
+    first = git("rev-parse", "HEAD", cwd=source)
+    (source / "a.py").write_text("def new():\n    pass\n")
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qam", "two", cwd=source)
+    second = git("rev-parse", "HEAD", cwd=source)
+
+    # A cached clone from an earlier run, still at the first commit
+    cache = tmp_path / "cache"
+    git("clone", "-q", f"file://{source}", str(cache / "o__r"), cwd=tmp_path)
+    git("reset", "-q", "--hard", first, cwd=cache / "o__r")
+    monkeypatch.setattr(github_tools, "REPO_CACHE_DIR", str(cache))
+    service = github_tools.RepoService("o", "r")
+    head = {"sha": first}
+    monkeypatch.setattr(service, "commit", lambda: head["sha"])
+
+    assert "def old" in service.index().text("a.py")
+    assert service.symbol_range("a.py", "old") == (1, 2)
+
+    # The head moves (commit() refreshes after API_CACHE_TTL); the next read syncs checkout and index
+    head["sha"] = second
+    assert "def new" in service.index().text("a.py")
+    assert git("rev-parse", "HEAD", cwd=service.checkout()) == second
+    assert service.symbol_range("a.py", "new") == (1, 2)
+
+    # A head the remote cannot serve leaves checkout and index where they were, and is retried next time
+    head["sha"] = "f" * 40
+    assert "def new" in service.index().text("a.py")
+    assert service._index_commit == second
+    head["sha"] = second
+    assert git("rev-parse", "HEAD", cwd=service.checkout()) == second
+
+
+def test_api_cache_evicts_the_least_recently_used_url(monkeypatch):
+    class Response:
+        def __init__(self, url):
+            self.url = url
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"url": self.url}
+
+    calls = []
+    monkeypatch.setattr(github_tools, "github_get", lambda url: calls.append(url) or Response(url))
+    monkeypatch.setattr(github_tools, "_api_cache", github_tools.OrderedDict())
+    monkeypatch.setattr(github_tools, "API_CACHE_SIZE", 2)
+    for url in ("a", "b", "a", "c", "a", "b"):
+        assert github_tools.api_get(url) == {"url": url}
+    # "b" was the least recently used when "c" arrived
+    assert calls == ["a", "b", "c", "b"]
+    assert list(github_tools._api_cache) == ["a", "b"]
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+import multiagents
+from multiagents import AssistantAgent, BoundedAssistantAgent
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphores(monkeypatch):
+    # Semaphores bind to the loop of the first chat; every test runs its own loop
+    monkeypatch.setattr(multiagents, "_agent_semaphores", {})
+
+
+def test_a_slow_reply_is_cancelled_after_the_round_timeout(monkeypatch):
+    async def slow_reply(self, messages=None, sender=None, **kwargs):
+        await asyncio.sleep(5)
+        return "too late"
+
+    monkeypatch.setattr(AssistantAgent, "a_generate_reply", slow_reply, raising=False)
+    agent = BoundedAssistantAgent(name="analyzer", system_message="", llm_config=False, round_timeout=0.05)
+    agent.name = "analyzer"
+    start = time.monotonic()
+    assert asyncio.run(agent.a_generate_reply(messages=[])) is None
+    assert time.monotonic() - start < 2 and agent.timed_out_rounds == 1
+
+
+def test_replies_of_one_agent_are_limited_across_chats(monkeypatch):
+    running, peak = [0], [0]
+
+    async def reply(self, messages=None, sender=None, **kwargs):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+        return "patch"
+
+    monkeypatch.setattr(AssistantAgent, "a_generate_reply", reply, raising=False)
+    monkeypatch.setitem(multiagents.AGENT_CONCURRENCY, "swe_agent", 1)
+    agents = [BoundedAssistantAgent(name="swe_agent", system_message="", llm_config=False) for _ in range(3)]
+    for agent in agents:
+        agent.name = "swe_agent"
+
+    async def all_chats():
+        return await asyncio.gather(*(agent.a_generate_reply(messages=[]) for agent in agents))
+
+    assert asyncio.run(all_chats()) == ["patch"] * 3
+    assert peak[0] == 1
+
+
+def test_a_failing_or_hanging_chat_does_not_cancel_the_others(monkeypatch):
+    active, peak = [0], [0]
+
+    async def fake_chat(issue_url, **kwargs):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        try:
+            if issue_url.endswith("/1"):
+                await asyncio.sleep(5)
+            if issue_url.endswith("/2"):
+                raise RuntimeError("analyzer config missing")
+            await asyncio.sleep(0.01)
+            return {"issue_url": issue_url, "approved": True}
+        finally:
+            active[0] -= 1
+
+    monkeypatch.setattr(multiagents, "run_group_chat", fake_chat)
+    urls = [f"https://github.com/o/r/issues/{n}" for n in range(1, 5)]
+    results = asyncio.run(multiagents.run_group_chats(urls, max_chats=2, chat_timeout=0.2))
+    assert results[0] == {"issue_url": urls[0], "error": "timeout after 0.2s"}
+    assert results[1] == {"issue_url": urls[1], "error": "analyzer config missing"}
+    assert [r.get("approved") for r in results[2:]] == [True, True]
+    assert peak[0] == 2
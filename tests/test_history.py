@@ -0,0 +1,48 @@
+import re
+
+from history import HistoryManager
+
+FILE_DUMP = "\n".join(f"{n}: line {n} of a long file" for n in range(200))
+
+
+def conversation(turns):
+    messages = [{"role": "system", "content": "You fix bugs."}, {"role": "user", "content": "ISSUE: crash"}]
+    for n in range(turns):
+        messages.append({"role": "assistant", "content": f"open file {n}"})
+        messages.append({"role": "tool", "content": f"file {n}\n{FILE_DUMP}"})
+    return messages
+
+
+def test_old_observations_become_recallable_digests():
+    manager = HistoryManager(keep_last=2, polling=1, max_tokens=100000)
+    messages = conversation(4)
+    compacted = manager.compact(messages)
+    assert messages[3]["content"].startswith("file 0") and len(messages[3]["content"]) > 1000  # input untouched
+    # Task and the last keep_last messages stay verbatim; older tool output is digested
+    assert compacted[:2] == messages[:2] and compacted[-2:] == messages[-2:]
+    digest = compacted[3]["content"]
+    assert len(digest) < 400 and digest.startswith("file 0\n")
+    handle = re.search(r"recall_observation\('(h\w+)'\)", digest).group(1)
+    assert manager.recall(handle) == messages[3]["content"]
+    assert compacted[2] == messages[2]  # short assistant turns are left alone
+    assert manager.recall("hmissing").startswith("Unknown history handle")
+
+
+def test_compacted_prefix_only_moves_every_polling_messages():
+    manager = HistoryManager(keep_last=2, polling=4, max_tokens=100000)
+    messages = conversation(6)
+    first = manager.compact(messages[:10])
+    # One more message does not move the boundary, so the prefix is byte-identical for the prompt cache
+    second = manager.compact(messages[:11])
+    assert second[:10] == first[:10]
+    digested = [i for i, m in enumerate(second) if "recall_observation" in str(m["content"])]
+    assert digested and max(digested) < 2 + 8
+
+
+def test_over_budget_histories_shrink_to_handle_notes():
+    manager = HistoryManager(keep_last=2, polling=1, max_tokens=300)
+    messages = conversation(8)
+    compacted = manager.compact(messages)
+    # The kept tail alone is over budget, so every older observation is down to its handle note
+    assert all(m["content"].startswith("... [") for m in compacted[2:-2] if m["role"] == "tool")
+    assert manager.count_tokens(compacted[:-2]) < 300 < manager.count_tokens(messages[:-2])
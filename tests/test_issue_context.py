@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import issue_context
+from issue_context import (RecordedTransport, fetch_issue_context, fetch_issue_contexts, prefetch_issue_contexts,
+                           prefetched, problem_statement)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "issue_context_responses.json")
+ISSUE = "https://github.com/octo/configlib/issues/12"
+MISSING = "https://github.com/octo/configlib/issues/999"
+
+
+def test_replayed_batch_builds_contexts_and_pages_comments():
+    transport = RecordedTransport.load(FIXTURE)
+    contexts = fetch_issue_contexts([ISSUE, MISSING], transport)
+
+    context = contexts[ISSUE]
+    assert context["title"] == "load_config crashes on an empty file"
+    assert context["labels"] == ["bug", "good first issue"]
+    assert context["head_sha"].startswith("3f1c2b9a")
+    # The second comment page was requested with the cursor and appended
+    assert [c["author"] for c in context["comments"]] == ["alice", "ghost", "maintainer"]
+    assert context["comment_count"] == 3
+    # A PR that is both cross-referenced and connected is listed once
+    assert [pr["number"] for pr in context["linked_prs"]] == [15]
+    assert context["referenced_commits"][0]["messageHeadline"] == "Add failing test for empty config"
+    assert contexts[MISSING] == {"issue_url": MISSING, "error": "issue not found or not accessible"}
+
+    # Both issues went in one query; only the long discussion needed a follow-up page
+    assert len(transport.queries) == 2
+    assert "issue(number: 12)" in transport.queries[0] and "issue(number: 999)" in transport.queries[0]
+    assert 'after: "Y3Vyc29yOnYyOpHOAAAAAg=="' in transport.queries[1]
+    assert "timelineItems" not in transport.queries[1]
+
+    statement = problem_statement(context)
+    assert "Labels: bug, good first issue" in statement
+    assert "- #15 Handle empty config files (open)" in statement
+    assert "@maintainer: Confirmed, a fix is in #15." in statement
+
+
+def test_replay_fails_when_the_recording_runs_out():
+    transport = RecordedTransport.load(FIXTURE)
+    fetch_issue_contexts([ISSUE, MISSING], transport)
+    with pytest.raises(RuntimeError, match="No recorded response left"):
+        transport("query { viewer { login } }")
+
+
+def test_recorded_live_responses_replay_identically(tmp_path):
+    recorded = RecordedTransport.load(FIXTURE).responses
+    answers = iter(recorded)
+    recorder = RecordedTransport(live=lambda query, variables=None: next(answers))
+    live = fetch_issue_contexts([ISSUE, MISSING], recorder)
+    path = tmp_path / "responses.json"
+    recorder.save(str(path))
+
+    assert fetch_issue_contexts([ISSUE, MISSING], RecordedTransport.load(str(path))) == live
+
+
+def test_prefetched_context_serves_the_next_single_fetch_once(monkeypatch):
+    monkeypatch.setattr(issue_context, "_prefetched", {})
+    transport = RecordedTransport.load(FIXTURE)
+    assert prefetch_issue_contexts([ISSUE, MISSING, ISSUE], transport) == 1
+    assert prefetched(ISSUE) and not prefetched(MISSING)
+
+    def offline(query, variables=None):
+        raise AssertionError("prefetched issue was queried again")
+
+    assert fetch_issue_context(ISSUE, offline)["title"] == "load_config crashes on an empty file"
+    # Used once: a later run of the issue (a retry) reads it fresh
+    assert not prefetched(ISSUE)
+    with pytest.raises(AssertionError):
+        fetch_issue_context(ISSUE, offline)
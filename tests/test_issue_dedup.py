@@ -0,0 +1,31 @@
+from issue_dedup import IssueIndex, issue_repo
+
+TEMPLATE = ("Bug report\n\n**Describe the bug**\nCalling the client with a timeout raises an exception.\n\n"
+            "**To Reproduce**\nSteps to reproduce the behavior: install the package, run the example, "
+            "see the error in the console output.\n\n**Expected behavior**\nNo exception is raised.")
+
+
+def test_issue_repo_accepts_web_and_api_urls():
+    assert issue_repo("https://github.com/Owner/Repo/issues/3") == "owner/repo"
+    assert issue_repo("https://api.github.com/repos/owner/repo/issues/3") == "owner/repo"
+
+
+def test_find_resolved_only_returns_issues_of_the_same_repo(tmp_path):
+    index = IssueIndex(str(tmp_path / "index"))
+    index.add("https://github.com/a/one/issues/1", TEMPLATE, status="approved", patch="--- a/x\n+++ b/x\n")
+    assert index.find_resolved(TEMPLATE, "b/two", exclude_url="https://github.com/b/two/issues/9") is None
+    found = index.find_resolved(TEMPLATE, "a/one", exclude_url="https://github.com/a/one/issues/9")
+    assert found["issue_url"] == "https://github.com/a/one/issues/1"
+    assert found["repo"] == "a/one"
+
+
+def test_reanalysis_keeps_an_approved_record(tmp_path):
+    index = IssueIndex(str(tmp_path / "index"))
+    url = "https://github.com/a/one/issues/1"
+    index.add(url, TEMPLATE, status="analyzed", filepath="client.py")
+    index.update(url, status="approved", patch="--- a/x\n+++ b/x\n")
+    index.add(url, TEMPLATE, status="analyzed", filepath="session.py")
+    record = index.record(index.rows_by_url[url])
+    assert record["status"] == "approved" and record["patch"] == "--- a/x\n+++ b/x\n"
+    assert record["filepath"] == "session.py"
+    assert index.find_resolved(TEMPLATE, "a/one", exclude_url="https://github.com/a/one/issues/9")["issue_url"] == url
@@ -0,0 +1,21 @@
+from patch_model import parse_patch_file
+
+PATCH = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a = 1\n+a = 2\n"
+
+
+def test_patch_file_is_sliced_in_place_and_unmapped_on_close(tmp_path):
+    path = tmp_path / "fix.patch"
+    path.write_text("SWE-agent log line\n" + PATCH)
+    with parse_patch_file(str(path)) as patch:
+        assert patch.touched_paths() == ["a.py"]
+        text = patch.text()
+        mapped = patch.data
+    assert text == PATCH
+    assert mapped.closed
+
+
+def test_empty_patch_file(tmp_path):
+    path = tmp_path / "empty.patch"
+    path.write_text("")
+    with parse_patch_file(str(path)) as patch:
+        assert not patch.files and patch.text() == ""
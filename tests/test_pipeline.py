@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from pipeline import Pipeline, PipelineError, Stage
+
+CALLS = []
+BARRIER = threading.Barrier(2, timeout=5)
+CANCELLED = []
+
+
+def double(x):
+    CALLS.append(x)
+    return {"y": x * 2}
+
+
+def left(x):
+    # Only returns once right() is running at the same time
+    BARRIER.wait()
+    return {"l": x + 1}
+
+
+def right(x):
+    BARRIER.wait()
+    return {"r": x + 2}
+
+
+def join(l, r):
+    return {"total": l + r}
+
+
+def pid(x):
+    return {"pid": os.getpid()}
+
+
+async def slow_async(x):
+    await asyncio.sleep(0.01)
+    return {"a": x}
+
+
+async def sibling(x):
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        CANCELLED.append("sibling")
+        raise
+    return {"s": x}
+
+
+def explode(x):
+    raise ValueError("boom")
+
+
+def after_explode(e):
+    CALLS.append("after")
+    return {"f": e}
+
+
+def stage(name, outputs, inputs=("x",), **kwargs):
+    return Stage(name, f"{__name__}:{name}", list(inputs), outputs, **kwargs)
+
+
+def run(pipeline, inputs, events=None):
+    try:
+        return pipeline.run(inputs, on_event=events.append if events is not None else None)
+    finally:
+        pipeline.shutdown()
+
+
+def test_independent_stages_run_concurrently():
+    BARRIER.reset()
+    pipeline = Pipeline([stage("left", ["l"]), stage("right", ["r"]), stage("join", ["total"], ["l", "r"])],
+                        ["x"])
+    assert run(pipeline, {"x": 1})["total"] == 5
+    # join waited for both of its inputs
+    timeline = {entry["stage"]: entry for entry in pipeline.timeline}
+    assert timeline["join"]["start"] >= max(timeline["left"]["end"], timeline["right"]["end"])
+
+
+def test_memo_hits_skip_the_stage_in_memory_and_on_disk(tmp_path):
+    CALLS.clear()
+    pipeline = Pipeline([stage("double", ["y"])], ["x"], cache_dir=str(tmp_path))
+    events = []
+    try:
+        assert pipeline.run({"x": 3})["y"] == 6
+        assert pipeline.run({"x": 3}, on_event=events.append)["y"] == 6
+    finally:
+        pipeline.shutdown()
+    assert CALLS == [3] and [e["type"] for e in events] == ["stage_cached"]
+    # A new process (pipeline) reads the result back from cache_dir
+    assert run(Pipeline([stage("double", ["y"])], ["x"], cache_dir=str(tmp_path)), {"x": 3})["y"] == 6
+    assert CALLS == [3]
+    # cache: false stages always run
+    run(Pipeline([stage("double", ["y"], cache=False)], ["x"], cache_dir=str(tmp_path)), {"x": 3})
+    assert CALLS == [3, 3]
+
+
+def test_memo_evicts_the_least_recently_used_result():
+    CALLS.clear()
+    pipeline = Pipeline([stage("double", ["y"])], ["x"], memo_size=2)
+    try:
+        for x in (1, 2, 1, 3, 1, 2):
+            assert pipeline.run({"x": x})["y"] == x * 2
+    finally:
+        pipeline.shutdown()
+    # 2 was the least recently used when 3 came in
+    assert CALLS == [1, 2, 3, 2]
+    assert len(pipeline.memo) == 2
+
+
+def test_definitions_are_validated_up_front():
+    with pytest.raises(PipelineError, match="Cycle"):
+        Pipeline([stage("left", ["l"], ["r"]), stage("right", ["r"], ["l"])], ["x"])
+    with pytest.raises(PipelineError, match="nobody produces"):
+        Pipeline([stage("join", ["total"], ["l", "r"])], ["x"])
+    with pytest.raises(PipelineError, match="already produced"):
+        Pipeline([stage("left", ["l"]), stage("right", ["l"])], ["x"])
+    with pytest.raises(PipelineError, match="unknown executor"):
+        Pipeline([stage("left", ["l"], executor="gpu")], ["x"])
+    with pytest.raises(PipelineError, match="Missing pipeline inputs"):
+        run(Pipeline([stage("double", ["y"])], ["x"]), {})
+
+
+def test_process_and_asyncio_executors():
+    pipeline = Pipeline([stage("pid", ["pid"], executor="process"), stage("slow_async", ["a"]),
+                         stage("double", ["y"], cache=False)], ["x"], executor="asyncio", max_workers=1)
+    values = run(pipeline, {"x": 4})
+    assert values["pid"] != os.getpid()
+    assert values["a"] == 4 and values["y"] == 8
+
+
+def test_failing_stage_cancels_its_siblings_and_stops_the_run():
+    CALLS.clear()
+    CANCELLED.clear()
+    events = []
+    pipeline = Pipeline([stage("sibling", ["s"]), stage("explode", ["e"]), stage("after_explode", ["f"], ["e"])],
+                        ["x"], executor="asyncio")
+    with pytest.raises(PipelineError, match="Stage 'explode' failed: boom"):
+        run(pipeline, {"x": 1}, events)
+    assert CANCELLED == ["sibling"]
+    assert "after" not in CALLS
+    assert [e["stage"] for e in events if e["type"] == "stage_failed"] == ["explode"]
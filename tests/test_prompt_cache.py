@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+import prompt_cache
+from llm_usage import UsageLedger, record_response
+from prompt_cache import (cache_report, cacheable_tokens, cross_issue_prefix_tokens, prefix_messages,
+                          trajectory_prefix_stats)
+
+SYSTEM = "You are a careful engineer. " * 300
+
+
+def write_traj(path, prompts):
+    steps = [{"messages": [{"role": "system", "content": SYSTEM}, {"role": "user", "content": prompt}]}
+             for prompt in prompts]
+    path.write_text(json.dumps({"trajectory": steps}))
+    return str(path)
+
+
+def test_static_text_comes_first_and_drift_is_reported(monkeypatch, capsys):
+    monkeypatch.setattr(prompt_cache, "_prefix_hashes", {})
+    messages = prefix_messages("analyzer", "system", "file tree", "issue 1")
+    assert messages == [{"role": "system", "content": "system"}, {"role": "user", "content": "file tree\n\nissue 1"}]
+    prefix_messages("analyzer", "system", "file tree", "issue 2")
+    assert "changed" not in capsys.readouterr().out
+    prefix_messages("analyzer", "system (edited)", "", "issue 3")
+    assert "Static prompt prefix for analyzer changed" in capsys.readouterr().out
+
+
+def test_only_whole_cache_increments_above_the_minimum_count():
+    assert cacheable_tokens(1023) == 0
+    assert cacheable_tokens(1024) == 1024
+    assert cacheable_tokens(1024 + 127) == 1024
+    assert cacheable_tokens(1024 + 300) == 1024 + 256
+
+
+def test_trajectory_steps_reuse_the_previous_prompt_as_prefix(tmp_path):
+    stats = trajectory_prefix_stats(write_traj(tmp_path / "a.traj", ["step one", "step one, step two"]))
+    assert stats["calls"] == 2
+    # The second call repeats the first one's ~2000-token prompt, the first has nothing to reuse
+    assert stats["cacheable_tokens"] == cacheable_tokens(len(f"<system>{SYSTEM}<user>step one") // 4)
+    assert 0.4 < stats["hit_ratio"] < 0.5 and stats["saved"] > 0
+    other = write_traj(tmp_path / "b.traj", ["another issue"])
+    assert cross_issue_prefix_tokens([str(tmp_path / "a.traj"), other]) == len(f"<system>{SYSTEM}<user>") // 4
+
+
+def test_cached_tokens_from_responses_are_reported_per_stage(monkeypatch):
+    ledger = UsageLedger()
+    monkeypatch.setattr("llm_usage.LEDGER", ledger)
+    usage = SimpleNamespace(prompt_tokens=2000, completion_tokens=50,
+                            prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+    record_response("revisor", "gpt-4o", SimpleNamespace(usage=usage))
+    assert record_response("revisor", "gpt-4o", SimpleNamespace()) is None
+    row = cache_report(ledger).splitlines()[1].split()
+    assert row[:4] == ["revisor", "1", "2000", "1536"] and row[4] == "77%"
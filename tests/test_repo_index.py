@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import repo_index
+
+
+def test_rebuild_keeps_mapped_views_valid_and_reopens(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("x = 1\n" * 1000)
+    index_path = repo_index.build_index(str(repo))
+    old = repo_index.open_index(index_path)
+
+    (repo / "a.py").write_text("y = 2\n")
+    repo_index.build_index(str(repo))
+    # The old mapping still reads its own build instead of a truncated file
+    assert old.text("a.py") == "x = 1\n" * 1000
+    new = repo_index.open_index(index_path)
+    assert new is not old and new.text("a.py") == "y = 2\n"
+    assert not [p.name for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+    # The index lives next to the checkout, not in it
+    assert index_path == str(tmp_path / "repo.swe_index") and sorted(p.name for p in repo.iterdir()) == ["a.py"]
+
+
+def test_mismatched_sidecar_and_blob_are_detected(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("x = 1\n")
+    index_path = repo_index.build_index(str(repo))
+    meta_path = tmp_path / "repo.swe_index.json"
+    meta = json.loads(meta_path.read_text())
+    meta_path.write_text(json.dumps(dict(meta, build="0" * 32)))
+    monkeypatch.setattr(repo_index, "OPEN_ATTEMPTS", 2)
+    with pytest.raises(OSError, match="being rebuilt"):
+        repo_index.RepoIndex(index_path)
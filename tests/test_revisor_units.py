@@ -0,0 +1,86 @@
+import json
+import threading
+
+import pytest
+
+from orchestrator import Revisor
+
+PATCH = """diff --git a/new.py b/new.py
+new file mode 100644
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1,2 @@
++def added():
++    return 1
+diff --git a/pkg/old.py b/pkg/old.py
+--- a/pkg/old.py
++++ b/pkg/old.py
+@@ -2,2 +2,2 @@
+-x = 1
++x = 2
+ y = 3
+@@ -10,1 +10,1 @@
+-z = 4
++z = 5
+"""
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """User prompts the revisor sends, answered with an approval"""
+    sent, lock = [], threading.Lock()
+
+    def fake_call(self, messages, max_tokens=1000):
+        with lock:
+            sent.append(messages[-1]["content"])
+        return json.dumps({"status": "APPROVED", "confidence": 0.9, "reason": "ok",
+                           "issues_found": [], "suggestions": []})
+
+    monkeypatch.setattr(Revisor, "_call_gpt", fake_call)
+    return sent
+
+
+def unit_diff(prompt):
+    return prompt.split("CODE PATCH (this part only):\n", 1)[1].split("\n\nSURROUNDING SOURCE", 1)[0]
+
+
+def test_hunk_units_carry_both_file_headers(prompts):
+    result = Revisor().review_patch_units("Fix x", PATCH, unit="hunk")
+    assert result["status"] == "APPROVED" and len(result["units"]) == 3
+    diffs = sorted(unit_diff(prompt) for prompt in prompts)
+    assert diffs[0].startswith("--- /dev/null\n+++ b/new.py\n@@ -0,0 +1,2 @@")
+    second_hunk = next(d for d in diffs if "@@ -10,1" in d)
+    assert second_hunk.startswith("--- a/pkg/old.py\n+++ b/pkg/old.py\n@@ -10,1 +10,1 @@")
+    assert all("a/None" not in d for d in diffs)
+
+
+def test_units_show_numbered_source_around_the_hunk(prompts, tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "old.py").write_text("".join(f"line{n}\n" for n in range(1, 31)))
+    Revisor().review_patch_units("Fix x", PATCH, repo_dir=str(tmp_path), unit="file", context_lines=2)
+    old = next(prompt for prompt in prompts if "b/pkg/old.py" in prompt)
+    # Both hunks of the file, each with two lines of context either side
+    assert "--- pkg/old.py lines 1-5\n     1: line1\n" in old and "    12: line12\n" in old
+    new = next(prompt for prompt in prompts if "b/new.py" in prompt)
+    assert "(not available)" in new
+
+
+def test_units_are_coalesced_to_fit_the_token_budget(prompts):
+    hunks = "".join(f"@@ -{n * 10},1 +{n * 10},1 @@\n-a{n}\n+b{n}\n" for n in range(1, 41))
+    patch = f"diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n{hunks}"
+    result = Revisor().review_patch_units("Fix", patch, unit="hunk", max_total_tokens=6000)
+    assert 1 < len(prompts) < 40
+    # Every hunk is still reviewed, in some unit
+    assert all(f"+b{n}\n" in "".join(prompts) for n in range(1, 41))
+    assert len(result["units"]) == len(prompts)
+
+
+def test_one_unit_needing_a_fix_rejects_the_patch():
+    verdicts = [{"unit": "a.py", "status": "APPROVED", "confidence": 0.9, "reason": "fine"},
+                {"unit": "b.py", "status": "NEEDS_FIX", "confidence": 0.7, "reason": "breaks b",
+                 "issues_found": ["b() returns None"]},
+                {"unit": "c.py", "status": "ERROR", "confidence": 0.0, "reason": "parse"}]
+    merged = Revisor._merge_verdicts(verdicts)
+    assert merged["status"] == "NEEDS_FIX" and merged["confidence"] == 0.7
+    assert merged["reason"] == "b.py: breaks b" and merged["issues_found"] == ["b() returns None"]
+    assert Revisor._merge_verdicts([dict(verdicts[2])])["status"] == "ERROR"
@@ -0,0 +1,52 @@
+import json
+
+from router import ModelRouter, difficulty_score, issue_signals, load_history, repo_key_from_instance
+
+TRACEBACK = ('load_config crashes on an empty file\nTraceback (most recent call last):\n'
+             '  File "configlib/loader.py", line 12, in load_config\nTypeError: NoneType')
+FILES = ["configlib/loader.py", "configlib/__init__.py", "README.md"]
+
+
+def write_traj(path, exit_status, submission="", cost=0.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"info": {"exit_status": exit_status, "submission": submission,
+                                         "model_stats": {"instance_cost": cost}}}))
+
+
+def test_history_is_grouped_by_repository(tmp_path):
+    assert repo_key_from_instance("octo__config-lib-i22") == "octo/config-lib"
+    write_traj(tmp_path / "run1" / "octo__lib-i1.traj", "submitted", "diff", 0.5)
+    write_traj(tmp_path / "run2" / "octo__lib-i2.traj", "exit_cost", "", 0.25)
+    # A submitted run without a patch does not count as a success
+    write_traj(tmp_path / "run2" / "octo__lib-i3.traj", "submitted", "", 0.25)
+    assert load_history(str(tmp_path)) == {"octo/lib": {"runs": 3, "submitted": 1, "cost": 1.0}}
+
+
+def test_a_pinpointed_traceback_routes_to_the_small_tier(tmp_path):
+    router = ModelRouter(stats_file=None)
+    easy = router.route(TRACEBACK, FILES, "octo/lib")
+    assert easy["signals"]["has_traceback"] and easy["signals"]["candidates"] == 1
+    assert easy["tiers"] == {"analyzer": "small", "swe_agent": "small", "revisor": "large"}
+
+    vague = router.route("Something is off sometimes. " * 200, [f"src/m{n}.py" for n in range(6000)], "octo/lib")
+    assert vague["score"] > easy["score"]
+    assert vague["tiers"] == {"analyzer": "large", "swe_agent": "large", "revisor": "large"}
+    assert router.escalation("small") == ["small", "large"] and router.escalation("large") == ["large"]
+
+
+def test_a_repository_that_keeps_failing_looks_harder():
+    signals = issue_signals(TRACEBACK, FILES, {"runs": 4, "submitted": 0, "cost": 1.0})
+    assert signals["repo_success_rate"] == 0.0
+    assert difficulty_score(signals) > difficulty_score(dict(signals, repo_success_rate=1.0))
+
+
+def test_outcomes_are_persisted_per_stage_and_tier(tmp_path):
+    stats = tmp_path / "router_stats.json"
+    router = ModelRouter(stats_file=str(stats))
+    router.record_outcome("swe_agent", "small", 0.1, approved=False)
+    router.record_outcome("swe_agent", "large", 0.5, approved=True)
+    reloaded = ModelRouter(stats_file=str(stats))
+    assert reloaded.stats["swe_agent"]["small"] == {"attempts": 1, "approved": 0, "cost": 0.1}
+    assert reloaded.stats["swe_agent"]["large"]["approved"] == 1
+    report = reloaded.report().splitlines()
+    assert report[1].split()[:4] == ["swe_agent", "small", "1", "0"]
@@ -0,0 +1,110 @@
+import json
+import textwrap
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import distributed
+import service
+from job_queue import JobQueue
+from pipeline import load_pipeline
+
+STAGES = '''
+def solve(issue_url, run_id, base_commit):
+    return {"patch": f"patch for {issue_url.rsplit('/', 1)[1]}", "commit": base_commit}
+'''
+
+PIPELINE = '''
+name: "fake"
+inputs: [issue_url, run_id, base_commit]
+stages:
+  - name: "solve"
+    function: "service_stages:solve"
+    inputs: ["issue_url", "run_id", "base_commit"]
+    outputs: ["patch", "commit"]
+'''
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch, request):
+    """Service on a free port; parametrize with the number of workers (0 = coordinator only)"""
+    (tmp_path / "service_stages.py").write_text(textwrap.dedent(STAGES))
+    (tmp_path / "pipeline.yaml").write_text(textwrap.dedent(PIPELINE))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delenv("SWE_ARTIFACT_STORE", raising=False)
+    # Issue contexts are GitHub's business, not the API's
+    monkeypatch.setattr(distributed, "prefetch_issue_contexts", lambda urls: 0)
+    monkeypatch.setattr(service, "prefetch_issue_contexts", lambda urls: 0)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    svc = service.Service(queue, load_pipeline(str(tmp_path / "pipeline.yaml")), workers=getattr(request, "param", 1))
+    svc.start()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), service.make_handler(svc))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", queue
+    server.shutdown()
+    server.server_close()
+    svc.stop()
+
+
+def call(base, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(base + path, data=data, method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            raw = response.read().decode("utf-8")
+            status = response.status
+    except urllib.error.HTTPError as e:
+        raw, status = e.read().decode("utf-8"), e.code
+    if path.split("?")[0].endswith("/events"):
+        return status, [json.loads(line) for line in raw.splitlines()]
+    return status, json.loads(raw)
+
+
+def wait_done(base, job_id):
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        job = call(base, f"/jobs/{job_id}")[1]
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_poll_and_follow_events(api):
+    base, _ = api
+    status, job = call(base, "/jobs", {"issue_url": "https://github.com/o/r/issues/1"})
+    assert status == 202 and job["status"] == "queued"
+    # The stream stays open until the job ends, then holds every stage event
+    status, events = call(base, f"/jobs/{job['id']}/events?follow=1")
+    assert status == 200
+    assert [e["type"] for e in events if e.get("stage") == "solve"] == ["stage_started", "stage_finished"]
+    done = wait_done(base, job["id"])
+    assert done["status"] == "done" and done["result"]["patch"] == "patch for 1"
+    # since= skips events already read
+    assert call(base, f"/jobs/{job['id']}/events?since={events[-1]['seq']}")[1] == []
+
+
+def test_batch_items_keep_their_payload(api):
+    base, _ = api
+    status, jobs = call(base, "/jobs/batch", {"issue_urls": [
+        "https://github.com/o/r/issues/2",
+        {"issue_url": "https://github.com/o/r/issues/3", "payload": {"base_commit": "c0ffee"}}]})
+    assert status == 202
+    results = [wait_done(base, job["id"])["result"] for job in jobs]
+    assert [r["commit"] for r in results] == ["", "c0ffee"]
+    assert call(base, "/jobs/batch", {"issue_urls": [{"payload": {}}]})[0] == 400
+
+
+@pytest.mark.parametrize("api", [0], indirect=True)
+def test_cancel_only_applies_to_queued_jobs(api):
+    base, queue = api
+    _, job = call(base, "/jobs", {"issue_url": "https://github.com/o/r/issues/4"})
+    status, cancelled = call(base, f"/jobs/{job['id']}/cancel", {})
+    assert status == 200 and cancelled["status"] == "cancelled"
+    assert call(base, f"/jobs/{job['id']}/cancel", {})[0] == 409
+    assert call(base, "/jobs/missing")[0] == 404
+    assert call(base, "/health")[1]["jobs"] == {"cancelled": 1}
@@ -0,0 +1,73 @@
+import json
+
+from multiagents import SpeakerStateMachine
+
+ANALYSIS = '{"filepath": "src/pkg/core.py", "problem_statement": "parse() drops the last field"}'
+PATCH = """--- a/src/pkg/core.py
++++ b/src/pkg/core.py
+@@ -1,2 +1,2 @@
+ def parse(line):
+-    return line.split(",")[:-1]
++    return line.split(",")
+"""
+
+
+class Agent:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeGroupChat:
+    def __init__(self):
+        self.messages = []
+        self.agents = {name: Agent(name) for name in ("user", "analyzer", "swe_agent", "reviser")}
+
+    def agent_by_name(self, name):
+        return self.agents[name]
+
+
+def test_analyzer_hands_over_only_a_complete_analysis(tmp_path):
+    machine = SpeakerStateMachine(output_dir=str(tmp_path))
+    assert machine.next_speaker("user", {"content": "Fix issue #7"}) == "analyzer"
+    assert machine.next_speaker("analyzer", {"content": '{"filepath": "src/pkg/core.py"}'}) == "analyzer"
+    assert machine.next_speaker("analyzer", {"content": f"Here it is:\n{ANALYSIS}"}) == "swe_agent"
+    assert json.loads((tmp_path / "analyzer_output.json").read_text())["filepath"] == "src/pkg/core.py"
+
+
+def test_tool_calls_and_responses_return_to_the_caller():
+    machine = SpeakerStateMachine()
+    call = {"content": "", "tool_calls": [{"function": {"name": "view_file"}}]}
+    assert machine.next_speaker("analyzer", call) == "analyzer"
+    assert machine.next_speaker("swe_agent", {"role": "tool", "content": "1: def parse"}) == "swe_agent"
+    assert machine.next_speaker("swe_agent", {"content": "", "tool_responses": [{}]}) == "swe_agent"
+    assert machine.analysis is None
+
+
+def test_swe_agent_loops_until_a_patch_then_reviser_decides(tmp_path):
+    machine = SpeakerStateMachine(output_dir=str(tmp_path))
+    assert machine.next_speaker("swe_agent", {"content": "Let me look at the file first."}) == "swe_agent"
+    assert machine.next_speaker("swe_agent", {"content": f"```diff\n{PATCH}```"}) == "reviser"
+    assert machine.patch["filepath"] == "src/pkg/core.py"
+    assert json.loads((tmp_path / "swe_agent_output.json").read_text())["patch"]
+    assert machine.next_speaker("reviser", {"content": "The hunk context is wrong."}) == "swe_agent"
+    assert not machine.approved
+    assert machine.next_speaker("reviser", {"content": "LGTM"}) is None
+    assert machine.approved
+
+
+def test_call_selects_agents_and_records_transition_metrics():
+    machine, chat = SpeakerStateMachine(), FakeGroupChat()
+    turns = [("user", "Fix issue #7"), ("analyzer", ANALYSIS), ("swe_agent", PATCH), ("reviser", "👍")]
+    chosen = []
+    for speaker, content in turns:
+        chat.messages.append({"name": speaker, "content": content})
+        agent = machine(chat.agent_by_name(speaker), chat)
+        chosen.append(agent.name if agent else None)
+    assert chosen == ["analyzer", "swe_agent", "reviser", None]
+
+    metrics = machine.metrics()
+    assert metrics["rounds"] == 4 and metrics["approved"]
+    # The first turn has no start time, so only the three timed hand-overs are recorded
+    assert set(metrics["transitions"]) == {"analyzer->swe_agent", "swe_agent->reviser", "reviser->end"}
+    for stats in metrics["transitions"].values():
+        assert stats["count"] == 1 and stats["mean"] == stats["total"] == stats["max"]
@@ -0,0 +1,37 @@
+import stages
+from fix_memory import FixMemory
+from issue_dedup import IssueIndex
+
+STATEMENT = ("Calling the client with a timeout raises an exception. Steps to reproduce: install the package, "
+             "run the example with a timeout of five seconds and see the traceback in the console output.")
+
+
+def test_approved_issue_is_found_by_the_next_run_of_a_duplicate(tmp_path, monkeypatch):
+    monkeypatch.setattr(stages, "_issue_index", IssueIndex(str(tmp_path / "index")))
+    monkeypatch.setattr(stages, "_fix_memory", FixMemory(str(tmp_path / "memory")))
+    first = "https://github.com/a/one/issues/1"
+    assert stages.find_duplicate(first, "a", "one", STATEMENT) == {"duplicate": None}
+    status = stages.record_issue(first, STATEMENT, "client.py", "timeout ignored", "--- a/client.py\n+++ b/client.py\n",
+                                 {"status": "APPROVED"})
+    assert status == {"issue_status": "approved"}
+    # A later run of the same issue records its analysis without losing the approved patch
+    stages.record_issue(first, STATEMENT, "client.py", "timeout ignored", "", {"status": "ERROR"})
+
+    duplicate = stages.find_duplicate("https://github.com/a/one/issues/2", "a", "one", STATEMENT)["duplicate"]
+    assert duplicate["issue_url"] == first and duplicate["patch"].startswith("--- a/client.py")
+    assert stages.guess_file(STATEMENT, ["client.py", "session.py"], duplicate) == {"filepath": "client.py"}
+    assert stages.first_guess(STATEMENT, "client.py", [], duplicate) == {"first_guess": "timeout ignored"}
+    # The approved patch is offered to later runs of other issues, not to the issue itself
+    assert stages.recall_fixes(first, STATEMENT) == {"fix_examples": ""}
+    examples = stages.recall_fixes("https://github.com/a/one/issues/2", STATEMENT)["fix_examples"]
+    assert "patch approved by the reviewer" in examples and "+++ b/client.py" in examples
+
+
+def test_tree_and_review_use_the_base_commit(monkeypatch):
+    calls = []
+    monkeypatch.setattr(stages, "fetch_repo_tree", lambda owner, repo, ref: calls.append(ref) or ["a.py"])
+    monkeypatch.setattr(stages, "run_revisor", lambda data: {"status": "APPROVED", "repo_dir": data["repo_dir"]})
+    stages.fetch_tree("o", "r", "c0ffee")
+    stages.fetch_tree("o", "r", "")
+    assert calls == ["c0ffee", "HEAD"]
+    assert stages.review(STATEMENT, "--- a/a.py\n+++ b/a.py\n", "/ws/o__r/c0ffee")["review"]["repo_dir"] == "/ws/o__r/c0ffee"
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+import github_tools
+from github_tools import ToolStats, register_tools, tool
+from tool_cache import ToolResultCache, ToolSession
+
+
+class FakeAgent:
+    def __init__(self, name):
+        self.name = name
+        self.for_llm, self.for_execution = {}, {}
+
+    def register_for_llm(self, name, description):
+        def decorator(function):
+            self.for_llm[name] = (function, description)
+            return function
+        return decorator
+
+    def register_for_execution(self, name):
+        def decorator(function):
+            self.for_execution[name] = function
+            return function
+        return decorator
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(github_tools, "TOOLS", {})
+    monkeypatch.setattr(github_tools, "TOOL_STATS", ToolStats())
+    calls = []
+
+    @tool("Echo a word")
+    def echo(word: str, times: int = 1) -> str:
+        calls.append(word)
+        return " ".join([word] * times)
+
+    @tool("Always fails")
+    def broken(path: str) -> str:
+        return f"Error reading {path}"
+
+    return calls
+
+
+def test_tools_are_registered_by_name_and_timed(registry):
+    assert sorted(github_tools.TOOLS) == ["broken", "echo"]
+    echo = github_tools.TOOLS["echo"]["function"]
+    assert echo.__name__ == "echo" and echo("hi", times=2) == "hi hi"
+    github_tools.TOOLS["broken"]["function"]("a.py")
+    stats = github_tools.TOOL_STATS.calls
+    assert (stats["echo"]["calls"], stats["echo"]["errors"]) == (1, 0)
+    assert (stats["broken"]["calls"], stats["broken"]["errors"]) == (1, 1)
+    report = github_tools.TOOL_STATS.report().splitlines()
+    assert report[0].split()[:3] == ["tool", "calls", "errors"] and len(report) == 3
+
+
+def test_register_tools_exposes_the_chosen_tools_to_caller_and_executor(registry):
+    caller, executor = FakeAgent("swe_agent"), FakeAgent("user")
+    register_tools(caller, executor, names=["echo"])
+    assert list(caller.for_llm) == ["echo"] and list(executor.for_execution) == ["echo"]
+    assert caller.for_llm["echo"][1] == "Echo a word"
+    # Without an executor the caller runs its own tools
+    agent = FakeAgent("analyzer")
+    register_tools(agent)
+    assert sorted(agent.for_execution) == sorted(agent.for_llm) == ["broken", "echo"]
+
+
+def test_asynchronous_tools_run_in_a_worker_thread(registry):
+    agent = FakeAgent("analyzer")
+    register_tools(agent, names=["echo"], asynchronous=True)
+    function = agent.for_execution["echo"]
+    assert asyncio.iscoroutinefunction(function)
+    assert asyncio.run(function("hey")) == "hey"
+
+
+def test_a_session_memoises_calls_and_adds_read_tool_result(registry):
+    agent = FakeAgent("swe_agent")
+    session = ToolSession(cache=ToolResultCache(), commit_for=lambda arguments: "c0ffee")
+    register_tools(agent, names=["echo"], session=session)
+    assert sorted(agent.for_llm) == ["echo", "read_tool_result"]
+    echo = agent.for_execution["echo"]
+    assert echo("hi") == "hi"
+    repeated = echo(word="hi", times=1)
+    assert "already answered" in repeated
+    assert registry == ["hi"] and session.stats["deduplicated"] == 1
+    handle = repeated.split("read_tool_result('")[1].split("'")[0]
+    assert agent.for_execution["read_tool_result"](handle) == "hi"
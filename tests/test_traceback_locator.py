@@ -0,0 +1,53 @@
+from traceback_locator import locate_crash_site
+
+TREE = ["src/pkg/__init__.py", "src/pkg/core.py", "src/pkg/utils.py", "tests/test_core.py", "json.py",
+        "src/requests/__init__.py", "src/requests/models.py", "cli.py"]
+
+
+def traceback(*frames, error="ValueError: bad value"):
+    lines = ["Traceback (most recent call last):"]
+    lines += [f'  File "{path}", line {line}, in {func}' for path, line, func in frames]
+    return "\n".join(lines + [error])
+
+
+def test_repository_frame_with_directory_match_is_confident():
+    text = traceback(("/home/me/checkout/tests/test_core.py", 10, "test_parse"),
+                     ("/home/me/checkout/src/pkg/core.py", 42, "parse"))
+    site = locate_crash_site(text, TREE)
+    assert site["filepath"] == "src/pkg/core.py" and site["line"] == 42
+    assert site["confident"]
+
+
+def test_unique_file_name_alone_is_not_confident():
+    site = locate_crash_site(traceback(("/tmp/elsewhere/utils.py", 3, "helper")), TREE)
+    assert site["filepath"] == "src/pkg/utils.py"
+    assert not site["confident"]
+
+
+def test_installed_package_frames_map_onto_the_tree():
+    text = traceback(("/home/me/app.py", 3, "main"),
+                     ("/venv/lib/python3.11/site-packages/requests/api.py", 59, "request"),
+                     ("/venv/lib/python3.11/site-packages/requests/models.py", 370, "prepare_url"),
+                     error="requests.exceptions.InvalidURL: Invalid URL")
+    site = locate_crash_site(text, TREE)
+    assert site["filepath"] == "src/requests/models.py" and site["line"] == 370
+    assert site["confident"]
+    # Windows and dist-packages layouts reduce to the same import path
+    for path in ("C:\\Python311\\Lib\\site-packages\\requests\\models.py",
+                 "/usr/lib/python3/dist-packages/requests/models.py"):
+        assert locate_crash_site(traceback((path, 370, "prepare_url")), TREE)["filepath"] == "src/requests/models.py"
+
+
+def test_root_level_module_can_be_confident():
+    site = locate_crash_site(traceback(("/home/me/checkout/cli.py", 12, "main")), TREE)
+    assert site["filepath"] == "cli.py" and site["confident"]
+
+
+def test_unmatched_installed_package_and_stdlib_frames_are_ignored():
+    text = traceback(("/home/me/checkout/src/pkg/core.py", 42, "parse"),
+                     ("/usr/lib/python3.11/json.py", 7, "loads"),
+                     ("/venv/lib/python3.11/site-packages/other/pkg/utils.py", 99, "helper"),
+                     ("C:\\Python311\\Lib\\json.py", 7, "loads"))
+    site = locate_crash_site(text, TREE)
+    assert [frame["repo_path"] for frame in site["frames"]] == ["src/pkg/core.py"]
+    assert site["confident"]
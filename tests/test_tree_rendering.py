@@ -0,0 +1,64 @@
+import pytest
+
+import github_tools
+from github_tools import _render, _tree, get_repository_structure
+
+PATHS = ["setup.py", "README.md", "src/pkg/__init__.py", "src/pkg/core.py", "src/pkg/io/read.py",
+         "tests/test_core.py", "tests/conftest.py", "docs/index.rst"] + \
+        [f"node_modules/lib{n}/index.js" for n in range(5)]
+
+
+class FakeService:
+    def __init__(self, paths):
+        self.paths = paths
+
+    def file_paths(self):
+        return sorted(self.paths)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fake = FakeService(PATHS)
+    monkeypatch.setattr(github_tools, "get_repo_service", lambda owner, repo: fake)
+    return fake
+
+
+def test_render_lists_directories_first_and_summarises_below_depth():
+    tree = _tree(["b.py", "a/x.py", "a/deep/y.py", "a/deep/z.txt"])
+    assert _render(tree, 3) == ["a/", "  deep/", "    y.py", "    z.txt", "  x.py", "b.py"]
+    assert _render(tree, 2) == ["a/", "  deep/ (2 files: .py 1, .txt 1)", "  x.py", "b.py"]
+    assert _render(tree, 1) == ["a/ (3 files: .py 2, .txt 1)", "b.py"]
+
+
+def test_vendored_and_huge_directories_are_one_line(monkeypatch):
+    tree = _tree(["node_modules/a/i.js", "node_modules/b/i.js", "big/1.py", "big/2.py", "big/3.py"])
+    monkeypatch.setattr(github_tools, "COLLAPSE_THRESHOLD", 2)
+    assert _render(tree, 5) == ["big/ (3 files: .py 3)", "node_modules/ (2 files: .js 2)"]
+
+
+def test_whole_tree_fits_the_budget(service):
+    out = get_repository_structure("o", "r").splitlines()
+    assert out[0] == f"o/r:/ - {len(PATHS)} file(s)"
+    assert "      read.py" in out and "node_modules/ (5 files: .js 5)" in out
+
+
+def test_a_small_budget_keeps_the_deepest_listing_that_fits(service):
+    two_levels = _render(_tree(PATHS), 2)
+    budget = github_tools.estimate_tokens("\n".join(two_levels))
+    assert budget < github_tools.estimate_tokens("\n".join(_render(_tree(PATHS), 3)))
+    assert get_repository_structure("o", "r", max_tokens=budget).splitlines()[1:] == two_levels
+    assert get_repository_structure("o", "r", max_depth=2).splitlines()[1:] == two_levels
+    assert "  pkg/ (3 files: .py 3)" in two_levels
+
+
+def test_listing_over_budget_at_depth_one_is_truncated(service):
+    out = get_repository_structure("o", "r", max_tokens=5)
+    assert "truncated" in out and out.startswith("o/r:/ - 13 file(s)")
+
+
+def test_path_and_pattern_filters(service):
+    out = get_repository_structure("o", "r", path="src/pkg/", pattern="*.py").splitlines()
+    assert out == ["o/r:src/pkg - 3 file(s) matching '*.py'", "io/", "  read.py", "__init__.py", "core.py"]
+    tests = get_repository_structure("o", "r", pattern="tests/*,*.md").splitlines()
+    assert tests[1:] == ["tests/", "  conftest.py", "  test_core.py", "README.md"]
+    assert get_repository_structure("o", "r", pattern="*.go") == "No files under '/' matching '*.go'"
@@ -0,0 +1,25 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import verify_preds
+
+READ_LIMITS = "import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0], resource.getrlimit(resource.RLIMIT_CORE)[0])"
+
+
+def test_sandbox_limits_apply_to_commands_started_from_threads(tmp_path):
+    memory = verify_preds.SANDBOX_MEMORY_MB * 1024 * 1024
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: verify_preds.sandboxed([sys.executable, "-c", READ_LIMITS],
+                                                                 str(tmp_path), 30), range(8)))
+    assert results == [(0, f"{memory} 0\n")] * 8
+
+
+def test_sandbox_memory_limit_stops_large_allocations(tmp_path, monkeypatch):
+    monkeypatch.setattr(verify_preds, "SANDBOX_MEMORY_MB", 512)
+    code, output = verify_preds.sandboxed([sys.executable, "-c", "x = bytearray(1024 ** 3)"], str(tmp_path), 30)
+    assert code != 0 and "MemoryError" in output
+
+
+def test_sandbox_timeout_kills_the_command(tmp_path):
+    code, _ = verify_preds.sandboxed([sys.executable, "-c", "import time; time.sleep(30)"], str(tmp_path), 0.5)
+    assert code is None
@@ -0,0 +1,87 @@
+import pytest
+
+import github_tools
+
+SOURCE = '''import os
+
+
+class Parser:
+    """Splits lines"""
+
+    def parse(self, line):
+        return line.split(",")
+
+    def close(self):
+        pass
+
+
+def helper():
+    return os.sep
+'''
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    checkout = tmp_path / "o__r"
+    (checkout / ".git").mkdir(parents=True)
+    (checkout / "pkg").mkdir()
+    (checkout / "pkg" / "core.py").write_text(SOURCE)
+    (checkout / "long.txt").write_text("".join(f"line {n} TODO\n" if n % 50 == 0 else f"line {n}\n"
+                                               for n in range(1, 501)))
+    (checkout / "logo.png").write_bytes(b"\x89PNG\x00\x00\x01")
+    monkeypatch.setattr(github_tools, "REPO_CACHE_DIR", str(tmp_path))
+    service = github_tools.RepoService("o", "r")
+
+    def offline():
+        raise ConnectionError("no network in tests")
+
+    monkeypatch.setattr(service, "commit", offline)
+    monkeypatch.setattr(github_tools, "get_repo_service", lambda owner, repo: service)
+    return service
+
+
+def view(**kwargs):
+    return github_tools.view_file("o", "r", **kwargs)
+
+
+def test_line_range_is_numbered_and_clamped(repo):
+    out = view(file_path="pkg/core.py", start_line=7, end_line=8)
+    assert out.splitlines() == ["--- pkg/core.py lines 7-8 of 15 ---",
+                                "7 |     def parse(self, line):",
+                                "8 |         return line.split(\",\")"]
+    # Leading "./" or "/" is accepted, and a range past the end stops at the last line
+    assert view(file_path="./pkg/core.py", start_line=14, end_line=99).startswith("--- pkg/core.py lines 14-15 of 15")
+    assert view(file_path="pkg/core.py", start_line=20) == "Error: pkg/core.py has only 15 lines"
+
+
+def test_default_and_maximum_window(repo):
+    first = view(file_path="long.txt").splitlines()
+    assert first[0] == f"--- long.txt lines 1-{github_tools.DEFAULT_VIEW_LINES} of 500 ---"
+    assert len(first) == github_tools.DEFAULT_VIEW_LINES + 1
+    capped = view(file_path="long.txt", start_line=1, end_line=500).splitlines()
+    assert capped[0].startswith(f"--- long.txt lines 1-{github_tools.MAX_VIEW_LINES} of 500; showing at most")
+    assert len(capped) == github_tools.MAX_VIEW_LINES + 1
+
+
+def test_symbol_shows_the_whole_definition(repo):
+    method = view(file_path="pkg/core.py", symbol="Parser.close")
+    assert method.splitlines()[0] == "--- pkg/core.py lines 10-11 of 15 ---"
+    assert view(file_path="pkg/core.py", symbol="Parser").splitlines()[0] == "--- pkg/core.py lines 4-11 of 15 ---"
+    assert view(file_path="pkg/core.py", symbol="missing") == "Error: symbol 'missing' not found in pkg/core.py"
+
+
+def test_search_shows_context_around_each_hit(repo):
+    out = view(file_path="pkg/core.py", search="os.sep", context=1)
+    assert out.splitlines() == ["--- pkg/core.py lines 14-15 (match at 15) ---",
+                                "14 | def helper():",
+                                "15 |     return os.sep"]
+    many = view(file_path="long.txt", search="todo", context=0)
+    headers = [line for line in many.splitlines() if line.startswith("---")]
+    assert len(headers) == github_tools.MAX_SEARCH_HITS
+    assert many.splitlines()[-1] == "... 5 more match(es) at lines 300, 350, 400, 450, 500"
+    assert view(file_path="pkg/core.py", search="nothing here") == "No matches for 'nothing here' in pkg/core.py (15 lines)"
+
+
+def test_missing_and_binary_files_are_errors(repo):
+    assert view(file_path="logo.png") == "Error: logo.png is not a text file in o/r"
+    assert view(file_path="nope.py").startswith("Error: nope.py is not a text file")
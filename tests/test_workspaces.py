@@ -0,0 +1,63 @@
+import subprocess
+
+import pytest
+
+from workspaces import WorkspaceManager
+
+
+def run(*args, cwd):
+    subprocess.run(args, cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Repository served over file:// with partial clone allowed, like GitHub"""
+    repo = tmp_path / "src"
+    (repo / "pkg").mkdir(parents=True)
+    run("git", "init", "-q", cwd=repo)
+    run("git", "config", "uploadpack.allowFilter", "true", cwd=repo)
+    run("git", "config", "uploadpack.allowAnySHA1InWant", "true", cwd=repo)
+    (repo / "a.py").write_text("a = 1\n")
+    (repo / "pkg" / "b.py").write_text("b = 2\n")
+    run("git", "add", ".", cwd=repo)
+    run("git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "one", cwd=repo)
+    (repo / "a.py").write_text("a = 3\n")
+    run("git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qam", "two", cwd=repo)
+    return f"file://{repo}"
+
+
+def assert_complete(path, expected_a):
+    status = subprocess.run(["git", "status", "--porcelain"], cwd=path, capture_output=True, text=True).stdout
+    assert status == ""
+    with open(f"{path}/a.py") as f:
+        assert f.read() == expected_a
+    with open(f"{path}/pkg/b.py") as f:
+        assert f.read() == "b = 2\n"
+
+
+def test_standalone_workspace_from_blobless_store_has_every_file(tmp_path, source):
+    manager = WorkspaceManager(str(tmp_path / "ws"), sources={"o/r": source})
+    path = manager.acquire("o", "r", "HEAD", standalone=True)
+    assert_complete(path, "a = 3\n")
+    older = manager.acquire("o", "r", "HEAD~1", standalone=True)
+    assert_complete(older, "a = 1\n")
+
+
+def test_head_follows_the_remote_between_acquires(tmp_path, source):
+    manager = WorkspaceManager(str(tmp_path / "ws"), sources={"o/r": source})
+    first = manager.acquire("o", "r", "HEAD")
+    assert_complete(first, "a = 3\n")
+    repo = tmp_path / "src"
+    (repo / "a.py").write_text("a = 5\n")
+    run("git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qam", "three", cwd=repo)
+    second = manager.acquire("o", "r", "HEAD")
+    assert_complete(second, "a = 5\n")
+    # Relative revisions resolve against the remote's head too
+    assert_complete(manager.acquire("o", "r", "HEAD~1"), "a = 3\n")
+
+
+def test_standalone_pristine_from_blobless_store_has_every_file(tmp_path, source):
+    manager = WorkspaceManager(str(tmp_path / "ws"), sources={"o/r": source})
+    path = manager.pristine("o", "r", "HEAD", standalone=True)
+    assert_complete(path, "a = 3\n")
+    assert manager.pristine("o", "r", "HEAD", standalone=True) == path
@@ -0,0 +1,163 @@
+"""
+Memoisation for agent tool calls.
+Results are keyed on (tool, arguments, repository commit). Within one
+conversation a repeated call is answered with a short reference instead of the
+same text again; across conversations a bounded LRU shared by the process
+serves repeat calls on the same commit. Long results are split into pages and
+only the first page goes into the context, the rest is read on demand with
+read_tool_result(handle, page).
+"""
+import functools
+import hashlib
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+PAGE_CHARS = 6000
+
+
+class ToolResultCache:
+    """Thread-safe LRU of tool results shared by every session in the process"""
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+SHARED_CACHE = ToolResultCache()
+
+
+def call_key(tool: str, arguments: Dict, commit: str = "") -> str:
+    payload = json.dumps({"tool": tool, "args": arguments, "commit": commit}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ToolSession:
+    """
+    Memo and pager for the tool calls of one conversation (one initiate_chat).
+    commit_for(arguments) returns the repository commit a call depends on, or
+    None when the call is not tied to a commit; only commit-bound results go
+    into the shared cache.
+    """
+    def __init__(self, cache: ToolResultCache = SHARED_CACHE, page_chars: int = PAGE_CHARS,
+                 commit_for: Optional[Callable[[Dict], Optional[str]]] = None):
+        self.cache = cache
+        self.page_chars = page_chars
+        self.commit_for = commit_for
+        self.results: Dict[str, str] = {}
+        self.seen: Dict[str, str] = {}
+        self.stats = {"calls": 0, "deduplicated": 0, "shared_hits": 0, "executed": 0}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start a new conversation; the shared cache is kept"""
+        with self._lock:
+            self.results.clear()
+            self.seen.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    # ---- paging ----------------------------------------------------------
+
+    def page(self, handle: str, page: int = 1) -> str:
+        with self._lock:
+            text = self.results.get(handle)
+        if text is None:
+            return f"Error: unknown tool result handle {handle}"
+        pages = max((len(text) + self.page_chars - 1) // self.page_chars, 1)
+        if not 1 <= page <= pages:
+            return f"Error: result {handle} has {pages} page(s), asked for page {page}"
+        chunk = text[(page - 1) * self.page_chars:page * self.page_chars]
+        if pages == 1:
+            return chunk
+        footer = f"\n[page {page}/{pages} of result {handle}"
+        if page < pages:
+            footer += f"; call read_tool_result('{handle}', {page + 1}) for more"
+        return chunk + footer + "]"
+
+    # ---- memoisation -----------------------------------------------------
+
+    def _commit(self, arguments: Dict) -> Optional[str]:
+        if self.commit_for is None:
+            return None
+        try:
+            return self.commit_for(arguments)
+        except Exception as e:
+            print(f"⚠️  Could not resolve repository commit for tool cache: {e}")
+            return None
+
+    def call(self, tool: str, func: Callable, arguments: Dict) -> str:
+        commit = self._commit(arguments)
+        key = call_key(tool, arguments, commit or "")
+        handle = "r" + key[:8]
+        with self._lock:
+            self.stats["calls"] += 1
+            repeated = key in self.seen
+            if repeated:
+                self.stats["deduplicated"] += 1
+        if repeated:
+            return (f"[Same call already answered earlier in this conversation as result {handle}; "
+                    f"call read_tool_result('{handle}', 1) to see it again]")
+
+        result = self.cache.get(key) if commit else None
+        if result is not None:
+            with self._lock:
+                self.stats["shared_hits"] += 1
+        else:
+            result = func(**arguments)
+            with self._lock:
+                self.stats["executed"] += 1
+            if commit and isinstance(result, str) and not result.startswith("Error"):
+                self.cache.put(key, result)
+
+        text = result if isinstance(result, str) else json.dumps(result, default=str)
+        with self._lock:
+            self.results[handle] = text
+            if not text.startswith("Error"):
+                self.seen[key] = handle
+        return self.page(handle, 1)
+
+    def wrap(self, tool: str, func: Callable) -> Callable:
+        """func with memoisation; the signature is kept so agents still see the real parameters"""
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return self.call(tool, func, dict(bound.arguments))
+        return wrapper
+
+    def read_tool_result(self, handle: str, page: int = 1) -> str:
+        """Return one page of an earlier tool result"""
+        return self.page(handle, page)
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"Tool cache: {s['calls']} call(s), {s['executed']} executed, {s['deduplicated']} deduplicated "
+                f"in conversation, {s['shared_hits']} served from the shared cache "
+                f"({len(self.cache.entries)}/{self.cache.max_entries} entries)")
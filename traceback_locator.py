@@ -0,0 +1,205 @@
+"""
+Local crash-site detection for issues that paste a Python traceback or pytest output.
+Frames are parsed from the text and their paths are mapped onto the repository
+listing. Installed-package frames (site-packages, dist-packages) are reduced to
+their import path, e.g. requests/models.py, which must match a repository path
+suffix in full, so reports pasted from an installed release still point into
+the tree; standard-library frames are dropped. Other paths (absolute, other
+checkouts) match by the longest common suffix. Frames are ranked by how close
+they are to the raise, and a confident match lets the analyzer skip the
+file-guess LLM call.
+
+Usage: python traceback_locator.py <issue_text_file> <tree_listing_file>
+"""
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+# File "/usr/lib/python3/site-packages/pkg/mod.py", line 12, in func
+PYTHON_FRAME = re.compile(r'File "(?P<path>[^"]+)", line (?P<line>\d+)(?:, in (?P<func>[^\s]+))?')
+# pkg/mod.py:12: in func      (pytest long traceback)
+# pkg/mod.py:12: ValueError   (pytest --tb=short/line crash line)
+PYTEST_FRAME = re.compile(r'^(?P<path>[\w./\\-]+\.py):(?P<line>\d+):(?: in (?P<func>\w+)| (?P<error>\w+(?:Error|Exception|Warning)\b))?',
+                          re.MULTILINE)
+EXCEPTION_LINE = re.compile(r'^(?:E\s+)?(?P<error>[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning))(?::\s*(?P<message>.*))?$',
+                            re.MULTILINE)
+TRACEBACK_START = re.compile(r"Traceback \(most recent call last\):")
+
+# Everything up to the import path of an installed package (the last site-packages/ wins)
+INSTALLED_PREFIX = re.compile(r"^(?:.*/)?(?:site|dist)-packages/")
+# Standard library (POSIX and Windows layouts)
+STDLIB_PATH = re.compile(r"(^|/)lib/python\d+(\.\d+)?/|^[A-Za-z]:/(.*/)?Lib/")
+TEST_PATH = re.compile(r"(^|/)(tests?|testing)/|(^|/)test_[^/]*\.py$|_test\.py$|(^|/)conftest\.py$")
+MIN_CONFIDENCE = 0.6
+
+
+def _parts(path: str) -> List[str]:
+    return [p for p in path.replace("\\", "/").split("/") if p and p != "."]
+
+
+class TreeMatcher:
+    """Maps paths from other machines onto repository paths by the longest common suffix"""
+    def __init__(self, file_paths: List[str]):
+        self.by_name: Dict[str, List[str]] = {}
+        for path in file_paths:
+            if path.endswith(".py"):
+                self.by_name.setdefault(os.path.basename(path), []).append(path)
+
+    def match(self, frame_path: str) -> Optional[tuple]:
+        """(repo path, matched components, candidates with that name) or None"""
+        parts = _parts(frame_path)
+        if not parts:
+            return None
+        candidates = self.by_name.get(parts[-1], [])
+        best, best_len = None, 0
+        for candidate in candidates:
+            cparts = _parts(candidate)
+            n = 0
+            while n < min(len(parts), len(cparts)) and parts[-1 - n] == cparts[-1 - n]:
+                n += 1
+            if n > best_len:
+                best, best_len = candidate, n
+        if best is None:
+            return None
+        return best, best_len, len(candidates)
+
+
+def parse_frames(text: str) -> List[Dict]:
+    """Frames in the order they appear; each traceback block gets its own id"""
+    frames = []
+    block = 0
+    events = []
+    for m in TRACEBACK_START.finditer(text):
+        events.append((m.start(), "start", m))
+    for m in PYTHON_FRAME.finditer(text):
+        events.append((m.start(), "python", m))
+    for m in PYTEST_FRAME.finditer(text):
+        events.append((m.start(), "pytest", m))
+    for m in EXCEPTION_LINE.finditer(text):
+        events.append((m.start(), "error", m))
+
+    current_error = None
+    for _, kind, m in sorted(events, key=lambda e: e[0]):
+        if kind == "start":
+            block += 1
+        elif kind == "error":
+            # The exception closes the block; attach it to that block's frames
+            current_error = m.group("error")
+            for frame in frames:
+                if frame["block"] == block and not frame["error"]:
+                    frame["error"] = current_error
+                    frame["message"] = (m.group("message") or "").strip()
+        elif frames and frames[-1]["block"] == block and frames[-1]["path"] == m.group("path") \
+                and frames[-1]["line"] == int(m.group("line")):
+            # pytest repeats the crash frame as "path:line: Error"; merge it into the frame above
+            frames[-1]["function"] = frames[-1]["function"] or m.group("func") or ""
+            if kind == "pytest" and m.group("error"):
+                frames[-1]["error"] = m.group("error")
+        else:
+            frames.append({
+                "block": block,
+                "kind": kind,
+                "path": m.group("path"),
+                "line": int(m.group("line")),
+                "function": m.group("func") or "",
+                "error": (m.groupdict().get("error") or "") if kind == "pytest" else "",
+                "message": "",
+            })
+    return frames
+
+
+def rank_frames(frames: List[Dict], file_paths: List[str]) -> List[Dict]:
+    """Repository frames scored by path-match quality and closeness to the raise"""
+    matcher = TreeMatcher(file_paths)
+    ranked = []
+    blocks: Dict[int, List[Dict]] = {}
+    for frame in frames:
+        path = frame["path"].replace("\\", "/")
+        installed = INSTALLED_PREFIX.match(path)
+        if installed:
+            # The import path is known exactly; any shorter overlap is some other package
+            import_path = path[installed.end():]
+            found = matcher.match(import_path)
+            if not found or found[1] < len(_parts(import_path)):
+                continue
+            repo_path, match_quality = found[0], 1.0
+        else:
+            if STDLIB_PATH.search(path):
+                continue
+            found = matcher.match(path)
+            if not found:
+                continue
+            repo_path, matched, same_name = found
+            # A directory plus file name pins the file down, and so does the whole path of a root-level
+            # module with a unique name; a bare name shared with other files never reaches MIN_CONFIDENCE
+            whole = matched == len(_parts(repo_path)) and same_name == 1
+            match_quality = 1.0 if matched >= 2 or whole else 0.5 / same_name
+        blocks.setdefault(frame["block"], []).append(dict(frame, repo_path=repo_path, match=match_quality))
+
+    last_block = max(blocks) if blocks else 0
+    for block_id, block_frames in blocks.items():
+        for distance, frame in enumerate(reversed(block_frames)):
+            # Deepest frame is closest to the raise; library code outranks the test that called it
+            score = frame["match"] / (1 + 0.5 * distance)
+            if TEST_PATH.search(frame["repo_path"]):
+                score *= 0.5
+            if block_id != last_block:
+                score *= 0.8
+            ranked.append(dict(frame, distance=distance, score=round(score, 3)))
+    ranked.sort(key=lambda f: -f["score"])
+    return ranked
+
+
+def locate_crash_site(text: str, file_paths: List[str]) -> Optional[Dict]:
+    """
+    Best repository frame from tracebacks in text:
+    {filepath, line, function, error, message, score, confident, frames}
+    """
+    frames = parse_frames(text)
+    if not frames:
+        return None
+    ranked = rank_frames(frames, file_paths)
+    if not ranked:
+        return None
+    best = ranked[0]
+    runner_up = ranked[1]["score"] if len(ranked) > 1 and ranked[1]["repo_path"] != best["repo_path"] else 0.0
+    return {
+        "filepath": best["repo_path"],
+        "line": best["line"],
+        "function": best["function"],
+        "error": best["error"],
+        "message": best["message"],
+        "score": best["score"],
+        # Confident when the top frame is well matched and clearly ahead of frames in other files
+        "confident": best["score"] >= MIN_CONFIDENCE and best["score"] - runner_up >= 0.15,
+        "frames": [
+            {k: f[k] for k in ("repo_path", "line", "function", "score")} for f in ranked[:5]
+        ],
+    }
+
+
+def describe_crash_site(site: Dict) -> str:
+    where = f"{site['filepath']}:{site['line']}"
+    if site.get("function"):
+        where += f" in {site['function']}()"
+    error = f" ({site['error']}: {site['message']})" if site.get("error") and site.get("message") else \
+        f" ({site['error']})" if site.get("error") else ""
+    return f"The traceback points to {where}{error}"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python traceback_locator.py <issue_text_file> <tree_listing_file>")
+        sys.exit(1)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        issue_text = f.read()
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        tree = [line.strip() for line in f if line.strip()]
+    site = locate_crash_site(issue_text, tree)
+    if site is None:
+        print("No traceback frame maps to a repository file")
+    else:
+        print(("✅ " if site["confident"] else "🤔 ") + describe_crash_site(site) + f" [score {site['score']}]")
+        for frame in site["frames"]:
+            print(f"   {frame['score']:.3f}  {frame['repo_path']}:{frame['line']} {frame['function']}")
@@ -0,0 +1,280 @@
+"""
+Local verification of SWE-agent predictions.
+Every .pred under trajectories/ is applied to its repository at the base_commit
+recorded in the run's config.yaml, inside a workspace from workspaces.py. The
+touched Python files are byte-compiled and the repo's pytest tests are run
+one by one in a sandboxed subprocess (scrubbed environment, resource limits,
+own process group, per-test timeout), before and after the patch, so a result
+says which tests the patch fixed and which it broke. Predictions are spread
+over a thread pool and the results go into one summary file. No Docker needed:
+--repos points at local fixture checkouts named owner__repo (or repo).
+
+Usage: python verify_preds.py [trajectories_dir] [--repos DIR] [--workers N] [--test-timeout S]
+                              [--max-tests N] [--output verification_summary.json]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import yaml
+
+from patch_model import parse_patch
+from workspaces import WorkspaceManager, git
+
+TEST_TIMEOUT = float(os.getenv("VERIFY_TEST_TIMEOUT", "60"))
+MAX_TESTS = int(os.getenv("VERIFY_MAX_TESTS", "200"))
+SANDBOX_MEMORY_MB = int(os.getenv("VERIFY_MEMORY_MB", "2048"))
+# Only these variables reach the tests; API keys and tokens stay out
+SANDBOX_ENV_KEYS = ("PATH", "LANG", "LC_ALL", "TZ", "VIRTUAL_ENV", "CONDA_PREFIX")
+GITHUB_REPO = re.compile(r"github\.com/([^/]+)/([^/.]+)")
+PASSED, FAILED, TIMEOUT = "passed", "failed", "timeout"
+
+
+# ---- predictions ----------------------------------------------------------
+
+def _run_config(pred_path: str) -> Dict:
+    """SWE-agent writes config.yaml next to the .pred as a YAML string holding JSON"""
+    config_path = os.path.join(os.path.dirname(pred_path), "config.yaml")
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f)
+        return json.loads(config) if isinstance(config, str) else (config or {})
+    except (OSError, yaml.YAMLError, json.JSONDecodeError):
+        return {}
+
+
+def collect_predictions(trajectories_dir: str = "trajectories") -> List[Dict]:
+    predictions = []
+    for pred_path in sorted(glob.glob(os.path.join(trajectories_dir, "**", "*.pred"), recursive=True)):
+        try:
+            with open(pred_path, "r", encoding="utf-8") as f:
+                pred = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Skipping unreadable prediction {pred_path}: {e}")
+            continue
+        repo_config = _run_config(pred_path).get("env", {}).get("repo", {})
+        match = GITHUB_REPO.search(repo_config.get("github_url", ""))
+        predictions.append({
+            "instance_id": pred.get("instance_id", os.path.basename(pred_path)[:-len(".pred")]),
+            "model_name_or_path": pred.get("model_name_or_path", ""),
+            "model_patch": pred.get("model_patch") or "",
+            "repo": f"{match.group(1)}/{match.group(2)}" if match else None,
+            "base_commit": repo_config.get("base_commit", "HEAD"),
+            "pred_path": pred_path,
+        })
+    return predictions
+
+
+def fixture_sources(repos_dir: Optional[str], predictions: List[Dict]) -> Dict[str, str]:
+    """owner/repo -> local checkout in repos_dir, named owner__repo or repo"""
+    sources = {}
+    for repo in {p["repo"] for p in predictions if p["repo"]}:
+        owner, name = repo.split("/")
+        for candidate in (f"{owner}__{name}", name):
+            path = os.path.join(repos_dir or "", candidate)
+            if repos_dir and os.path.isdir(path):
+                sources[repo] = os.path.abspath(path)
+                break
+    return sources
+
+
+# ---- sandbox --------------------------------------------------------------
+
+# Sets the limits in the child itself and then becomes the test command. Unlike preexec_fn this is safe
+# to start from the verifier's worker threads, and the limits are in place before the command runs.
+LIMITS_WRAPPER = (
+    "import os, resource, sys\n"
+    "memory = int(sys.argv[1])\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "resource.setrlimit(resource.RLIMIT_CORE, (0, 0))\n"
+    "os.execv(sys.argv[2], sys.argv[2:])\n"
+)
+
+
+def limited(cmd: List[str]) -> List[str]:
+    """cmd run under SANDBOX_MEMORY_MB and without core dumps (POSIX; elsewhere unchanged)"""
+    if os.name != "posix":
+        return cmd
+    executable = cmd[0] if os.path.isabs(cmd[0]) else shutil.which(cmd[0]) or cmd[0]
+    return [sys.executable, "-c", LIMITS_WRAPPER, str(SANDBOX_MEMORY_MB * 1024 * 1024), executable, *cmd[1:]]
+
+
+def sandboxed(cmd: List[str], cwd: str, timeout: float) -> tuple:
+    """(returncode or None on timeout, output); the whole process group is killed on timeout"""
+    with tempfile.TemporaryDirectory(prefix="verify-home-") as home:
+        env = {key: os.environ[key] for key in SANDBOX_ENV_KEYS if key in os.environ}
+        env.update({"HOME": home, "TMPDIR": home, "PYTHONDONTWRITEBYTECODE": "1", "PYTHONHASHSEED": "0"})
+        posix = os.name == "posix"
+        process = subprocess.Popen(limited(cmd), cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   stdin=subprocess.DEVNULL, text=True, errors="replace", start_new_session=posix)
+        try:
+            output, _ = process.communicate(timeout=timeout)
+            return process.returncode, output
+        except subprocess.TimeoutExpired:
+            if posix:
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+            output, _ = process.communicate()
+            return None, output
+
+
+# ---- tests ----------------------------------------------------------------
+
+def collect_tests(workspace: str, max_tests: int = MAX_TESTS) -> List[str]:
+    code, output = sandboxed([sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider"],
+                             workspace, TEST_TIMEOUT)
+    if code is None:
+        return []
+    tests = [line.strip() for line in output.splitlines() if "::" in line and not line.startswith(" ")]
+    return tests[:max_tests]
+
+
+def run_tests(workspace: str, tests: List[str], timeout: float) -> Dict[str, str]:
+    """One subprocess per test so a hang or crash only costs that test"""
+    results = {}
+    for test in tests:
+        code, _ = sandboxed([sys.executable, "-m", "pytest", "-q", "-x", "-p", "no:cacheprovider", test],
+                            workspace, timeout)
+        results[test] = TIMEOUT if code is None else PASSED if code == 0 else FAILED
+    return results
+
+
+def compile_files(workspace: str, paths: List[str]) -> List[str]:
+    """Touched .py files that no longer compile"""
+    broken = []
+    for path in paths:
+        full_path = os.path.join(workspace, path)
+        if path.endswith(".py") and os.path.isfile(full_path):
+            code, output = sandboxed([sys.executable, "-m", "py_compile", path], workspace, TEST_TIMEOUT)
+            if code != 0:
+                broken.append(f"{path}: {output.strip().splitlines()[-1] if output.strip() else 'timeout'}")
+    return broken
+
+
+# ---- harness --------------------------------------------------------------
+
+class Verifier:
+    """Applies predictions in recycled workspaces; baseline test results are shared per (repo, commit)"""
+    def __init__(self, workspaces: WorkspaceManager, test_timeout: float = TEST_TIMEOUT,
+                 max_tests: int = MAX_TESTS):
+        self.workspaces = workspaces
+        self.test_timeout = test_timeout
+        self.max_tests = max_tests
+        self.baselines: Dict[tuple, Dict[str, str]] = {}
+        self._baseline_locks: Dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def baseline(self, owner: str, repo: str, commit: str) -> Dict[str, str]:
+        key = (owner, repo, commit)
+        with self._lock:
+            lock = self._baseline_locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.baselines:
+                with self.workspaces.workspace(owner, repo, commit) as workspace:
+                    tests = collect_tests(workspace, self.max_tests)
+                    self.baselines[key] = run_tests(workspace, tests, self.test_timeout)
+            return self.baselines[key]
+
+    def verify(self, prediction: Dict) -> Dict:
+        start = time.monotonic()
+        result = {key: prediction[key] for key in ("instance_id", "model_name_or_path", "repo", "pred_path")}
+        if not prediction["model_patch"].strip():
+            return dict(result, status="empty_patch", seconds=0.0)
+        if not prediction["repo"]:
+            return dict(result, status="error", error="no repository in the run config", seconds=0.0)
+        owner, repo = prediction["repo"].split("/")
+        result["base_commit"] = prediction["base_commit"]
+        try:
+            # "HEAD" in the run config means whatever the default branch pointed at; pin it to a sha
+            result["base_commit"] = commit = self.workspaces.resolve(owner, repo, prediction["base_commit"])
+            baseline = self.baseline(owner, repo, commit)
+            with self.workspaces.workspace(owner, repo, commit) as workspace:
+                result.update(self._check(workspace, prediction["model_patch"], baseline))
+        except Exception as e:
+            result.update(status="error", error=str(e))
+        result["seconds"] = round(time.monotonic() - start, 2)
+        return result
+
+    def _check(self, workspace: str, patch: str, baseline: Dict[str, str]) -> Dict:
+        patch_path = os.path.join(workspace, ".verify.patch")
+        with open(patch_path, "w", encoding="utf-8") as f:
+            f.write(patch if patch.endswith("\n") else patch + "\n")
+        applied = git("apply", "--whitespace=nowarn", patch_path, cwd=workspace, check=False)
+        os.remove(patch_path)
+        if applied.returncode != 0:
+            return {"status": "apply_failed", "error": applied.stderr.strip()[:500]}
+
+        broken = compile_files(workspace, parse_patch(patch).touched_paths())
+        if broken:
+            return {"status": "syntax_error", "error": "; ".join(broken)[:500]}
+
+        # Tests the patch added are picked up alongside the baseline ones
+        tests = list(dict.fromkeys(list(baseline) + collect_tests(workspace, self.max_tests)))[:self.max_tests]
+        after = run_tests(workspace, tests, self.test_timeout)
+        fixed = [t for t, outcome in after.items() if outcome == PASSED and baseline.get(t) != PASSED]
+        regressed = [t for t, outcome in after.items() if outcome != PASSED and baseline.get(t) == PASSED]
+        failing = [t for t, outcome in after.items() if outcome != PASSED]
+        if not tests:
+            status = "compiled"
+        elif regressed:
+            status = "regressed"
+        elif failing:
+            status = "failing"
+        else:
+            status = "passed"
+        return {"status": status, "tests": len(tests), "fixed": fixed, "regressed": regressed, "failing": failing}
+
+
+def verify_predictions(predictions: List[Dict], verifier: Verifier, workers: int = 4) -> List[Dict]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(verifier.verify, predictions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply .pred patches locally and run the repository tests")
+    parser.add_argument("trajectories_dir", nargs="?", default="trajectories")
+    parser.add_argument("--repos", help="directory with local fixture checkouts named owner__repo or repo")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--test-timeout", type=float, default=TEST_TIMEOUT)
+    parser.add_argument("--max-tests", type=int, default=MAX_TESTS)
+    parser.add_argument("--workspace-dir", default=os.path.join(tempfile.gettempdir(), "swe-verify-workspaces"))
+    parser.add_argument("--output", default="verification_summary.json")
+    args = parser.parse_args()
+
+    predictions = collect_predictions(args.trajectories_dir)
+    if not predictions:
+        print(f"No .pred files under {args.trajectories_dir}")
+        sys.exit(1)
+    workspaces = WorkspaceManager(args.workspace_dir, sources=fixture_sources(args.repos, predictions))
+    verifier = Verifier(workspaces, test_timeout=args.test_timeout, max_tests=args.max_tests)
+    print(f"🧪 Verifying {len(predictions)} prediction(s) with {args.workers} worker(s)")
+    results = verify_predictions(predictions, verifier, workers=args.workers)
+    workspaces.close()
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        icon = "✅" if result["status"] in ("passed", "compiled") else "❌"
+        detail = result.get("error") or f"{result.get('tests', 0)} test(s), {len(result.get('fixed', []))} fixed, " \
+                                        f"{len(result.get('regressed', []))} regressed"
+        print(f"{icon} {result['instance_id']}: {result['status']} ({detail}) in {result['seconds']}s")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"counts": counts, "results": results}, f, indent=2)
+    print(f"📝 Summary written to {args.output}: {counts}")
+    print(workspaces.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Copy-on-write workspaces for concurrent patch attempts and verification.
+Each repository is fetched once into a blobless object store under
+WORKSPACE_DIR, and every (repo, commit) gets a pristine worktree. Workspaces
+are extra `git worktree` checkouts of that commit: they share the object store,
+so a new one costs a checkout of the files and nothing else. Released
+workspaces are reset (git reset --hard, git clean -fdx) and kept for the next
+caller instead of being deleted.
+Tools that copy the checkout somewhere else (SWE-agent uploads the repo into
+its container) need a self-contained .git, so standalone workspaces are local
+clones of the store instead, with the objects hardlinked rather than copied.
+
+Usage: python workspaces.py <owner/repo> <commit> [count]
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+WORKSPACE_DIR = os.getenv("SWE_WORKSPACE_DIR", ".workspaces")
+MAX_IDLE_PER_COMMIT = int(os.getenv("SWE_WORKSPACE_MAX_IDLE", "8"))
+SHA = re.compile(r"[0-9a-f]{7,40}")
+# Where a revision like HEAD~1 or main^2 stops naming a ref
+REV_SUFFIX = re.compile(r"[~^@:]")
+
+
+def git(*args, cwd: Optional[str] = None, check: bool = True) -> subprocess.CompletedProcess:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result
+
+
+class WorkspaceManager:
+    """Pristine checkout per (repo, commit) and a pool of recycled worktrees on top of it"""
+    def __init__(self, root: str = WORKSPACE_DIR, max_idle: int = MAX_IDLE_PER_COMMIT,
+                 sources: Optional[Dict[str, str]] = None):
+        self.root = os.path.abspath(root)
+        self.max_idle = max_idle
+        # "owner/repo" -> clone URL or local path, for fixtures and mirrors; GitHub otherwise
+        self.sources = dict(sources or {})
+        self.idle: Dict[tuple, List[str]] = defaultdict(list)
+        self.busy: Dict[str, tuple] = {}
+        self.stats = {"created": 0, "reused": 0, "discarded": 0, "create_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    # ---- object store and pristine checkouts ------------------------------
+
+    def _store(self, owner: str, repo: str) -> str:
+        return os.path.join(self.root, f"{owner}__{repo}", "store.git")
+
+    def _repo_lock(self, owner: str, repo: str) -> threading.Lock:
+        with self._lock:
+            return self._repo_locks[f"{owner}/{repo}"]
+
+    def _remote_ref(self, store: str, ref: str) -> Optional[str]:
+        """sha the remote's HEAD, branch or tag points at right now; None when it has no such ref"""
+        result = git("ls-remote", "origin", ref, cwd=store, check=False)
+        if result.returncode != 0:
+            print(f"⚠️  Could not resolve {ref} on the remote, using the store's copy: {result.stderr.strip()}")
+            return None
+        refs = dict(line.split("\t", 1)[::-1] for line in result.stdout.splitlines() if "\t" in line)
+        for name in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}"):
+            if name in refs:
+                return refs[name]
+        return None
+
+    def _ensure_commit(self, owner: str, repo: str, commit: str) -> str:
+        """
+        Blobless clone on first use; fetch the commit if the store doesn't have it yet.
+        Refs (HEAD, branches, tags) are resolved against the remote every time, since the
+        store's copy of them is only as new as the last fetch.
+        """
+        store = self._store(owner, repo)
+        if not os.path.isdir(store):
+            os.makedirs(os.path.dirname(store), exist_ok=True)
+            source = self.sources.get(f"{owner}/{repo}", f"https://github.com/{owner}/{repo}")
+            print(f"📥 Fetching {owner}/{repo} into the workspace store")
+            git("clone", "--bare", "--filter=blob:none", source, store)
+        suffix = REV_SUFFIX.search(commit)
+        base = commit[:suffix.start()] if suffix else commit
+        if not SHA.fullmatch(base):
+            sha = self._remote_ref(store, base)
+            if sha:
+                commit, base = sha + commit[len(base):], sha
+        if git("cat-file", "-e", f"{base}^{{commit}}", cwd=store, check=False).returncode != 0:
+            git("fetch", "--filter=blob:none", "origin", base, cwd=store)
+            if not SHA.fullmatch(base):
+                # A fetched ref only lands in FETCH_HEAD; the store's own refs may still be stale
+                commit = git("rev-parse", "FETCH_HEAD", cwd=store).stdout.strip() + commit[len(base):]
+        return git("rev-parse", f"{commit}^{{commit}}", cwd=store).stdout.strip()
+
+    def _hydrate(self, owner: str, repo: str, sha: str):
+        """Fetch the blobs of sha's tree the blobless store is still missing"""
+        store = self._store(owner, repo)
+        listing = git("rev-list", "--objects", "--missing=print", f"{sha}^{{tree}}", cwd=store).stdout
+        missing = [line[1:] for line in listing.splitlines() if line.startswith("?")]
+        if missing:
+            # One batched fetch; lazy fetching would ask for the blobs one at a time
+            result = subprocess.run(["git", "fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "origin", "--stdin"],
+                                    cwd=store, input="\n".join(missing) + "\n", capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"Fetching {len(missing)} blob(s) of {sha[:12]} failed: {result.stderr.strip()}")
+
+    def _standalone_clone(self, owner: str, repo: str, sha: str, path: str):
+        """
+        Self-contained clone of the store at sha. A plain clone of a blobless store has no promisor
+        to fetch from, so the tree's blobs are fetched into the store first and the checkout is verified.
+        """
+        self._hydrate(owner, repo, sha)
+        git("clone", "--quiet", "--no-checkout", self._store(owner, repo), path)
+        git("checkout", "--quiet", "--detach", sha, cwd=path)
+        dirty = git("status", "--porcelain", cwd=path).stdout
+        if dirty:
+            shutil.rmtree(path, ignore_errors=True)
+            raise RuntimeError(f"Checkout of {owner}/{repo}@{sha[:12]} is incomplete: {dirty.splitlines()[:3]}")
+
+    def resolve(self, owner: str, repo: str, commit: str) -> str:
+        """Full sha of commit (a sha, branch or HEAD), fetching it into the store if needed"""
+        with self._repo_lock(owner, repo):
+            return self._ensure_commit(owner, repo, commit)
+
+    def pristine(self, owner: str, repo: str, commit: str, standalone: bool = False) -> str:
+        """Read-only checkout of commit, created once and shared (a local clone when standalone)"""
+        with self._repo_lock(owner, repo):
+            sha = self._ensure_commit(owner, repo, commit)
+            path = os.path.join(self.root, f"{owner}__{repo}", "pristine-standalone" if standalone else "pristine", sha)
+            if not os.path.isdir(path):
+                if standalone:
+                    # Cloned beside the final path and renamed, so a reader never sees a partial checkout
+                    tmp = f"{path}.{uuid.uuid4().hex[:8]}"
+                    self._standalone_clone(owner, repo, sha, tmp)
+                    os.rename(tmp, path)
+                else:
+                    git("worktree", "add", "--detach", path, sha, cwd=self._store(owner, repo))
+            return path
+
+    # ---- workspaces --------------------------------------------------------
+
+    def acquire(self, owner: str, repo: str, commit: str, standalone: bool = False) -> str:
+        """Isolated checkout of commit; recycled when one is idle, a new worktree (or local clone) otherwise"""
+        sha = self.resolve(owner, repo, commit)
+        key = (owner, repo, sha, standalone)
+        with self._lock:
+            if self.idle[key]:
+                path = self.idle[key].pop()
+                self.busy[path] = key
+                self.stats["reused"] += 1
+                return path
+
+        start = time.monotonic()
+        path = os.path.join(self.root, f"{owner}__{repo}", "workspaces", f"{sha[:12]}-{uuid.uuid4().hex[:8]}")
+        with self._repo_lock(owner, repo):
+            if standalone:
+                self._standalone_clone(owner, repo, sha, path)
+            else:
+                git("worktree", "add", "--detach", path, sha, cwd=self._store(owner, repo))
+        with self._lock:
+            self.busy[path] = key
+            self.stats["created"] += 1
+            self.stats["create_seconds"] += time.monotonic() - start
+        return path
+
+    def release(self, path: str):
+        """Reset the workspace to its commit and keep it for reuse (or remove it when the pool is full)"""
+        with self._lock:
+            key = self.busy.pop(path, None)
+        if key is None:
+            return
+        owner, repo, sha, _ = key
+        reset = git("reset", "--hard", sha, cwd=path, check=False)
+        clean = git("clean", "-fdx", cwd=path, check=False)
+        with self._lock:
+            if reset.returncode == 0 and clean.returncode == 0 and len(self.idle[key]) < self.max_idle:
+                self.idle[key].append(path)
+                return
+            self.stats["discarded"] += 1
+        self._remove(owner, repo, path)
+
+    @contextmanager
+    def workspace(self, owner: str, repo: str, commit: str, standalone: bool = False):
+        path = self.acquire(owner, repo, commit, standalone)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _remove(self, owner: str, repo: str, path: str):
+        with self._repo_lock(owner, repo):
+            if git("worktree", "remove", "--force", path, cwd=self._store(owner, repo), check=False).returncode != 0:
+                shutil.rmtree(path, ignore_errors=True)
+                git("worktree", "prune", cwd=self._store(owner, repo), check=False)
+
+    def close(self):
+        """Remove idle workspaces; pristine checkouts and the object stores stay on disk"""
+        with self._lock:
+            idle = [(key, path) for key, paths in self.idle.items() for path in paths]
+            self.idle.clear()
+        for (owner, repo, _, _), path in idle:
+            self._remove(owner, repo, path)
+
+    def report(self) -> str:
+        s = self.stats
+        average = s["create_seconds"] / s["created"] if s["created"] else 0.0
+        idle = sum(len(paths) for paths in self.idle.values())
+        return (f"Workspaces: {s['created']} created (avg {average:.2f}s), {s['reused']} reused, "
+                f"{s['discarded']} discarded, {len(self.busy)} in use, {idle} idle")
+
+
+WORKSPACES = WorkspaceManager()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python workspaces.py <owner/repo> <commit> [count]")
+        sys.exit(1)
+    owner, repo = sys.argv[1].split("/", 1)
+    commit, count = sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f"📁 Pristine checkout: {WORKSPACES.pristine(owner, repo, commit)}")
+    for round_number in (1, 2):
+        paths = [WORKSPACES.acquire(owner, repo, commit) for _ in range(count)]
+        print(f"Round {round_number}: {len(paths)} workspace(s) ready")
+        for path in paths:
+            WORKSPACES.release(path)
+    print(WORKSPACES.report())